@@ -0,0 +1,263 @@
+"""
+Asyncio entry point, an alternative to running the Flask app in server.py:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+Webhook handling, Graph API calls and the shared stock poller run as
+coroutines on one event loop (install httpx for a non-blocking HTTP
+client; without it requests run in worker threads). Command modules are
+used as they are: a sync execute() runs in a worker thread, and the
+send_message it receives schedules the send on the loop and waits for it,
+while an `async def execute` runs directly on the loop.
+"""
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import server
+from functions import asyncBridge, asyncHttp, metrics, tracing
+from functions.jsonCodec import dumps, loads
+from functions.logPipeline import LazyJson
+from functions.sendMessage import send_message_async
+from functions.stockPoller import stock_poller
+from functions.webhookDedupe import event_key, webhook_dedupe
+
+logger = logging.getLogger(__name__)
+
+COMMAND_THREADS = 64
+
+_loop = None
+_background_tasks = set()
+
+
+async def enhanced_send_message_async(recipient_id, message_text):
+    if not server.PAGE_ACCESS_TOKEN:
+        logger.error("Cannot send message: PAGE_ACCESS_TOKEN is not configured.")
+        return None
+    response_data = await send_message_async(recipient_id, message_text)
+    return server.record_sent_message(recipient_id, message_text, response_data)
+
+
+def send_message_from_thread(recipient_id, message_text):
+    """
+    send_message handed to command modules. They call it from worker
+    threads, so the send runs on the event loop while the caller waits.
+    """
+    if _loop is None or not _loop.is_running():
+        return server.enhanced_send_message(recipient_id, message_text)
+    return asyncio.run_coroutine_threadsafe(
+        tracing.attach(enhanced_send_message_async(recipient_id, message_text)),
+        _loop,
+    ).result()
+
+
+async def handle_messaging_event(messaging_event):
+    sender_id = messaging_event.get("sender", {}).get("id")
+    if not sender_id:
+        logger.warning("Received messaging event without sender ID.")
+        return
+
+    with tracing.trace("webhook.event", sender=sender_id):
+        await _handle_message(sender_id, messaging_event)
+
+
+async def _handle_message(sender_id, messaging_event):
+    typing_session = None
+    try:
+        if "message" in messaging_event:
+            message_data = messaging_event["message"]
+            message_text = message_data.get("text")
+            original_message_id_from_user = message_data.get("mid")
+            replied_to_mid = (message_data.get("reply_to") or {}).get("mid")
+
+            if message_text:
+                typing_session = server.typing_manager.begin_async(sender_id)
+                if await asyncio.to_thread(
+                    server.process_message,
+                    sender_id,
+                    message_text,
+                    original_message_id_from_user,
+                    replied_to_mid,
+                    send_message_from_thread,
+                    enhanced_send_message_async,
+                    typing_session,
+                ):
+                    # The async command ends it once it has replied.
+                    typing_session = None
+            else:
+                logger.info(
+                    f"Received message event from {sender_id} without text content. MID: {original_message_id_from_user}"
+                )
+        elif "postback" in messaging_event:
+            logger.info(
+                f"Received postback event from {sender_id}: {messaging_event.get('postback')}"
+            )
+    except Exception as e:
+        logger.error(
+            f"Error handling messaging event for sender {sender_id}: {e}",
+            exc_info=True,
+        )
+    finally:
+        if typing_session is not None:
+            server.typing_manager.end_async(typing_session)
+
+
+def _spawn(coro):
+    task = asyncio.get_running_loop().create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def verify_webhook(query):
+    params = {key: values[0] for key, values in parse_qs(query).items()}
+    mode = params.get("hub.mode")
+    token = params.get("hub.verify_token")
+
+    if not mode or not token:
+        logger.error(
+            "Verification failed: 'hub.mode' or 'hub.verify_token' missing from query parameters."
+        )
+        return 400, "Verification Failed: Missing parameters."
+    if server.VERIFY_TOKEN and mode == "subscribe" and token == server.VERIFY_TOKEN:
+        logger.info("Webhook verified successfully!")
+        return 200, params.get("hub.challenge", "")
+    logger.error(f"Verification failed. Mode: '{mode}', Received token: '{token}'")
+    return (
+        403,
+        "Verification Failed: Token mismatch, invalid mode, or server configuration error.",
+    )
+
+
+async def webhook_handler(body):
+    try:
+        data = loads(body or b"null")
+    except ValueError:
+        return 400, "INVALID_JSON"
+    if not isinstance(data, dict):
+        return 400, "INVALID_JSON"
+    logger.info(
+        "Received POST request on /webhook with data: %s",
+        LazyJson(data),
+        extra={"event": "webhook.payload"},
+    )
+
+    if not server.PAGE_ACCESS_TOKEN or not server.FUNCTIONS_AVAILABLE:
+        logger.error(
+            "Webhook handling aborted: PAGE_ACCESS_TOKEN not configured or core functions unavailable."
+        )
+        return 500, "SERVER_ERROR_NO_TOKEN_OR_FUNCTIONS"
+
+    # Events are handled in the background so the webhook is acknowledged
+    # right away, however long the commands take.
+    if data.get("object") == "page":
+        for entry in data.get("entry", []):
+            for messaging_event in entry.get("messaging", []):
+                metrics.count_webhook_event(messaging_event)
+                key = event_key(messaging_event)
+                if webhook_dedupe.is_duplicate(key):
+                    logger.info(f"Dropping redelivered webhook event {key}")
+                    continue
+                _spawn(handle_messaging_event(messaging_event))
+
+    return 200, "EVENT_RECEIVED"
+
+
+async def _read_body(receive):
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    return body
+
+
+def _header(scope, name):
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+async def _respond(send, status, text, content_type="text/plain; charset=utf-8"):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", content_type.encode())],
+        }
+    )
+    await send({"type": "http.response.body", "body": text.encode()})
+
+
+async def startup():
+    global _loop
+    _loop = asyncio.get_running_loop()
+    asyncBridge.set_loop(_loop)
+    _loop.set_default_executor(
+        ThreadPoolExecutor(max_workers=COMMAND_THREADS, thread_name_prefix="command")
+    )
+    stock_poller.start_async()
+    logger.info("ASGI app started")
+
+
+async def shutdown():
+    if _background_tasks:
+        await asyncio.wait(list(_background_tasks), timeout=10)
+    await asyncHttp.aclose()
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await startup()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await shutdown()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    if scope["path"] == "/metrics":
+        # Callback gauges query the shared state database; keep that off
+        # the loop.
+        text = await asyncio.to_thread(metrics.render)
+        await _respond(send, 200, text, metrics.CONTENT_TYPE)
+        return
+
+    if scope["path"] == "/debug/traces":
+        status = tracing.debug_status(_header(scope, b"x-debug-token"))
+        if status != 200:
+            await _respond(send, status, "Not Found" if status == 404 else "Forbidden")
+            return
+        params = parse_qs(scope.get("query_string", b"").decode())
+        try:
+            limit = int(params.get("limit", ["20"])[0])
+        except ValueError:
+            limit = 20
+        traces = tracing.recent_traces.slowest(limit, params.get("name", [None])[0])
+        await _respond(send, 200, dumps(traces), "application/json")
+        return
+
+    if scope["path"] != "/webhook":
+        await _respond(send, 404, "Not Found")
+        return
+
+    if scope["method"] == "GET":
+        status, text = await verify_webhook(scope.get("query_string", b"").decode())
+    elif scope["method"] == "POST":
+        status, text = await webhook_handler(await _read_body(receive))
+    else:
+        status, text = 405, "Method Not Allowed"
+    await _respond(send, status, text)
@@ -1,11 +1,9 @@
 import threading
 import requests
-import json
 import logging
+import sys
 from datetime import datetime, timedelta
-import time
 import os
-import pickle
 from collections import defaultdict, Counter
 import statistics
 import hashlib
@@ -15,6 +13,33 @@ try:
 except ImportError:
     pytz = None
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from functions.broadcast import PRIORITY_ALERT, PRIORITY_UPDATE, broadcaster
+from functions.commandRouter import Router
+from functions.fetchStock import (
+    fetch_stock_data,
+    get_retry_delay,
+    record_suppressed_notification,
+    StockAPIError,
+)
+from functions.jsonCodec import dumps
+from functions.messageCache import message_cache, shared_key
+from functions.rateLimiter import RateLimiter
+from functions.sharedState import (
+    claim_session,
+    get_record,
+    get_session,
+    load_records,
+    owns_session,
+    orphaned_sessions,
+    release_session,
+    shared_state,
+    update_record,
+    update_session,
+)
+from functions.stockPoller import get_stock_snapshot, is_snapshot_available
+from functions.tracing import traced
+
 logger = logging.getLogger(__name__)
 
 active_sessions = {}
@@ -26,72 +51,74 @@ price_history = defaultdict(list)
 stock_analytics = defaultdict(
     lambda: {"last_seen": None, "frequency": 0, "avg_price": 0}
 )
-user_last_command_time = {}
-user_command_usage = defaultdict(int)
 user_session_data = {}
-message_cache = {}
 
 PH_OFFSET = 8
 COMMAND_COOLDOWN = 3
 SPAM_THRESHOLD = 5
 CACHE_DURATION = 60
+UPDATE_CACHE_DURATION = 8
 MAX_COMMANDS_PER_MINUTE = 10
+COMMAND_COSTS = {"on": 2, "stock": 2, "market": 2, "top": 2, "search": 2}
 
 TRACKED_ITEMS_FILE = "gagstock_tracked_items.pkl"
 PRICE_ALERTS_FILE = "gagstock_price_alerts.pkl"
 USER_STATS_FILE = "gagstock_user_stats.pkl"
 PRICE_HISTORY_FILE = "gagstock_price_history.pkl"
 USER_PREFERENCES_FILE = "gagstock_user_preferences.pkl"
+SESSION_KIND = "gagstock"
+SESSION_WARMUP_WINDOW = 30
+
+DEFAULT_PREFERENCES = {
+    "notifications": True,
+    "show_rarity": True,
+    "compact_mode": False,
+    "price_alerts": True,
+    "auto_track_expensive": False,
+}
+DEFAULT_USER_STATS = {
+    "commands_used": 0,
+    "items_tracked": 0,
+    "sessions_started": 0,
+    "last_active": None,
+    "favorite_category": None,
+}
+
+rate_limiter = RateLimiter(
+    MAX_COMMANDS_PER_MINUTE,
+    refill_period=60.0,
+    cooldown=COMMAND_COOLDOWN,
+    command_costs=COMMAND_COSTS,
+    store=shared_state,
+    namespace="ratelimit:gagstock",
+)
+
+# Subcommands register on this below; execute() dispatches through it and
+# the help message lists what is registered.
+router = Router("gagstock")
 
 
 def load_tracked_items():
     global user_tracked_items
     try:
-        if os.path.exists(TRACKED_ITEMS_FILE):
-            with open(TRACKED_ITEMS_FILE, "rb") as f:
-                user_tracked_items = pickle.load(f)
-            logger.info(f"Loaded tracked items for {len(user_tracked_items)} users")
-        else:
-            user_tracked_items = {}
-            logger.info("No existing tracked items file found, starting fresh")
+        user_tracked_items = load_records(TRACKED_ITEMS_FILE)
+        logger.info(f"Loaded tracked items for {len(user_tracked_items)} users")
     except Exception as e:
         logger.error(f"Error loading tracked items: {e}")
         user_tracked_items = {}
 
 
-def save_tracked_items_to_file():
-    try:
-        with open(TRACKED_ITEMS_FILE, "wb") as f:
-            pickle.dump(user_tracked_items, f)
-        logger.debug(f"Saved tracked items for {len(user_tracked_items)} users")
-    except Exception as e:
-        logger.error(f"Error saving tracked items: {e}")
-
-
 def load_user_preferences():
     global user_preferences
     try:
-        if os.path.exists(USER_PREFERENCES_FILE):
-            with open(USER_PREFERENCES_FILE, "rb") as f:
-                user_preferences = pickle.load(f)
-            logger.info(f"Loaded preferences for {len(user_preferences)} users")
-        else:
-            user_preferences = {}
-            logger.info("No existing preferences file found, starting fresh")
+        user_preferences = load_records(USER_PREFERENCES_FILE)
+        logger.info(f"Loaded preferences for {len(user_preferences)} users")
     except Exception as e:
         logger.error(f"Error loading preferences: {e}")
         user_preferences = {}
 
 
-def save_user_preferences():
-    try:
-        with open(USER_PREFERENCES_FILE, "wb") as f:
-            pickle.dump(user_preferences, f)
-        logger.debug(f"Saved preferences for {len(user_preferences)} users")
-    except Exception as e:
-        logger.error(f"Error saving preferences: {e}")
-
-
+@traced("gagstock.load_all_data")
 def load_all_data():
     global user_tracked_items, user_price_alerts, user_stats, price_history, user_preferences
 
@@ -99,103 +126,56 @@ def load_all_data():
     load_user_preferences()
 
     try:
-        if os.path.exists(PRICE_ALERTS_FILE):
-            with open(PRICE_ALERTS_FILE, "rb") as f:
-                user_price_alerts = pickle.load(f)
-        else:
-            user_price_alerts = {}
+        user_price_alerts = load_records(PRICE_ALERTS_FILE)
     except Exception as e:
         logger.error(f"Error loading price alerts: {e}")
         user_price_alerts = {}
 
     try:
-        if os.path.exists(USER_STATS_FILE):
-            with open(USER_STATS_FILE, "rb") as f:
-                user_stats = pickle.load(f)
-        else:
-            user_stats = {}
+        user_stats = load_records(USER_STATS_FILE)
     except Exception as e:
         logger.error(f"Error loading user stats: {e}")
         user_stats = {}
 
     try:
-        if os.path.exists(PRICE_HISTORY_FILE):
-            with open(PRICE_HISTORY_FILE, "rb") as f:
-                price_history_data = pickle.load(f)
-                price_history.update(price_history_data)
-        else:
-            price_history.clear()
+        price_history.update(load_records(PRICE_HISTORY_FILE))
     except Exception as e:
         logger.error(f"Error loading price history: {e}")
         price_history.clear()
 
 
-def save_data(data_type):
+def update_data(data_type, key, fn, default=None):
+    """
+    Change one record with `fn` in the shared store, atomically across
+    workers, and refresh this worker's copy with the result.
+    """
     file_mapping = {
         "tracked_items": (TRACKED_ITEMS_FILE, user_tracked_items),
         "price_alerts": (PRICE_ALERTS_FILE, user_price_alerts),
         "stats": (USER_STATS_FILE, user_stats),
-        "price_history": (PRICE_HISTORY_FILE, dict(price_history)),
+        "price_history": (PRICE_HISTORY_FILE, price_history),
         "preferences": (USER_PREFERENCES_FILE, user_preferences),
     }
 
-    try:
-        file_path, data = file_mapping[data_type]
-        with open(file_path, "wb") as f:
-            pickle.dump(data, f)
-        logger.debug(f"Saved {data_type} to {file_path}")
-    except Exception as e:
-        logger.error(f"Error saving {data_type}: {e}")
-
-
-def check_spam_protection(sender_id):
-    current_time = time.time()
-    minute_window = int(current_time // 60)
-
-    if sender_id not in user_command_usage:
-        user_command_usage[sender_id] = {}
-
-    if minute_window not in user_command_usage[sender_id]:
-        user_command_usage[sender_id] = {minute_window: 1}
+    namespace, data = file_mapping[data_type]
+    value = update_record(namespace, key, fn, default)
+    if value is None:
+        data.pop(key, None)
     else:
-        user_command_usage[sender_id][minute_window] += 1
-
-    old_windows = [w for w in user_command_usage[sender_id] if w < minute_window - 2]
-    for w in old_windows:
-        del user_command_usage[sender_id][w]
-
-    if user_command_usage[sender_id][minute_window] > MAX_COMMANDS_PER_MINUTE:
-        return (
-            False,
-            f"⚠️ Rate limit exceeded. Please wait before sending more commands. (Max {MAX_COMMANDS_PER_MINUTE}/minute)",
-        )
+        data[key] = value
+    return value
 
-    if sender_id in user_last_command_time:
-        time_since_last = current_time - user_last_command_time[sender_id]
-        if time_since_last < COMMAND_COOLDOWN:
-            remaining = COMMAND_COOLDOWN - time_since_last
-            return (
-                False,
-                f"⏳ Please wait {remaining:.1f} more seconds before using another command.",
-            )
 
-    user_last_command_time[sender_id] = current_time
-    return True, None
+def check_spam_protection(sender_id, command=None):
+    return rate_limiter.check(sender_id, command)
 
 
 def get_cached_message(cache_key):
-    current_time = time.time()
-    if cache_key in message_cache:
-        cached_data = message_cache[cache_key]
-        if current_time - cached_data["timestamp"] < CACHE_DURATION:
-            return cached_data["message"]
-        else:
-            del message_cache[cache_key]
-    return None
+    return message_cache.get(cache_key)
 
 
 def cache_message(cache_key, message):
-    message_cache[cache_key] = {"message": message, "timestamp": time.time()}
+    message_cache.set(cache_key, message, ttl=CACHE_DURATION)
 
 
 def pad(n):
@@ -430,14 +410,13 @@ def normalize_item_name(name):
 
 
 def update_price_history(item_name, category, value):
-    key = f"{category}/{item_name}"
-    now = get_ph_time()
-    price_history[key].append({"timestamp": now.isoformat(), "value": value})
-
-    if len(price_history[key]) > 100:
-        price_history[key] = price_history[key][-100:]
-
-    save_data("price_history")
+    entry = {"timestamp": get_ph_time().isoformat(), "value": value}
+    update_data(
+        "price_history",
+        f"{category}/{item_name}",
+        lambda history: (history + [entry])[-100:],
+        default=[],
+    )
 
 
 def get_price_trend(item_name, category):
@@ -464,71 +443,69 @@ def get_price_trend(item_name, category):
 
 
 def update_user_stats(sender_id, action):
-    if sender_id not in user_stats:
-        user_stats[sender_id] = {
-            "commands_used": 0,
-            "items_tracked": 0,
-            "sessions_started": 0,
-            "last_active": None,
-            "favorite_category": None,
-        }
-
-    user_stats[sender_id]["commands_used"] += 1
-    user_stats[sender_id]["last_active"] = get_ph_time().isoformat()
+    def apply(stats):
+        stats["commands_used"] += 1
+        stats["last_active"] = get_ph_time().isoformat()
+        if action == "track_item":
+            stats["items_tracked"] += 1
+        elif action == "start_session":
+            stats["sessions_started"] += 1
+        return stats
 
-    if action == "track_item":
-        user_stats[sender_id]["items_tracked"] += 1
-    elif action == "start_session":
-        user_stats[sender_id]["sessions_started"] += 1
-
-    save_data("stats")
+    try:
+        update_data("stats", sender_id, apply, default=DEFAULT_USER_STATS)
+    except Exception as e:
+        logger.error(f"Error updating stats for {sender_id}: {e}")
 
 
 def get_user_preferences(sender_id):
-    global user_preferences
-
-    if user_preferences is None:
-        user_preferences = {}
-
-    if sender_id not in user_preferences:
-        user_preferences[sender_id] = {
-            "notifications": True,
-            "show_rarity": True,
-            "compact_mode": False,
-            "price_alerts": True,
-            "auto_track_expensive": False,
-        }
+    """
+    The sender's preferences as stored now, so a running tracker sees
+    changes made through any worker. Settings missing from the record are
+    filled in from DEFAULT_PREFERENCES; saved ones are never replaced.
+    """
+    prefs = get_record(USER_PREFERENCES_FILE, sender_id)
+    if prefs is None or not DEFAULT_PREFERENCES.keys() <= prefs.keys():
         try:
-            save_user_preferences()
+            prefs = update_data(
+                "preferences",
+                sender_id,
+                lambda current: {**DEFAULT_PREFERENCES, **current},
+                default={},
+            )
         except Exception as e:
             logger.error(f"Error saving initial preferences for {sender_id}: {e}")
-
-    return user_preferences[sender_id]
+            prefs = {**DEFAULT_PREFERENCES, **(prefs or {})}
+    user_preferences[sender_id] = prefs
+    return prefs
 
 
 def set_user_preference(sender_id, key, value):
-    global user_preferences
-
-    if user_preferences is None:
-        user_preferences = {}
-
-    if sender_id not in user_preferences:
-        get_user_preferences(sender_id)
-
-    user_preferences[sender_id][key] = value
-
     try:
-        save_user_preferences()
+        update_data(
+            "preferences",
+            sender_id,
+            lambda prefs: {**DEFAULT_PREFERENCES, **prefs, key: value},
+            default={},
+        )
         return True
     except Exception as e:
         logger.error(f"Error saving preference {key} for {sender_id}: {e}")
         return False
 
 
-def add_price_alert(sender_id, category, item_name, condition, value):
-    if sender_id not in user_price_alerts:
-        user_price_alerts[sender_id] = []
+def toggle_user_preference(sender_id, key):
+    """Flip a boolean preference atomically and return its new value."""
+
+    def apply(prefs):
+        prefs = {**DEFAULT_PREFERENCES, **prefs}
+        prefs[key] = not prefs[key]
+        return prefs
+
+    return update_data("preferences", sender_id, apply, default={})[key]
 
+
+def add_price_alert(sender_id, category, item_name, condition, value):
     alert = {
         "category": category,
         "item_name": item_name,
@@ -537,19 +514,19 @@ def add_price_alert(sender_id, category, item_name, condition, value):
         "created": get_ph_time().isoformat(),
     }
 
-    user_price_alerts[sender_id].append(alert)
-    save_data("price_alerts")
+    update_data("price_alerts", sender_id, lambda alerts: alerts + [alert], default=[])
     return True
 
 
 def check_price_alerts(sender_id, stock_data):
-    if sender_id not in user_price_alerts:
+    alerts = get_record(PRICE_ALERTS_FILE, sender_id)
+    if not alerts:
         return []
 
     triggered_alerts = []
     all_items = get_all_items_from_stock(stock_data)
 
-    for alert in user_price_alerts[sender_id]:
+    for alert in alerts:
         for item in all_items:
             if (
                 normalize_item_name(item["display_name"])
@@ -593,34 +570,34 @@ def parse_tracked_items(items_string):
 
 
 def save_tracked_items(sender_id, items):
-    global user_tracked_items
-
-    if sender_id not in user_tracked_items:
-        user_tracked_items[sender_id] = []
-
-    added_count = 0
-    for item in items:
-        existing_item = next(
-            (
-                x
-                for x in user_tracked_items[sender_id]
-                if x["category"] == item["category"]
-                and normalize_item_name(x["item_name"])
-                == normalize_item_name(item["item_name"])
-            ),
-            None,
-        )
+    added = []
 
-        if not existing_item:
-            user_tracked_items[sender_id].append(item)
-            added_count += 1
-            update_user_stats(sender_id, "track_item")
-            logger.info(
-                f"Added tracked item for {sender_id}: {item['category']}/{item['item_name']}"
+    def apply(tracked):
+        del added[:]
+        for item in items:
+            existing_item = next(
+                (
+                    x
+                    for x in tracked
+                    if x["category"] == item["category"]
+                    and normalize_item_name(x["item_name"])
+                    == normalize_item_name(item["item_name"])
+                ),
+                None,
             )
+            if not existing_item:
+                tracked.append(item)
+                added.append(item)
+        return tracked
 
-    save_tracked_items_to_file()
-    return added_count
+    update_data("tracked_items", sender_id, apply, default=[])
+
+    for item in added:
+        update_user_stats(sender_id, "track_item")
+        logger.info(
+            f"Added tracked item for {sender_id}: {item['category']}/{item['item_name']}"
+        )
+    return len(added)
 
 
 def add_tracked_items(sender_id, items_string):
@@ -709,21 +686,30 @@ def remove_tracked_item(sender_id, item_string):
     item_name = item_name.strip()
 
     item_name_normalized = normalize_item_name(item_name)
+    removed = []
 
-    for i, tracked_item in enumerate(user_tracked_items[sender_id]):
-        if (
-            tracked_item["category"] == category
-            and normalize_item_name(tracked_item["item_name"]) == item_name_normalized
-        ):
-            removed_item = user_tracked_items[sender_id].pop(i)
-            save_data("tracked_items")
-            logger.info(
-                f"Removed tracked item for {sender_id}: {removed_item['category']}/{removed_item['item_name']}"
-            )
-            return (
-                True,
-                f"✅ Removed '{removed_item['category']}/{removed_item['item_name']}' from favorites list.",
-            )
+    def apply(tracked):
+        for i, tracked_item in enumerate(tracked):
+            if (
+                tracked_item["category"] == category
+                and normalize_item_name(tracked_item["item_name"])
+                == item_name_normalized
+            ):
+                removed.append(tracked.pop(i))
+                break
+        return tracked
+
+    update_data("tracked_items", sender_id, apply, default=[])
+
+    if removed:
+        removed_item = removed[0]
+        logger.info(
+            f"Removed tracked item for {sender_id}: {removed_item['category']}/{removed_item['item_name']}"
+        )
+        return (
+            True,
+            f"✅ Removed '{removed_item['category']}/{removed_item['item_name']}' from favorites list.",
+        )
 
     return False, f"❌ '{category}/{item_name}' not found in your favorites list."
 
@@ -754,7 +740,7 @@ def list_tracked_items(sender_id):
             message += "\n"
 
     session_status = ""
-    if sender_id in active_sessions:
+    if sender_id in active_sessions or get_session(SESSION_KIND, sender_id):
         session_status = f"📡 Gagstock: ON (all stocks)\n"
     else:
         session_status = "📴 Gagstock: OFF\n"
@@ -776,9 +762,14 @@ def clear_tracked_items(sender_id):
     if sender_id not in user_tracked_items or not user_tracked_items[sender_id]:
         return "❌ You don't have any favorite items to clear."
 
-    count = len(user_tracked_items[sender_id])
-    user_tracked_items[sender_id] = []
-    save_data("tracked_items")
+    cleared = []
+
+    def apply(tracked):
+        cleared[:] = tracked
+        return []
+
+    update_data("tracked_items", sender_id, apply, default=[])
+    count = len(cleared)
     logger.info(f"Cleared {count} tracked items for {sender_id}")
     return f"✅ Cleared {count} favorite item(s) successfully."
 
@@ -790,9 +781,73 @@ def cleanup_session(sender_id):
         if timer:
             timer.cancel()
         del active_sessions[sender_id]
+        release_session(SESSION_KIND, sender_id, only_if_owner=True)
         logger.info(f"Cleaned up gagstock session for {sender_id}")
 
 
+def restore_sessions(send_message_func):
+    """
+    Resume trackers whose worker exited (deploy or crash). First checks
+    are spread evenly over SESSION_WARMUP_WINDOW seconds so restored
+    sessions do not all fire on the same tick.
+    """
+    orphans = orphaned_sessions(SESSION_KIND)
+    restored = []
+    for sender_id, record in orphans.items():
+        if sender_id in active_sessions or not claim_session(
+            SESSION_KIND, sender_id, record
+        ):
+            continue
+        active_sessions[sender_id] = {
+            "timer": None,
+            "last_version": record.get("last_version"),
+            "last_message_hash": record.get("last_message_hash"),
+        }
+        restored.append(sender_id)
+
+    if restored:
+        # Nothing may have loaded this module's data yet at startup.
+        load_all_data()
+
+    for index, sender_id in enumerate(restored):
+        timer = threading.Timer(
+            SESSION_WARMUP_WINDOW * index / len(restored),
+            fetch_all_data,
+            args=[sender_id, send_message_func],
+        )
+        timer.daemon = True
+        timer.start()
+        active_sessions[sender_id]["timer"] = timer
+
+    if restored:
+        logger.info(f"Restored {len(restored)} gagstock session(s)")
+    return len(restored)
+
+
+def export_state():
+    return {
+        "active_sessions": active_sessions,
+        "stock_analytics": stock_analytics,
+        "user_session_data": user_session_data,
+    }
+
+
+def import_state(state, previous_module):
+    """
+    Hot-reload handoff: keep the running sessions and load the user data
+    they need. Ticks already scheduled run the previous fetch_all_data once
+    and then reschedule through the forwarded name into this module's
+    code, so no tick is lost or doubled.
+    """
+    global active_sessions, stock_analytics, user_session_data
+    load_all_data()
+    active_sessions = state["active_sessions"]
+    stock_analytics = state["stock_analytics"]
+    user_session_data = state["user_session_data"]
+    previous_module.fetch_all_data = fetch_all_data
+    previous_module.cleanup_session = cleanup_session
+
+
 def get_market_summary(stock_data):
     all_items = get_all_items_from_stock(stock_data)
     if not all_items:
@@ -824,68 +879,89 @@ def get_market_summary(stock_data):
     return summary
 
 
+def render_stock_update(stock_data, weather_data, compact_mode, show_rarity):
+    restocks = get_next_restocks()
+    upcoming = get_upcoming_restocks()
+
+    gear_list = format_list(stock_data.get("gear", []), show_rarity)
+    seed_list = format_list(stock_data.get("seed", []), show_rarity)
+    egg_list = format_list(stock_data.get("egg", []), show_rarity)
+    cosmetic_list = format_list(stock_data.get("cosmetic", []), show_rarity)
+    honey_list = format_list(stock_data.get("honey", []), show_rarity)
+
+    weather_icon = weather_data.get("icon", "🌦️")
+    weather_current = weather_data.get("currentWeather", "Unknown")
+    weather_description = weather_data.get("description", "No description")
+    weather_effect = weather_data.get("effectDescription", "No effect")
+    weather_bonus = weather_data.get("cropBonuses", "No bonus")
+    weather_visual = weather_data.get("visualCue", "No visual cue")
+    weather_rarity = weather_data.get("rarity", "Unknown")
+
+    weather_details = (
+        f"🌤️ Weather: {weather_icon} {weather_current}\n"
+        f"📖 Description: {weather_description}\n"
+        f"📌 Effect: {weather_effect}\n"
+        f"🪄 Crop Bonus: {weather_bonus}\n"
+        f"📢 Visual Cue: {weather_visual}\n"
+        f"🌟 Rarity: {weather_rarity}"
+    )
+
+    upcoming_text = ""
+    if upcoming:
+        upcoming_text = "\n\n⚡ UPCOMING RESTOCKS (< 5 min):\n"
+        for category, countdown in upcoming:
+            emoji = get_category_emoji(category)
+            upcoming_text += f"{emoji} {category.title()}: {countdown}\n"
+
+    if compact_mode:
+        message = (
+            f"🌾 GAG Stock Update\n\n"
+            f"🛠️ Gear ({restocks['gear']}): {len(stock_data.get('gear', []))} items\n"
+            f"🌱 Seeds ({restocks['seed']}): {len(stock_data.get('seed', []))} items\n"
+            f"🥚 Eggs ({restocks['egg']}): {len(stock_data.get('egg', []))} items\n"
+            f"🎨 Cosmetic ({restocks['cosmetic']}): {len(stock_data.get('cosmetic', []))} items\n"
+            f"🍯 Honey ({restocks['honey']}): {len(stock_data.get('honey', []))} items\n\n"
+            f"{weather_details}\n\n"
+            f"{get_market_summary(stock_data)}"
+            f"{upcoming_text}"
+        )
+    else:
+        message = (
+            f"🌾 Grow A Garden — Full Stock Tracker\n\n"
+            f"🛠️ Gear:\n{gear_list}\n⏳ Restock in: {restocks['gear']}\n\n"
+            f"🌱 Seeds:\n{seed_list}\n⏳ Restock in: {restocks['seed']}\n\n"
+            f"🥚 Eggs:\n{egg_list}\n⏳ Restock in: {restocks['egg']}\n\n"
+            f"🎨 Cosmetic:\n{cosmetic_list}\n⏳ Restock in: {restocks['cosmetic']}\n\n"
+            f"🍯 Honey:\n{honey_list}\n⏳ Restock in: {restocks['honey']}\n\n"
+            f"{weather_details}\n\n"
+            f"{get_market_summary(stock_data)}"
+            f"{upcoming_text}"
+        )
+
+    return message
+
+
 def fetch_all_data(sender_id, send_message_func):
     if sender_id not in active_sessions:
         logger.info(f"Session {sender_id} no longer active, stopping fetch_all_data")
         return
 
+    if not owns_session(SESSION_KIND, sender_id):
+        logger.info(f"Session {sender_id} was stopped by another worker")
+        cleanup_session(sender_id)
+        return
+
     try:
         logger.debug(f"Fetching data for gagstock session {sender_id}")
 
-        headers = {"User-Agent": "GagStock-Bot/1.0"}
-
-        try:
-            stock_response = requests.get(
-                "https://vmi2625091.contaboserver.net/api/stocks",
-                timeout=15,
-                headers=headers,
-            )
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Stock API request failed: {e}")
-            raise
-
-        try:
-            weather_response = requests.get(
-                "https://growagardenstock.com/api/stock/weather",
-                timeout=15,
-                headers=headers,
-            )
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Weather API request failed: {e}")
-            raise
-
-        if stock_response.status_code != 200:
-            logger.error(
-                f"Stock API error: {stock_response.status_code} - {stock_response.text}"
-            )
-            raise requests.RequestException(
-                f"Stock API returned {stock_response.status_code}"
-            )
-
-        if weather_response.status_code != 200:
-            logger.error(
-                f"Weather API error: {weather_response.status_code} - {weather_response.text}"
-            )
-            raise requests.RequestException(
-                f"Weather API returned {weather_response.status_code}"
-            )
-
-        try:
-            stock_data = stock_response.json()
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse stock data JSON: {e}")
-            raise
-
-        try:
-            weather_data = weather_response.json()
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse weather data JSON: {e}")
-            raise
+        # Never wait for a snapshot here: with none fresh, the backoff
+        # timer below retries instead of parking this thread.
+        stock_data, weather_data = get_stock_snapshot(wait=0)
 
         for item in get_all_items_from_stock(stock_data):
             update_price_history(item["display_name"], item["category"], item["value"])
 
-        combined_key = json.dumps(
+        combined_key = dumps(
             {
                 "gear": stock_data.get("gear", []),
                 "seed": stock_data.get("seed", []),
@@ -903,96 +979,57 @@ def fetch_all_data(sender_id, send_message_func):
             logger.info(f"Session {sender_id} was removed during fetch")
             return
 
+        session["failures"] = 0
+        session["outage_notified"] = False
+
         user_prefs = get_user_preferences(sender_id)
 
-        if combined_key == session.get("last_combined_key"):
+        version = hashlib.md5(combined_key.encode()).hexdigest()[:12]
+        if version == session.get("last_version"):
             logger.debug(f"No changes detected for {sender_id}, scheduling next check")
         else:
             logger.info(f"Data changed for {sender_id}, sending update")
-            session["last_combined_key"] = combined_key
-
-            restocks = get_next_restocks()
-            upcoming = get_upcoming_restocks()
-
-            gear_list = format_list(
-                stock_data.get("gear", []), user_prefs["show_rarity"]
-            )
-            seed_list = format_list(
-                stock_data.get("seed", []), user_prefs["show_rarity"]
-            )
-            egg_list = format_list(stock_data.get("egg", []), user_prefs["show_rarity"])
-            cosmetic_list = format_list(
-                stock_data.get("cosmetic", []), user_prefs["show_rarity"]
-            )
-            honey_list = format_list(
-                stock_data.get("honey", []), user_prefs["show_rarity"]
-            )
-
-            weather_icon = weather_data.get("icon", "🌦️")
-            weather_current = weather_data.get("currentWeather", "Unknown")
-            weather_description = weather_data.get("description", "No description")
-            weather_effect = weather_data.get("effectDescription", "No effect")
-            weather_bonus = weather_data.get("cropBonuses", "No bonus")
-            weather_visual = weather_data.get("visualCue", "No visual cue")
-            weather_rarity = weather_data.get("rarity", "Unknown")
-
-            weather_details = (
-                f"🌤️ Weather: {weather_icon} {weather_current}\n"
-                f"📖 Description: {weather_description}\n"
-                f"📌 Effect: {weather_effect}\n"
-                f"🪄 Crop Bonus: {weather_bonus}\n"
-                f"📢 Visual Cue: {weather_visual}\n"
-                f"🌟 Rarity: {weather_rarity}"
-            )
-
-            upcoming_text = ""
-            if upcoming:
-                upcoming_text = "\n\n⚡ UPCOMING RESTOCKS (< 5 min):\n"
-                for category, countdown in upcoming:
-                    emoji = get_category_emoji(category)
-                    upcoming_text += f"{emoji} {category.title()}: {countdown}\n"
-
-            if user_prefs["compact_mode"]:
-                message = (
-                    f"🌾 GAG Stock Update\n\n"
-                    f"🛠️ Gear ({restocks['gear']}): {len(stock_data.get('gear', []))} items\n"
-                    f"🌱 Seeds ({restocks['seed']}): {len(stock_data.get('seed', []))} items\n"
-                    f"🥚 Eggs ({restocks['egg']}): {len(stock_data.get('egg', []))} items\n"
-                    f"🎨 Cosmetic ({restocks['cosmetic']}): {len(stock_data.get('cosmetic', []))} items\n"
-                    f"🍯 Honey ({restocks['honey']}): {len(stock_data.get('honey', []))} items\n\n"
-                    f"{weather_details}\n\n"
-                    f"{get_market_summary(stock_data)}"
-                    f"{upcoming_text}"
-                )
-            else:
-                message = (
-                    f"🌾 Grow A Garden — Full Stock Tracker\n\n"
-                    f"🛠️ Gear:\n{gear_list}\n⏳ Restock in: {restocks['gear']}\n\n"
-                    f"🌱 Seeds:\n{seed_list}\n⏳ Restock in: {restocks['seed']}\n\n"
-                    f"🥚 Eggs:\n{egg_list}\n⏳ Restock in: {restocks['egg']}\n\n"
-                    f"🎨 Cosmetic:\n{cosmetic_list}\n⏳ Restock in: {restocks['cosmetic']}\n\n"
-                    f"🍯 Honey:\n{honey_list}\n⏳ Restock in: {restocks['honey']}\n\n"
-                    f"{weather_details}\n\n"
-                    f"{get_market_summary(stock_data)}"
-                    f"{upcoming_text}"
-                )
+            session["last_version"] = version
 
+            alert_text = ""
             triggered_alerts = check_price_alerts(sender_id, stock_data)
             if triggered_alerts and user_prefs["price_alerts"]:
-                alert_msg = "\n\n🚨 PRICE ALERTS:\n"
+                alert_text = "\n\n🚨 PRICE ALERTS:\n"
                 for alert_data in triggered_alerts:
                     alert = alert_data["alert"]
                     item = alert_data["item"]
-                    alert_msg += f"• {item['display_name']}: {format_value(item['value'])} ({alert['condition']} {format_value(alert['value'])})\n"
-                message += alert_msg
+                    alert_text += f"• {item['display_name']}: {format_value(item['value'])} ({alert['condition']} {format_value(alert['value'])})\n"
+
+            compact_mode = user_prefs["compact_mode"]
+            show_rarity = user_prefs["show_rarity"]
+            message = message_cache.get_shared(
+                f"gagstock_update_{'compact' if compact_mode else 'full'}_{'rarity' if show_rarity else 'plain'}",
+                lambda: render_stock_update(
+                    stock_data, weather_data, compact_mode, show_rarity
+                ),
+                version=version,
+                ttl=UPDATE_CACHE_DURATION,
+                suffix=alert_text,
+            )
 
-            if message != session.get("last_message"):
-                session["last_message"] = message
-                try:
-                    send_message_func(sender_id, message)
-                    logger.info(f"Sent gagstock update to {sender_id}")
-                except Exception as e:
-                    logger.error(f"Failed to send message to {sender_id}: {e}")
+            message_hash = hashlib.md5(message.encode()).hexdigest()
+            if message_hash != session.get("last_message_hash"):
+                session["last_message_hash"] = message_hash
+                broadcaster.submit(
+                    send_message_func,
+                    sender_id,
+                    message,
+                    priority=PRIORITY_ALERT if alert_text else PRIORITY_UPDATE,
+                    batch=f"gagstock:{version}",
+                )
+                logger.info(f"Queued gagstock update for {sender_id}")
+
+            update_session(
+                SESSION_KIND,
+                sender_id,
+                last_version=version,
+                last_message_hash=session["last_message_hash"],
+            )
 
         if sender_id in active_sessions:
             timer = threading.Timer(
@@ -1005,30 +1042,44 @@ def fetch_all_data(sender_id, send_message_func):
 
     except requests.Timeout:
         logger.error(f"Timeout fetching data for {sender_id}")
-        if sender_id in active_sessions:
+        session = active_sessions.get(sender_id)
+        if session:
+            session["failures"] = session.get("failures", 0) + 1
             timer = threading.Timer(
-                30.0, fetch_all_data, args=[sender_id, send_message_func]
+                get_retry_delay(session["failures"]),
+                fetch_all_data,
+                args=[sender_id, send_message_func],
             )
             timer.daemon = True
             timer.start()
-            active_sessions[sender_id]["timer"] = timer
+            session["timer"] = timer
 
     except requests.RequestException as e:
         logger.error(f"Network error in gagstock for {sender_id}: {e}")
-        if sender_id in active_sessions:
-            try:
-                send_message_func(
-                    sender_id,
-                    "⚠️ Stock API temporarily unavailable\nRetrying in 30 seconds...",
-                )
-            except:
-                pass
+        session = active_sessions.get(sender_id)
+        if session:
+            session["failures"] = session.get("failures", 0) + 1
+            retry_delay = get_retry_delay(session["failures"])
+            available = is_snapshot_available()
+            if available and not session.get("outage_notified"):
+                session["outage_notified"] = True
+                try:
+                    send_message_func(
+                        sender_id,
+                        f"⚠️ Stock API temporarily unavailable\nRetrying in {retry_delay:.0f} seconds...",
+                    )
+                except:
+                    pass
+            elif not available:
+                # Only notices skipped because upstream is down count as
+                # suppressed, not repeats of one already sent.
+                record_suppressed_notification()
             timer = threading.Timer(
-                30.0, fetch_all_data, args=[sender_id, send_message_func]
+                retry_delay, fetch_all_data, args=[sender_id, send_message_func]
             )
             timer.daemon = True
             timer.start()
-            active_sessions[sender_id]["timer"] = timer
+            session["timer"] = timer
 
     except Exception as e:
         logger.error(f"Unexpected error in gagstock for {sender_id}: {e}")
@@ -1043,873 +1094,875 @@ def fetch_all_data(sender_id, send_message_func):
         cleanup_session(sender_id)
 
 
-def execute(sender_id, args, context):
-    send_message_func = context["send_message"]
-
-    spam_check, spam_message = check_spam_protection(sender_id)
-    if not spam_check:
-        send_message_func(sender_id, spam_message)
-        return
+# Where the per-user stats line goes in the shared help text.
+HELP_STATS_PLACEHOLDER = "{your_stats}"
 
-    try:
-        load_all_data()
-    except Exception as e:
-        logger.error(f"Error loading data: {e}")
-        global user_tracked_items, user_price_alerts, user_stats, price_history, user_preferences
-        if "user_tracked_items" not in globals():
-            user_tracked_items = {}
-        if "user_price_alerts" not in globals():
-            user_price_alerts = {}
-        if "user_stats" not in globals():
-            user_stats = {}
-        if "price_history" not in globals():
-            price_history = defaultdict(list)
-        if "user_preferences" not in globals():
-            user_preferences = {}
 
-    update_user_stats(sender_id, "command")
+def render_help_message():
+    upcoming = get_upcoming_restocks()
+    upcoming_text = ""
+    if upcoming:
+        upcoming_text = "\n\n⚡ UPCOMING RESTOCKS (< 5 min):\n"
+        for category, countdown in upcoming:
+            emoji = get_category_emoji(category)
+            upcoming_text += f"{emoji} {category.title()}: {countdown}\n"
+
+    help_message = (
+        "🌾 Gagstock — Advanced Stock Tracker\n\n"
+        f"{router.help_text()}\n\n"
+        f"{HELP_STATS_PLACEHOLDER}\n\n"
+        f"📋 Categories: {', '.join(get_available_categories())}\n"
+        "💡 Examples:\n"
+        "   • 'gagstock gear/ancient_shovel' (adds to favorites)\n"
+        "   • 'gagstock alert egg/legendary above 5000' (price alert)\n"
+        "   • 'gagstock on' (tracks ALL items)\n"
+        "   • 'gagstockfav on' (tracks only your favorites)"
+        f"{upcoming_text}"
+    )
 
-    if not args:
-        cache_key = f"help_{sender_id}"
-        cached_response = get_cached_message(cache_key)
-        if cached_response:
-            send_message_func(sender_id, cached_response)
-            return
+    return help_message.rstrip("\n")
 
-        stats = user_stats.get(sender_id, {})
-        tracked_count = len(user_tracked_items.get(sender_id, []))
-        alerts_count = len(user_price_alerts.get(sender_id, []))
 
-        upcoming = get_upcoming_restocks()
-        upcoming_text = ""
-        if upcoming:
-            upcoming_text = "\n\n⚡ UPCOMING RESTOCKS (< 5 min):\n"
-            for category, countdown in upcoming:
-                emoji = get_category_emoji(category)
-                upcoming_text += f"{emoji} {category.title()}: {countdown}\n"
-
-        help_message = (
-            "🌾 Gagstock — Advanced Stock Tracker\n\n"
-            "📊 Full Stock Tracking:\n"
-            "• 'gagstock on' - Track ALL stock changes\n"
-            "• 'gagstock off' - Stop full stock tracking\n"
-            "• 'gagstock compact' - Toggle compact mode\n\n"
-            "⭐ Favorites Management:\n"
-            "• 'gagstock category/item_name' - Add item to favorites\n"
-            "• 'gagstock cat1/item1|cat2/item2' - Add multiple items\n"
-            "• 'gagstock add category/item_name' - Add item to favorites\n"
-            "• 'gagstock remove category/item_name' - Remove from favorites\n"
-            "• 'gagstock list' - Show your favorite items\n"
-            "• 'gagstock clear' - Clear all favorite items\n\n"
-            "🚨 Price Alerts:\n"
-            "• 'gagstock alert category/item above/below value' - Set price alert\n"
-            "• 'gagstock alerts' - View your price alerts\n"
-            "• 'gagstock removealert ID' - Remove price alert\n\n"
-            "🔍 Stock Information:\n"
-            "• 'gagstock stock' - Show current stock by category\n"
-            "• 'gagstock search [item_name]' - Search for items\n"
-            "• 'gagstock trends category/item' - Show price trends\n"
-            "• 'gagstock market' - Market analysis\n"
-            "• 'gagstock top' - Most valuable items\n"
-            "• 'gagstock restock' - Next restock times\n\n"
-            "⚙️ Settings:\n"
-            "• 'gagstock settings' - View/change preferences\n"
-            "• 'gagstock stats' - Your usage statistics\n\n"
-            f"📊 Your Stats: {tracked_count} favorites | {alerts_count} alerts | {stats.get('commands_used', 0)} commands used\n\n"
-            f"📋 Categories: {', '.join(get_available_categories())}\n"
-            "💡 Examples:\n"
-            "   • 'gagstock gear/ancient_shovel' (adds to favorites)\n"
-            "   • 'gagstock alert egg/legendary above 5000' (price alert)\n"
-            "   • 'gagstock on' (tracks ALL items)\n"
-            "   • 'gagstockfav on' (tracks only your favorites)"
-            f"{upcoming_text}"
+@router.command(
+    "on",
+    help="Track ALL stock changes",
+    section="📊 Full Stock Tracking",
+)
+def _on(sender_id, args, send_message_func):
+    if sender_id in active_sessions or not claim_session(
+        SESSION_KIND, sender_id, {"mode": "all"}
+    ):
+        send_message_func(
+            sender_id,
+            "📡 Gagstock is already tracking all stocks!\n"
+            "💡 Use 'gagstock off' to stop first.",
         )
-
-        cache_message(cache_key, help_message)
-        send_message_func(sender_id, help_message)
         return
 
-    action = args[0].lower()
+    update_user_stats(sender_id, "start_session")
+    prefs = get_user_preferences(sender_id)
 
-    if action == "off":
-        if sender_id in active_sessions:
-            cleanup_session(sender_id)
-            send_message_func(sender_id, "🛑 Gagstock tracking stopped (all stocks).")
-        else:
-            send_message_func(sender_id, "⚠️ You don't have an active gagstock session.")
-        return
+    upcoming = get_upcoming_restocks()
+    upcoming_text = ""
+    if upcoming:
+        upcoming_text = f"\n\n⚡ UPCOMING RESTOCKS (< 5 min):\n"
+        for category, countdown in upcoming:
+            emoji = get_category_emoji(category)
+            upcoming_text += f"{emoji} {category.title()}: {countdown}\n"
+
+    send_message_func(
+        sender_id,
+        "✅ Gagstock started! Tracking ALL stock changes.\n"
+        "🔔 You'll be notified when any stock or weather changes.\n"
+        f"📊 Mode: {'Compact' if prefs['compact_mode'] else 'Detailed'}\n"
+        f"🎯 Rarity indicators: {'ON' if prefs['show_rarity'] else 'OFF'}\n"
+        f"🚨 Price alerts: {'ON' if prefs['price_alerts'] else 'OFF'}\n"
+        f"⚡ Update frequency: Every 8 seconds\n\n"
+        "💡 For favorites-only tracking, use: 'gagstockfav on'\n"
+        "⚙️ Change settings with: 'gagstock settings'"
+        f"{upcoming_text}",
+    )
 
-    elif action == "on":
-        if sender_id in active_sessions:
-            send_message_func(
-                sender_id,
-                "📡 Gagstock is already tracking all stocks!\n"
-                "💡 Use 'gagstock off' to stop first.",
-            )
-            return
+    active_sessions[sender_id] = {
+        "timer": None,
+        "last_version": None,
+        "last_message_hash": None,
+    }
 
-        update_user_stats(sender_id, "start_session")
-        prefs = get_user_preferences(sender_id)
+    logger.info(f"Started full gagstock session for {sender_id}")
+    fetch_all_data(sender_id, send_message_func)
 
-        upcoming = get_upcoming_restocks()
-        upcoming_text = ""
-        if upcoming:
-            upcoming_text = f"\n\n⚡ UPCOMING RESTOCKS (< 5 min):\n"
-            for category, countdown in upcoming:
-                emoji = get_category_emoji(category)
-                upcoming_text += f"{emoji} {category.title()}: {countdown}\n"
 
+@router.command(
+    "off",
+    help="Stop full stock tracking",
+    section="📊 Full Stock Tracking",
+)
+def _off(sender_id, args, send_message_func):
+    if sender_id in active_sessions:
+        cleanup_session(sender_id)
+        send_message_func(sender_id, "🛑 Gagstock tracking stopped (all stocks).")
+    elif release_session(SESSION_KIND, sender_id):
+        # Owned by another worker; its poller stops on its next tick.
+        send_message_func(sender_id, "🛑 Gagstock tracking stopped (all stocks).")
+    else:
+        send_message_func(sender_id, "⚠️ You don't have an active gagstock session.")
+
+
+@router.command("compact", help="Toggle compact mode", section="📊 Full Stock Tracking")
+def _compact(sender_id, args, send_message_func):
+    try:
+        logger.info(f"Compact command called by {sender_id}")
+
+        new_compact_mode = toggle_user_preference(sender_id, "compact_mode")
+        mode = "Compact" if new_compact_mode else "Detailed"
         send_message_func(
             sender_id,
-            "✅ Gagstock started! Tracking ALL stock changes.\n"
-            "🔔 You'll be notified when any stock or weather changes.\n"
-            f"📊 Mode: {'Compact' if prefs['compact_mode'] else 'Detailed'}\n"
-            f"🎯 Rarity indicators: {'ON' if prefs['show_rarity'] else 'OFF'}\n"
-            f"🚨 Price alerts: {'ON' if prefs['price_alerts'] else 'OFF'}\n"
-            f"⚡ Update frequency: Every 8 seconds\n\n"
-            "💡 For favorites-only tracking, use: 'gagstockfav on'\n"
-            "⚙️ Change settings with: 'gagstock settings'"
-            f"{upcoming_text}",
+            f"⚙️ Display mode switched to: {mode}\n"
+            "💡 This affects how stock updates are shown when tracking is active.",
+        )
+        logger.info(
+            f"Successfully changed compact mode for {sender_id} to {new_compact_mode}"
+        )
+    except Exception as e:
+        logger.error(
+            f"Error in compact command for {sender_id}: {str(e)}", exc_info=True
+        )
+        send_message_func(
+            sender_id,
+            f"❌ Error: {str(e)}\n"
+            "💡 Try using 'gagstock settings' to check if preferences are working.",
         )
 
-        active_sessions[sender_id] = {
-            "timer": None,
-            "last_combined_key": None,
-            "last_message": "",
-        }
 
-        logger.info(f"Started full gagstock session for {sender_id}")
-        fetch_all_data(sender_id, send_message_func)
-        return
+@router.fallback(
+    usage="category/item_name",
+    help="Add item to favorites",
+    section="⭐ Favorites Management",
+)
+def _unknown_or_items(sender_id, args, send_message_func):
+    action = args[0].lower()
+    if "/" in action:
+        items_string = " ".join(args)
+        success, message = add_tracked_items(sender_id, items_string)
+        send_message_func(sender_id, message)
+    else:
+        send_message_func(
+            sender_id,
+            f"❌ Unknown command: '{action}'\n"
+            "💡 Use 'gagstock' without arguments to see all available commands.\n"
+            "🔍 Popular commands:\n"
+            "• 'gagstock on' - Start tracking\n"
+            "• 'gagstock search item_name' - Find items\n"
+            "• 'gagstock top' - Most valuable items\n"
+            "• 'gagstock restock' - Next restock times",
+        )
 
-    elif action == "restock":
-        cache_key = f"restock_{sender_id}"
-        cached_response = get_cached_message(cache_key)
-        if cached_response:
-            send_message_func(sender_id, cached_response)
-            return
 
-        restocks = get_next_restocks()
-        upcoming = get_upcoming_restocks()
+router.document(
+    "cat1/item1|cat2/item2", "Add multiple items", section="⭐ Favorites Management"
+)
 
-        message = "⏰ Next Restock Times:\n\n"
 
-        for category in get_available_categories():
-            emoji = get_category_emoji(category)
-            restock_time = restocks.get(category, "Unknown")
-            message += f"{emoji} {category.title()}: {restock_time}\n"
+@router.command(
+    "add",
+    usage="add category/item_name",
+    help="Add item to favorites",
+    section="⭐ Favorites Management",
+)
+def _add(sender_id, args, send_message_func):
+    if not args:
+        send_message_func(
+            sender_id,
+            "⭐ Add Items to Favorites:\n\n"
+            "💡 Format Options:\n"
+            "   • 'gagstock add category/item_name'\n"
+            "   • 'gagstock add cat1/item1|cat2/item2'\n\n"
+            f"📋 Categories: {', '.join(get_available_categories())}\n\n"
+            "🔍 Examples:\n"
+            "   • 'gagstock add gear/ancient_shovel'\n"
+            "   • 'gagstock add egg/legendary|honey/royal_jelly'\n\n"
+            "✨ Pro tip: Use 'gagstock search' to find exact item names!",
+        )
+        return
 
-        if upcoming:
-            message += "\n⚡ UPCOMING RESTOCKS (< 5 min):\n"
-            for category, countdown in upcoming:
-                emoji = get_category_emoji(category)
-                message += f"🔥 {emoji} {category.title()}: {countdown}\n"
+    items_string = " ".join(args)
+    success, message = add_tracked_items(sender_id, items_string)
+    send_message_func(sender_id, message)
 
-        message += (
-            "\n💡 Restock Schedule:\n"
-            "🥚 Eggs: Every 30 minutes\n"
-            "🛠️ Gear & 🌱 Seeds: Every 5 minutes\n"
-            "🍯 Honey: Every hour\n"
-            "🎨 Cosmetics: Every 7 hours\n\n"
-            "🔔 Use 'gagstock on' to get notified of all changes!"
-        )
 
-        cache_message(cache_key, message)
-        send_message_func(sender_id, message)
+@router.command(
+    "remove",
+    usage="remove category/item_name",
+    help="Remove from favorites",
+    section="⭐ Favorites Management",
+)
+def _remove(sender_id, args, send_message_func):
+    if not args:
+        send_message_func(
+            sender_id,
+            "🗑️ Remove Items from Favorites:\n\n"
+            "💡 Format: 'gagstock remove category/item_name'\n"
+            "📋 Example: 'gagstock remove gear/ancient_shovel'\n\n"
+            "🔍 View your favorites: 'gagstock list'",
+        )
         return
 
-    elif action == "compact":
-        try:
-            logger.info(f"Compact command called by {sender_id}")
+    item_string = " ".join(args)
+    success, message = remove_tracked_item(sender_id, item_string)
+    send_message_func(sender_id, message)
 
-            load_user_preferences()
 
-            prefs = get_user_preferences(sender_id)
-            logger.info(
-                f"Current compact mode for {sender_id}: {prefs.get('compact_mode', False)}"
-            )
+@router.command(
+    "list",
+    help="Show your favorite items",
+    section="⭐ Favorites Management",
+)
+def _list(sender_id, args, send_message_func):
+    message = list_tracked_items(sender_id)
+    send_message_func(sender_id, message)
 
-            new_compact_mode = not prefs.get("compact_mode", False)
 
-            if set_user_preference(sender_id, "compact_mode", new_compact_mode):
-                mode = "Compact" if new_compact_mode else "Detailed"
-                send_message_func(
-                    sender_id,
-                    f"⚙️ Display mode switched to: {mode}\n"
-                    "💡 This affects how stock updates are shown when tracking is active.",
-                )
-                logger.info(
-                    f"Successfully changed compact mode for {sender_id} to {new_compact_mode}"
-                )
-            else:
-                send_message_func(
-                    sender_id,
-                    "⚠️ Setting saved but may not persist. Display mode changed for this session.",
-                )
-        except Exception as e:
-            logger.error(
-                f"Error in compact command for {sender_id}: {str(e)}", exc_info=True
-            )
-            send_message_func(
-                sender_id,
-                f"❌ Error: {str(e)}\n"
-                "💡 Try using 'gagstock settings' to check if preferences are working.",
-            )
+@router.command(
+    "clear", help="Clear all favorite items", section="⭐ Favorites Management"
+)
+def _clear(sender_id, args, send_message_func):
+    message = clear_tracked_items(sender_id)
+    send_message_func(sender_id, message)
+
+
+@router.command(
+    "alert",
+    usage="alert category/item above/below value",
+    help="Set price alert",
+    section="🚨 Price Alerts",
+)
+def _alert(sender_id, args, send_message_func):
+    if len(args) < 2:
+        send_message_func(
+            sender_id,
+            "🚨 Price Alert Setup:\n\n"
+            "💡 Format: 'gagstock alert category/item condition value'\n\n"
+            "📋 Conditions:\n"
+            "• above - Alert when price goes above value\n"
+            "• below - Alert when price drops below value\n"
+            "• equals - Alert when price equals value\n\n"
+            "🔍 Examples:\n"
+            "• 'gagstock alert gear/ancient_shovel above 1000'\n"
+            "• 'gagstock alert egg/legendary below 500'\n"
+            "• 'gagstock alert honey/royal_jelly equals 750'",
+        )
         return
 
-    elif action == "settings":
-        try:
-            load_all_data()
-            prefs = get_user_preferences(sender_id)
-            send_message_func(
-                sender_id,
-                "⚙️ Your Gagstock Settings:\n\n"
-                f"📊 Compact mode: {'ON' if prefs['compact_mode'] else 'OFF'}\n"
-                f"🎯 Show rarity: {'ON' if prefs['show_rarity'] else 'OFF'}\n"
-                f"🔔 Notifications: {'ON' if prefs['notifications'] else 'OFF'}\n"
-                f"🚨 Price alerts: {'ON' if prefs['price_alerts'] else 'OFF'}\n"
-                f"💎 Auto-track expensive: {'ON' if prefs['auto_track_expensive'] else 'OFF'}\n\n"
-                "💡 Commands to change settings:\n"
-                "• 'gagstock compact' - Toggle compact mode\n"
-                "• 'gagstock rarity' - Toggle rarity indicators\n"
-                "• 'gagstock notifications' - Toggle notifications\n"
-                "• 'gagstock alertsetting' - Toggle price alert notifications",
-            )
-        except Exception as e:
-            logger.error(f"Error in settings command for {sender_id}: {e}")
-            send_message_func(
-                sender_id, "❌ Error occurred while loading settings. Please try again."
-            )
+    if "/" not in args[0]:
+        send_message_func(sender_id, "❌ Use format: category/item_name")
         return
 
-    elif action == "rarity":
-        try:
-            load_all_data()
-            prefs = get_user_preferences(sender_id)
-            prefs["show_rarity"] = not prefs["show_rarity"]
-            user_preferences[sender_id] = prefs
-            save_data("preferences")
+    category, item_name = args[0].split("/", 1)
+    category = category.lower().strip()
+    condition = args[1].lower().strip()
 
-            status = "ON" if prefs["show_rarity"] else "OFF"
-            send_message_func(
-                sender_id,
-                f"🎯 Rarity indicators: {status}\n"
-                "💡 This shows 💎/⭐/🔥 icons next to valuable items.",
-            )
-        except Exception as e:
-            logger.error(f"Error in rarity command for {sender_id}: {e}")
-            send_message_func(
-                sender_id,
-                "❌ Error occurred while changing rarity setting. Please try again.",
-            )
+    try:
+        value = int(args[2]) if len(args) > 2 else 0
+    except ValueError:
+        send_message_func(sender_id, "❌ Alert value must be a number")
         return
 
-    elif action == "notifications":
-        try:
-            load_all_data()
-            prefs = get_user_preferences(sender_id)
-            prefs["notifications"] = not prefs["notifications"]
-            user_preferences[sender_id] = prefs
-            save_data("preferences")
-
-            status = "ON" if prefs["notifications"] else "OFF"
-            send_message_func(sender_id, f"🔔 Notifications: {status}")
-        except Exception as e:
-            logger.error(f"Error in notifications command for {sender_id}: {e}")
-            send_message_func(
-                sender_id,
-                "❌ Error occurred while changing notification setting. Please try again.",
-            )
+    if category not in get_available_categories():
+        send_message_func(
+            sender_id,
+            f"❌ Invalid category: {category}\n📋 Valid categories: {', '.join(get_available_categories())}",
+        )
         return
 
-    elif action == "alertsetting":
-        try:
-            load_all_data()
-            prefs = get_user_preferences(sender_id)
-            prefs["price_alerts"] = not prefs["price_alerts"]
-            user_preferences[sender_id] = prefs
-            save_data("preferences")
-
-            status = "ON" if prefs["price_alerts"] else "OFF"
-            send_message_func(sender_id, f"🚨 Price alert notifications: {status}")
-        except Exception as e:
-            logger.error(f"Error in alertsetting command for {sender_id}: {e}")
-            send_message_func(
-                sender_id,
-                "❌ Error occurred while changing alert setting. Please try again.",
-            )
+    if condition not in ["above", "below", "equals"]:
+        send_message_func(sender_id, "❌ Condition must be: above, below, or equals")
         return
 
-    elif action == "stats":
-        stats = user_stats.get(sender_id, {})
-        tracked_count = len(user_tracked_items.get(sender_id, []))
-        alerts_count = len(user_price_alerts.get(sender_id, []))
-
-        last_active = stats.get("last_active")
-        if last_active:
-            try:
-                last_active_dt = datetime.fromisoformat(last_active)
-                last_active_str = last_active_dt.strftime("%Y-%m-%d %H:%M")
-            except:
-                last_active_str = "Unknown"
-        else:
-            last_active_str = "Never"
-
-        command_usage_today = user_command_usage.get(sender_id, {})
-        current_minute_window = int(time.time() // 60)
-        today_usage = sum(
-            count
-            for window, count in command_usage_today.items()
-            if window >= current_minute_window - 1440
+    if add_price_alert(sender_id, category, item_name, condition, value):
+        emoji = get_category_emoji(category)
+        send_message_func(
+            sender_id,
+            f"🚨 Price alert created!\n"
+            f"{emoji} Item: {category}/{item_name}\n"
+            f"📊 Condition: {condition} {format_value(value)}\n"
+            f"🔔 You'll be notified when this condition is met.\n\n"
+            f"💡 View all alerts: 'gagstock alerts'",
         )
 
+
+@router.command("alerts", help="View your price alerts", section="🚨 Price Alerts")
+def _alerts(sender_id, args, send_message_func):
+    if sender_id not in user_price_alerts or not user_price_alerts[sender_id]:
         send_message_func(
             sender_id,
-            f"📊 Your Gagstock Statistics:\n\n"
-            f"🎯 Commands used: {stats.get('commands_used', 0)}\n"
-            f"📈 Commands today: {today_usage}\n"
-            f"⭐ Items tracked: {tracked_count}\n"
-            f"🚨 Price alerts: {alerts_count}\n"
-            f"📡 Sessions started: {stats.get('sessions_started', 0)}\n"
-            f"🕐 Last active: {last_active_str}\n"
-            f"❤️ Favorite category: {stats.get('favorite_category', 'None')}\n\n"
-            "💡 Keep using Gagstock to unlock more features!",
+            "🚨 You don't have any price alerts set.\n\n"
+            "💡 Create one with: 'gagstock alert category/item above/below value'\n"
+            "🔍 Example: 'gagstock alert gear/ancient_shovel above 1000'",
         )
         return
 
-    elif action == "alert":
-        if len(args) < 3:
-            send_message_func(
-                sender_id,
-                "🚨 Price Alert Setup:\n\n"
-                "💡 Format: 'gagstock alert category/item condition value'\n\n"
-                "📋 Conditions:\n"
-                "• above - Alert when price goes above value\n"
-                "• below - Alert when price drops below value\n"
-                "• equals - Alert when price equals value\n\n"
-                "🔍 Examples:\n"
-                "• 'gagstock alert gear/ancient_shovel above 1000'\n"
-                "• 'gagstock alert egg/legendary below 500'\n"
-                "• 'gagstock alert honey/royal_jelly equals 750'",
-            )
-            return
+    message = "🚨 Your Price Alerts:\n\n"
+    for i, alert in enumerate(user_price_alerts[sender_id]):
+        emoji = get_category_emoji(alert["category"])
+        message += f"{i+1}. {emoji} {alert['category']}/{alert['item_name']}\n"
+        message += f"   📊 {alert['condition']} {format_value(alert['value'])}\n\n"
 
-        if "/" not in args[1]:
-            send_message_func(sender_id, "❌ Use format: category/item_name")
-            return
+    message += f"📊 Total: {len(user_price_alerts[sender_id])} alert(s)\n"
+    message += "💡 Remove with: 'gagstock removealert ID'"
+    send_message_func(sender_id, message)
 
-        category, item_name = args[1].split("/", 1)
-        category = category.lower().strip()
-        condition = args[2].lower().strip()
 
-        try:
-            value = int(args[3]) if len(args) > 3 else 0
-        except ValueError:
-            send_message_func(sender_id, "❌ Alert value must be a number")
-            return
+@router.command(
+    "removealert",
+    usage="removealert ID",
+    help="Remove price alert",
+    section="🚨 Price Alerts",
+)
+def _removealert(sender_id, args, send_message_func):
+    if not args:
+        send_message_func(sender_id, "💡 Usage: 'gagstock removealert ID'")
+        return
 
-        if category not in get_available_categories():
-            send_message_func(
-                sender_id,
-                f"❌ Invalid category: {category}\n📋 Valid categories: {', '.join(get_available_categories())}",
-            )
-            return
+    try:
+        alert_id = int(args[0]) - 1
+    except ValueError:
+        send_message_func(sender_id, "❌ Alert ID must be a number")
+        return
 
-        if condition not in ["above", "below", "equals"]:
-            send_message_func(
-                sender_id, "❌ Condition must be: above, below, or equals"
-            )
-            return
+    removed = []
 
-        if add_price_alert(sender_id, category, item_name, condition, value):
-            emoji = get_category_emoji(category)
-            send_message_func(
-                sender_id,
-                f"🚨 Price alert created!\n"
-                f"{emoji} Item: {category}/{item_name}\n"
-                f"📊 Condition: {condition} {format_value(value)}\n"
-                f"🔔 You'll be notified when this condition is met.\n\n"
-                f"💡 View all alerts: 'gagstock alerts'",
-            )
+    def apply(alerts):
+        if 0 <= alert_id < len(alerts):
+            removed.append(alerts.pop(alert_id))
+        return alerts
+
+    update_data("price_alerts", sender_id, apply, default=[])
+    if not removed:
+        send_message_func(sender_id, "❌ Invalid alert ID")
         return
 
-    elif action == "alerts":
-        if sender_id not in user_price_alerts or not user_price_alerts[sender_id]:
-            send_message_func(
-                sender_id,
-                "🚨 You don't have any price alerts set.\n\n"
-                "💡 Create one with: 'gagstock alert category/item above/below value'\n"
-                "🔍 Example: 'gagstock alert gear/ancient_shovel above 1000'",
-            )
-            return
+    removed_alert = removed[0]
 
-        message = "🚨 Your Price Alerts:\n\n"
-        for i, alert in enumerate(user_price_alerts[sender_id]):
-            emoji = get_category_emoji(alert["category"])
-            message += f"{i+1}. {emoji} {alert['category']}/{alert['item_name']}\n"
-            message += f"   📊 {alert['condition']} {format_value(alert['value'])}\n\n"
+    send_message_func(
+        sender_id,
+        f"✅ Removed price alert:\n"
+        f"{get_category_emoji(removed_alert['category'])} {removed_alert['category']}/{removed_alert['item_name']} "
+        f"{removed_alert['condition']} {format_value(removed_alert['value'])}",
+    )
 
-        message += f"📊 Total: {len(user_price_alerts[sender_id])} alert(s)\n"
-        message += "💡 Remove with: 'gagstock removealert ID'"
-        send_message_func(sender_id, message)
+
+@router.command(
+    "stock", help="Show current stock by category", section="🔍 Stock Information"
+)
+def _stock(sender_id, args, send_message_func):
+    prefs = get_user_preferences(sender_id)
+    cache_key = shared_key(
+        f"gagstock_stock_{'rarity' if prefs['show_rarity'] else 'plain'}",
+        bucket_seconds=CACHE_DURATION,
+    )
+    cached_response = get_cached_message(cache_key)
+    if cached_response:
+        send_message_func(sender_id, cached_response)
         return
 
-    elif action == "removealert":
-        if len(args) < 2:
-            send_message_func(sender_id, "💡 Usage: 'gagstock removealert ID'")
-            return
+    try:
+        stock_data = fetch_stock_data()
+        restocks = get_next_restocks()
+        upcoming = get_upcoming_restocks()
 
-        try:
-            alert_id = int(args[1]) - 1
-        except ValueError:
-            send_message_func(sender_id, "❌ Alert ID must be a number")
-            return
+        categories = {
+            "gear": stock_data.get("gear", []),
+            "seed": stock_data.get("seed", []),
+            "egg": stock_data.get("egg", []),
+            "honey": stock_data.get("honey", []),
+            "cosmetic": stock_data.get("cosmetic", []),
+        }
 
-        if (
-            sender_id not in user_price_alerts
-            or not user_price_alerts[sender_id]
-            or alert_id < 0
-            or alert_id >= len(user_price_alerts[sender_id])
-        ):
-            send_message_func(sender_id, "❌ Invalid alert ID")
-            return
+        message = "📦 Current Stock:\n\n"
+
+        for category, items in categories.items():
+            emoji = get_category_emoji(category)
+            restock_time = restocks.get(category, "Unknown")
+            total_value = sum(item.get("value", 0) for item in items)
+
+            message += f"{emoji} {category.title()} (⏳ {restock_time}) - Total: {format_value(total_value)}:\n"
+
+            if items:
+                sorted_items = sorted(
+                    items, key=lambda x: x.get("value", 0), reverse=True
+                )
+                for item in sorted_items:
+                    emoji_part = (
+                        f"{item.get('emoji', '')} " if item.get("emoji") else ""
+                    )
+                    name = item.get("name", "Unknown")
+                    value = format_value(item.get("value", 0))
+
+                    rarity_indicator = ""
+                    if prefs["show_rarity"] and item.get("value", 0) > 0:
+                        if item["value"] >= 10000:
+                            rarity_indicator = " 💎"
+                        elif item["value"] >= 1000:
+                            rarity_indicator = " ⭐"
+                        elif item["value"] >= 100:
+                            rarity_indicator = " 🔥"
+
+                    trend = get_price_trend(name, category)
+                    message += (
+                        f"   • {emoji_part}{name}: {value}{rarity_indicator} {trend}\n"
+                    )
+            else:
+                message += "   • No items in stock\n"
+
+            message += "\n"
+
+        if upcoming:
+            message += "⚡ UPCOMING RESTOCKS (< 5 min):\n"
+            for category, countdown in upcoming:
+                emoji = get_category_emoji(category)
+                message += f"🔥 {emoji} {category.title()}: {countdown}\n"
+            message += "\n"
+
+        message += f"{get_market_summary(stock_data)}\n\n"
+        message += "💡 Add to favorites: 'gagstock category/item_name'\n"
+        message += (
+            "🚨 Set price alert: 'gagstock alert category/item above/below value'"
+        )
 
-        removed_alert = user_price_alerts[sender_id].pop(alert_id)
-        save_data("price_alerts")
+        cache_message(cache_key, message)
+        send_message_func(sender_id, message)
+    except StockAPIError as e:
+        send_message_func(
+            sender_id,
+            f"❌ Failed to fetch current stock data. (Status: {e.status_code})",
+        )
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error fetching stock data: {e}")
+        send_message_func(
+            sender_id,
+            "❌ Network error occurred while fetching stock data. Please try again later.",
+        )
+    except Exception as e:
+        logger.error(f"Error fetching stock data: {e}")
+        send_message_func(sender_id, "❌ Error occurred while fetching stock data.")
 
+
+@router.command(
+    "search",
+    usage="search [item_name]",
+    help="Search for items",
+    section="🔍 Stock Information",
+)
+def _search(sender_id, args, send_message_func):
+    if not args:
         send_message_func(
             sender_id,
-            f"✅ Removed price alert:\n"
-            f"{get_category_emoji(removed_alert['category'])} {removed_alert['category']}/{removed_alert['item_name']} "
-            f"{removed_alert['condition']} {format_value(removed_alert['value'])}",
+            "🔍 Smart Search:\n\n"
+            "💡 Usage: 'gagstock search item_name'\n"
+            "🔍 Examples:\n"
+            "• 'gagstock search ancient shovel'\n"
+            "• 'gagstock search legendary'\n"
+            "• 'gagstock search royal'\n\n"
+            "✨ Advanced search features:\n"
+            "• Shows price trends\n"
+            "• Displays rarity indicators\n"
+            "• Quick add to favorites",
         )
         return
 
-    elif action == "trends":
-        if len(args) < 2:
-            send_message_func(
-                sender_id,
-                "📈 Price Trends:\n\n"
-                "💡 Usage: 'gagstock trends category/item_name'\n"
-                "🔍 Example: 'gagstock trends gear/ancient_shovel'\n\n"
-                "This shows recent price movement patterns.",
-            )
-            return
+    item_name = " ".join(args)
+    cache_key = shared_key(
+        f"gagstock_search_{hashlib.md5(item_name.encode()).hexdigest()[:8]}",
+        bucket_seconds=CACHE_DURATION,
+    )
+    cached_response = get_cached_message(cache_key)
+    if cached_response:
+        send_message_func(sender_id, cached_response)
+        return
 
-        if "/" not in args[1]:
-            send_message_func(sender_id, "❌ Use format: category/item_name")
-            return
+    try:
+        stock_data = fetch_stock_data()
+        all_items = get_all_items_from_stock(stock_data)
+        item_name_lower = item_name.lower()
+        found_items = []
 
-        category, item_name = args[1].split("/", 1)
-        category = category.lower().strip()
+        for item in all_items:
+            if item_name_lower in item["name"] or item["name"] in item_name_lower:
+                found_items.append(item)
 
-        trend = get_price_trend(item_name, category)
-        key = f"{category}/{item_name}"
+        found_items.sort(key=lambda x: x["value"], reverse=True)
 
-        if key in price_history and price_history[key]:
-            recent_prices = [entry["value"] for entry in price_history[key][-10:]]
-            if recent_prices:
-                min_price = min(recent_prices)
-                max_price = max(recent_prices)
-                avg_price = statistics.mean(recent_prices)
+        if found_items:
+            if len(found_items) == 1:
+                item = found_items[0]
+                emoji_part = f"{item['emoji']} " if item["emoji"] else ""
+                category_emoji = get_category_emoji(item["category"])
+                trend = get_price_trend(item["display_name"], item["category"])
 
-                send_message_func(
-                    sender_id,
-                    f"📈 Price Trends for {category}/{item_name}:\n\n"
-                    f"📊 Trend: {trend}\n"
-                    f"💰 Current avg: {format_value(avg_price)}\n"
-                    f"📉 Recent low: {format_value(min_price)}\n"
-                    f"📈 Recent high: {format_value(max_price)}\n"
-                    f"📋 Data points: {len(price_history[key])}\n\n"
-                    f"💡 Set price alert: 'gagstock alert {category}/{item_name} above/below value'",
+                rarity = ""
+                if item["value"] >= 10000:
+                    rarity = " 💎 Ultra Rare"
+                elif item["value"] >= 1000:
+                    rarity = " ⭐ Rare"
+                elif item["value"] >= 100:
+                    rarity = " 🔥 Uncommon"
+
+                message = (
+                    f"🔍 Found: {emoji_part}{item['display_name']}\n"
+                    f"{category_emoji} Category: {item['category'].title()}\n"
+                    f"💰 Value: {format_value(item['value'])}{rarity}\n"
+                    f"📈 Trend: {trend}\n\n"
+                    f"💡 Add to favorites: 'gagstock {item['category']}/{item['display_name']}'\n"
+                    f"🚨 Set price alert: 'gagstock alert {item['category']}/{item['display_name']} above/below value'"
                 )
             else:
-                send_message_func(
-                    sender_id, f"📊 No price data available for {category}/{item_name}"
+                message = (
+                    f"🔍 Found {len(found_items)} items matching '{item_name}':\n\n"
                 )
+                for i, item in enumerate(found_items[:15], 1):
+                    emoji_part = f"{item['emoji']} " if item["emoji"] else ""
+                    category_emoji = get_category_emoji(item["category"])
+                    trend = get_price_trend(item["display_name"], item["category"])
+
+                    rarity = ""
+                    if item["value"] >= 10000:
+                        rarity = " 💎"
+                    elif item["value"] >= 1000:
+                        rarity = " ⭐"
+                    elif item["value"] >= 100:
+                        rarity = " 🔥"
+
+                    message += (
+                        f"{i}. {category_emoji} {emoji_part}{item['display_name']}\n"
+                    )
+                    message += (
+                        f"   💰 {format_value(item['value'])}{rarity} | {trend}\n\n"
+                    )
+
+                if len(found_items) > 15:
+                    message += f"... and {len(found_items) - 15} more items\n\n"
+
+                message += "💡 Add any item: 'gagstock category/item_name'\n"
+                message += "🚨 Set price alerts for valuable items!"
+
+            cache_message(cache_key, message)
+            send_message_func(sender_id, message)
         else:
-            send_message_func(
-                sender_id, f"📊 No price history found for {category}/{item_name}"
+            message = (
+                f"❌ Item '{item_name}' not found in current stock.\n"
+                f"💡 Try a different spelling or check 'gagstock stock' for available items.\n"
+                f"🔍 You can also try 'gagstock top' to see the most valuable items."
             )
+            send_message_func(sender_id, message)
+    except StockAPIError as e:
+        send_message_func(
+            sender_id,
+            f"❌ Failed to fetch stock data for search. (Status: {e.status_code})",
+        )
+    except Exception as e:
+        logger.error(f"Error searching for item: {e}")
+        send_message_func(sender_id, "❌ Error occurred while searching.")
+
+
+@router.command(
+    "trends",
+    usage="trends category/item",
+    help="Show price trends",
+    section="🔍 Stock Information",
+)
+def _trends(sender_id, args, send_message_func):
+    if not args:
+        send_message_func(
+            sender_id,
+            "📈 Price Trends:\n\n"
+            "💡 Usage: 'gagstock trends category/item_name'\n"
+            "🔍 Example: 'gagstock trends gear/ancient_shovel'\n\n"
+            "This shows recent price movement patterns.",
+        )
         return
 
-    elif action == "market":
-        cache_key = f"market_{sender_id}"
-        cached_response = get_cached_message(cache_key)
-        if cached_response:
-            send_message_func(sender_id, cached_response)
-            return
+    if "/" not in args[0]:
+        send_message_func(sender_id, "❌ Use format: category/item_name")
+        return
 
-        try:
-            headers = {"User-Agent": "GagStock-Bot/1.0"}
-            stock_response = requests.get(
-                "https://vmi2625091.contaboserver.net/api/stocks",
-                timeout=15,
-                headers=headers,
-            )
+    category, item_name = args[0].split("/", 1)
+    category = category.lower().strip()
 
-            if stock_response.status_code == 200:
-                stock_data = stock_response.json()
-                market_summary = get_market_summary(stock_data)
-
-                all_items = get_all_items_from_stock(stock_data)
-                category_analysis = {}
-
-                for category in get_available_categories():
-                    cat_items = [
-                        item for item in all_items if item["category"] == category
-                    ]
-                    if cat_items:
-                        values = [
-                            item["value"] for item in cat_items if item["value"] > 0
-                        ]
-                        if values:
-                            category_analysis[category] = {
-                                "count": len(cat_items),
-                                "avg_value": statistics.mean(values),
-                                "max_value": max(values),
-                                "total_value": sum(values),
-                            }
-
-                message = f"{market_summary}\n\n📊 Category Analysis:\n\n"
-
-                for category, data in category_analysis.items():
-                    emoji = get_category_emoji(category)
-                    message += f"{emoji} {category.title()}:\n"
-                    message += f"   📦 Items: {data['count']}\n"
-                    message += f"   💰 Avg: {format_value(data['avg_value'])}\n"
-                    message += f"   💎 Max: {format_value(data['max_value'])}\n"
-                    message += f"   💵 Total: {format_value(data['total_value'])}\n\n"
-
-                cache_message(cache_key, message)
-                send_message_func(sender_id, message)
-            else:
-                send_message_func(sender_id, "❌ Failed to fetch market data")
-        except Exception as e:
-            logger.error(f"Error fetching market data: {e}")
+    trend = get_price_trend(item_name, category)
+    key = f"{category}/{item_name}"
+
+    if key in price_history and price_history[key]:
+        recent_prices = [entry["value"] for entry in price_history[key][-10:]]
+        if recent_prices:
+            min_price = min(recent_prices)
+            max_price = max(recent_prices)
+            avg_price = statistics.mean(recent_prices)
+
+            send_message_func(
+                sender_id,
+                f"📈 Price Trends for {category}/{item_name}:\n\n"
+                f"📊 Trend: {trend}\n"
+                f"💰 Current avg: {format_value(avg_price)}\n"
+                f"📉 Recent low: {format_value(min_price)}\n"
+                f"📈 Recent high: {format_value(max_price)}\n"
+                f"📋 Data points: {len(price_history[key])}\n\n"
+                f"💡 Set price alert: 'gagstock alert {category}/{item_name} above/below value'",
+            )
+        else:
             send_message_func(
-                sender_id, "❌ Error occurred while fetching market data."
+                sender_id, f"📊 No price data available for {category}/{item_name}"
             )
+    else:
+        send_message_func(
+            sender_id, f"📊 No price history found for {category}/{item_name}"
+        )
+
+
+@router.command("market", help="Market analysis", section="🔍 Stock Information")
+def _market(sender_id, args, send_message_func):
+    cache_key = shared_key("gagstock_market", bucket_seconds=CACHE_DURATION)
+    cached_response = get_cached_message(cache_key)
+    if cached_response:
+        send_message_func(sender_id, cached_response)
         return
 
-    elif action == "top":
-        cache_key = f"top_{sender_id}"
-        cached_response = get_cached_message(cache_key)
-        if cached_response:
-            send_message_func(sender_id, cached_response)
-            return
+    try:
+        stock_data = fetch_stock_data()
+        market_summary = get_market_summary(stock_data)
 
-        try:
-            headers = {"User-Agent": "GagStock-Bot/1.0"}
-            stock_response = requests.get(
-                "https://vmi2625091.contaboserver.net/api/stocks",
-                timeout=15,
-                headers=headers,
-            )
+        all_items = get_all_items_from_stock(stock_data)
+        category_analysis = {}
 
-            if stock_response.status_code == 200:
-                stock_data = stock_response.json()
-                all_items = get_all_items_from_stock(stock_data)
+        for category in get_available_categories():
+            cat_items = [item for item in all_items if item["category"] == category]
+            if cat_items:
+                values = [item["value"] for item in cat_items if item["value"] > 0]
+                if values:
+                    category_analysis[category] = {
+                        "count": len(cat_items),
+                        "avg_value": statistics.mean(values),
+                        "max_value": max(values),
+                        "total_value": sum(values),
+                    }
+
+        message = f"{market_summary}\n\n📊 Category Analysis:\n\n"
+
+        for category, data in category_analysis.items():
+            emoji = get_category_emoji(category)
+            message += f"{emoji} {category.title()}:\n"
+            message += f"   📦 Items: {data['count']}\n"
+            message += f"   💰 Avg: {format_value(data['avg_value'])}\n"
+            message += f"   💎 Max: {format_value(data['max_value'])}\n"
+            message += f"   💵 Total: {format_value(data['total_value'])}\n\n"
 
-                valuable_items = [item for item in all_items if item["value"] > 0]
-                valuable_items.sort(key=lambda x: x["value"], reverse=True)
+        cache_message(cache_key, message)
+        send_message_func(sender_id, message)
+    except StockAPIError:
+        send_message_func(sender_id, "❌ Failed to fetch market data")
+    except Exception as e:
+        logger.error(f"Error fetching market data: {e}")
+        send_message_func(sender_id, "❌ Error occurred while fetching market data.")
 
-                top_10 = valuable_items[:10]
 
-                message = "💎 Top 10 Most Valuable Items:\n\n"
-                for i, item in enumerate(top_10, 1):
-                    emoji_part = f"{item['emoji']} " if item["emoji"] else ""
-                    category_emoji = get_category_emoji(item["category"])
-                    trend = get_price_trend(item["display_name"], item["category"])
+@router.command("top", help="Most valuable items", section="🔍 Stock Information")
+def _top(sender_id, args, send_message_func):
+    cache_key = shared_key("gagstock_top", bucket_seconds=CACHE_DURATION)
+    cached_response = get_cached_message(cache_key)
+    if cached_response:
+        send_message_func(sender_id, cached_response)
+        return
 
-                    message += f"{i}. {emoji_part}{item['display_name']}\n"
-                    message += f"   {category_emoji} {item['category']} | {format_value(item['value'])} | {trend}\n\n"
+    try:
+        stock_data = fetch_stock_data()
+        all_items = get_all_items_from_stock(stock_data)
 
-                message += "💡 Add to favorites: 'gagstock category/item_name'\n"
-                message += (
-                    "🚨 Set price alert: 'gagstock alert category/item below value'"
-                )
+        valuable_items = [item for item in all_items if item["value"] > 0]
+        valuable_items.sort(key=lambda x: x["value"], reverse=True)
 
-                cache_message(cache_key, message)
-                send_message_func(sender_id, message)
-            else:
-                send_message_func(sender_id, "❌ Failed to fetch stock data")
-        except Exception as e:
-            logger.error(f"Error fetching top items: {e}")
-            send_message_func(sender_id, "❌ Error occurred while fetching top items.")
-        return
+        top_10 = valuable_items[:10]
 
-    elif action == "stock":
-        cache_key = f"stock_{sender_id}"
-        cached_response = get_cached_message(cache_key)
-        if cached_response:
-            send_message_func(sender_id, cached_response)
-            return
+        message = "💎 Top 10 Most Valuable Items:\n\n"
+        for i, item in enumerate(top_10, 1):
+            emoji_part = f"{item['emoji']} " if item["emoji"] else ""
+            category_emoji = get_category_emoji(item["category"])
+            trend = get_price_trend(item["display_name"], item["category"])
 
-        try:
-            headers = {"User-Agent": "GagStock-Bot/1.0"}
-            stock_response = requests.get(
-                "https://vmi2625091.contaboserver.net/api/stocks",
-                timeout=15,
-                headers=headers,
-            )
+            message += f"{i}. {emoji_part}{item['display_name']}\n"
+            message += f"   {category_emoji} {item['category']} | {format_value(item['value'])} | {trend}\n\n"
 
-            if stock_response.status_code == 200:
-                stock_data = stock_response.json()
-                restocks = get_next_restocks()
-                upcoming = get_upcoming_restocks()
-                prefs = get_user_preferences(sender_id)
-
-                categories = {
-                    "gear": stock_data.get("gear", []),
-                    "seed": stock_data.get("seed", []),
-                    "egg": stock_data.get("egg", []),
-                    "honey": stock_data.get("honey", []),
-                    "cosmetic": stock_data.get("cosmetic", []),
-                }
+        message += "💡 Add to favorites: 'gagstock category/item_name'\n"
+        message += "🚨 Set price alert: 'gagstock alert category/item below value'"
 
-                message = "📦 Current Stock:\n\n"
-
-                for category, items in categories.items():
-                    emoji = get_category_emoji(category)
-                    restock_time = restocks.get(category, "Unknown")
-                    total_value = sum(item.get("value", 0) for item in items)
-
-                    message += f"{emoji} {category.title()} (⏳ {restock_time}) - Total: {format_value(total_value)}:\n"
-
-                    if items:
-                        sorted_items = sorted(
-                            items, key=lambda x: x.get("value", 0), reverse=True
-                        )
-                        for item in sorted_items:
-                            emoji_part = (
-                                f"{item.get('emoji', '')} " if item.get("emoji") else ""
-                            )
-                            name = item.get("name", "Unknown")
-                            value = format_value(item.get("value", 0))
-
-                            rarity_indicator = ""
-                            if prefs["show_rarity"] and item.get("value", 0) > 0:
-                                if item["value"] >= 10000:
-                                    rarity_indicator = " 💎"
-                                elif item["value"] >= 1000:
-                                    rarity_indicator = " ⭐"
-                                elif item["value"] >= 100:
-                                    rarity_indicator = " 🔥"
-
-                            trend = get_price_trend(name, category)
-                            message += f"   • {emoji_part}{name}: {value}{rarity_indicator} {trend}\n"
-                    else:
-                        message += "   • No items in stock\n"
-
-                    message += "\n"
-
-                if upcoming:
-                    message += "⚡ UPCOMING RESTOCKS (< 5 min):\n"
-                    for category, countdown in upcoming:
-                        emoji = get_category_emoji(category)
-                        message += f"🔥 {emoji} {category.title()}: {countdown}\n"
-                    message += "\n"
-
-                message += f"{get_market_summary(stock_data)}\n\n"
-                message += "💡 Add to favorites: 'gagstock category/item_name'\n"
-                message += "🚨 Set price alert: 'gagstock alert category/item above/below value'"
-
-                cache_message(cache_key, message)
-                send_message_func(sender_id, message)
-            else:
-                send_message_func(
-                    sender_id,
-                    f"❌ Failed to fetch current stock data. (Status: {stock_response.status_code})",
-                )
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error fetching stock data: {e}")
-            send_message_func(
-                sender_id,
-                "❌ Network error occurred while fetching stock data. Please try again later.",
-            )
-        except Exception as e:
-            logger.error(f"Error fetching stock data: {e}")
-            send_message_func(sender_id, "❌ Error occurred while fetching stock data.")
+        cache_message(cache_key, message)
+        send_message_func(sender_id, message)
+    except StockAPIError:
+        send_message_func(sender_id, "❌ Failed to fetch stock data")
+    except Exception as e:
+        logger.error(f"Error fetching top items: {e}")
+        send_message_func(sender_id, "❌ Error occurred while fetching top items.")
+
+
+@router.command("restock", help="Next restock times", section="🔍 Stock Information")
+def _restock(sender_id, args, send_message_func):
+    cache_key = shared_key("gagstock_restock", bucket_seconds=CACHE_DURATION)
+    cached_response = get_cached_message(cache_key)
+    if cached_response:
+        send_message_func(sender_id, cached_response)
         return
 
-    elif action == "search":
-        if len(args) < 2:
-            send_message_func(
-                sender_id,
-                "🔍 Smart Search:\n\n"
-                "💡 Usage: 'gagstock search item_name'\n"
-                "🔍 Examples:\n"
-                "• 'gagstock search ancient shovel'\n"
-                "• 'gagstock search legendary'\n"
-                "• 'gagstock search royal'\n\n"
-                "✨ Advanced search features:\n"
-                "• Shows price trends\n"
-                "• Displays rarity indicators\n"
-                "• Quick add to favorites",
-            )
-            return
+    restocks = get_next_restocks()
+    upcoming = get_upcoming_restocks()
+
+    message = "⏰ Next Restock Times:\n\n"
+
+    for category in get_available_categories():
+        emoji = get_category_emoji(category)
+        restock_time = restocks.get(category, "Unknown")
+        message += f"{emoji} {category.title()}: {restock_time}\n"
 
-        item_name = " ".join(args[1:])
-        cache_key = (
-            f"search_{sender_id}_{hashlib.md5(item_name.encode()).hexdigest()[:8]}"
+    if upcoming:
+        message += "\n⚡ UPCOMING RESTOCKS (< 5 min):\n"
+        for category, countdown in upcoming:
+            emoji = get_category_emoji(category)
+            message += f"🔥 {emoji} {category.title()}: {countdown}\n"
+
+    message += (
+        "\n💡 Restock Schedule:\n"
+        "🥚 Eggs: Every 30 minutes\n"
+        "🛠️ Gear & 🌱 Seeds: Every 5 minutes\n"
+        "🍯 Honey: Every hour\n"
+        "🎨 Cosmetics: Every 7 hours\n\n"
+        "🔔 Use 'gagstock on' to get notified of all changes!"
+    )
+
+    cache_message(cache_key, message)
+    send_message_func(sender_id, message)
+
+
+@router.command("settings", help="View/change preferences", section="⚙️ Settings")
+def _settings(sender_id, args, send_message_func):
+    try:
+        load_all_data()
+        prefs = get_user_preferences(sender_id)
+        send_message_func(
+            sender_id,
+            "⚙️ Your Gagstock Settings:\n\n"
+            f"📊 Compact mode: {'ON' if prefs['compact_mode'] else 'OFF'}\n"
+            f"🎯 Show rarity: {'ON' if prefs['show_rarity'] else 'OFF'}\n"
+            f"🔔 Notifications: {'ON' if prefs['notifications'] else 'OFF'}\n"
+            f"🚨 Price alerts: {'ON' if prefs['price_alerts'] else 'OFF'}\n"
+            f"💎 Auto-track expensive: {'ON' if prefs['auto_track_expensive'] else 'OFF'}\n\n"
+            "💡 Commands to change settings:\n"
+            "• 'gagstock compact' - Toggle compact mode\n"
+            "• 'gagstock rarity' - Toggle rarity indicators\n"
+            "• 'gagstock notifications' - Toggle notifications\n"
+            "• 'gagstock alertsetting' - Toggle price alert notifications",
         )
-        cached_response = get_cached_message(cache_key)
-        if cached_response:
-            send_message_func(sender_id, cached_response)
-            return
+    except Exception as e:
+        logger.error(f"Error in settings command for {sender_id}: {e}")
+        send_message_func(
+            sender_id, "❌ Error occurred while loading settings. Please try again."
+        )
+
+
+@router.command("stats", help="Your usage statistics", section="⚙️ Settings")
+def _stats(sender_id, args, send_message_func):
+    stats = user_stats.get(sender_id, {})
+    tracked_count = len(user_tracked_items.get(sender_id, []))
+    alerts_count = len(user_price_alerts.get(sender_id, []))
 
+    last_active = stats.get("last_active")
+    if last_active:
         try:
-            headers = {"User-Agent": "GagStock-Bot/1.0"}
-            stock_response = requests.get(
-                "https://vmi2625091.contaboserver.net/api/stocks",
-                timeout=15,
-                headers=headers,
-            )
+            last_active_dt = datetime.fromisoformat(last_active)
+            last_active_str = last_active_dt.strftime("%Y-%m-%d %H:%M")
+        except:
+            last_active_str = "Unknown"
+    else:
+        last_active_str = "Never"
+
+    today_usage = rate_limiter.usage_today(sender_id)
+
+    send_message_func(
+        sender_id,
+        f"📊 Your Gagstock Statistics:\n\n"
+        f"🎯 Commands used: {stats.get('commands_used', 0)}\n"
+        f"📈 Commands today: {today_usage}\n"
+        f"⭐ Items tracked: {tracked_count}\n"
+        f"🚨 Price alerts: {alerts_count}\n"
+        f"📡 Sessions started: {stats.get('sessions_started', 0)}\n"
+        f"🕐 Last active: {last_active_str}\n"
+        f"❤️ Favorite category: {stats.get('favorite_category', 'None')}\n\n"
+        "💡 Keep using Gagstock to unlock more features!",
+    )
 
-            if stock_response.status_code == 200:
-                stock_data = stock_response.json()
-                all_items = get_all_items_from_stock(stock_data)
-                item_name_lower = item_name.lower()
-                found_items = []
-
-                for item in all_items:
-                    if (
-                        item_name_lower in item["name"]
-                        or item["name"] in item_name_lower
-                    ):
-                        found_items.append(item)
-
-                found_items.sort(key=lambda x: x["value"], reverse=True)
-
-                if found_items:
-                    if len(found_items) == 1:
-                        item = found_items[0]
-                        emoji_part = f"{item['emoji']} " if item["emoji"] else ""
-                        category_emoji = get_category_emoji(item["category"])
-                        trend = get_price_trend(item["display_name"], item["category"])
-
-                        rarity = ""
-                        if item["value"] >= 10000:
-                            rarity = " 💎 Ultra Rare"
-                        elif item["value"] >= 1000:
-                            rarity = " ⭐ Rare"
-                        elif item["value"] >= 100:
-                            rarity = " 🔥 Uncommon"
-
-                        message = (
-                            f"🔍 Found: {emoji_part}{item['display_name']}\n"
-                            f"{category_emoji} Category: {item['category'].title()}\n"
-                            f"💰 Value: {format_value(item['value'])}{rarity}\n"
-                            f"📈 Trend: {trend}\n\n"
-                            f"💡 Add to favorites: 'gagstock {item['category']}/{item['display_name']}'\n"
-                            f"🚨 Set price alert: 'gagstock alert {item['category']}/{item['display_name']} above/below value'"
-                        )
-                    else:
-                        message = f"🔍 Found {len(found_items)} items matching '{item_name}':\n\n"
-                        for i, item in enumerate(found_items[:15], 1):
-                            emoji_part = f"{item['emoji']} " if item["emoji"] else ""
-                            category_emoji = get_category_emoji(item["category"])
-                            trend = get_price_trend(
-                                item["display_name"], item["category"]
-                            )
-
-                            rarity = ""
-                            if item["value"] >= 10000:
-                                rarity = " 💎"
-                            elif item["value"] >= 1000:
-                                rarity = " ⭐"
-                            elif item["value"] >= 100:
-                                rarity = " 🔥"
-
-                            message += f"{i}. {category_emoji} {emoji_part}{item['display_name']}\n"
-                            message += f"   💰 {format_value(item['value'])}{rarity} | {trend}\n\n"
-
-                        if len(found_items) > 15:
-                            message += f"... and {len(found_items) - 15} more items\n\n"
-
-                        message += "💡 Add any item: 'gagstock category/item_name'\n"
-                        message += "🚨 Set price alerts for valuable items!"
-
-                    cache_message(cache_key, message)
-                    send_message_func(sender_id, message)
-                else:
-                    message = (
-                        f"❌ Item '{item_name}' not found in current stock.\n"
-                        f"💡 Try a different spelling or check 'gagstock stock' for available items.\n"
-                        f"🔍 You can also try 'gagstock top' to see the most valuable items."
-                    )
-                    send_message_func(sender_id, message)
-            else:
-                send_message_func(
-                    sender_id,
-                    f"❌ Failed to fetch stock data for search. (Status: {stock_response.status_code})",
-                )
-        except Exception as e:
-            logger.error(f"Error searching for item: {e}")
-            send_message_func(sender_id, "❌ Error occurred while searching.")
-        return
 
-    elif action == "add":
-        if len(args) < 2:
-            send_message_func(
-                sender_id,
-                "⭐ Add Items to Favorites:\n\n"
-                "💡 Format Options:\n"
-                "   • 'gagstock add category/item_name'\n"
-                "   • 'gagstock add cat1/item1|cat2/item2'\n\n"
-                f"📋 Categories: {', '.join(get_available_categories())}\n\n"
-                "🔍 Examples:\n"
-                "   • 'gagstock add gear/ancient_shovel'\n"
-                "   • 'gagstock add egg/legendary|honey/royal_jelly'\n\n"
-                "✨ Pro tip: Use 'gagstock search' to find exact item names!",
-            )
-            return
+@router.command("rarity")
+def _rarity(sender_id, args, send_message_func):
+    try:
+        status = "ON" if toggle_user_preference(sender_id, "show_rarity") else "OFF"
+        send_message_func(
+            sender_id,
+            f"🎯 Rarity indicators: {status}\n"
+            "💡 This shows 💎/⭐/🔥 icons next to valuable items.",
+        )
+    except Exception as e:
+        logger.error(f"Error in rarity command for {sender_id}: {e}")
+        send_message_func(
+            sender_id,
+            "❌ Error occurred while changing rarity setting. Please try again.",
+        )
 
-        items_string = " ".join(args[1:])
-        success, message = add_tracked_items(sender_id, items_string)
-        send_message_func(sender_id, message)
-        return
 
-    elif action == "remove":
-        if len(args) < 2:
-            send_message_func(
-                sender_id,
-                "🗑️ Remove Items from Favorites:\n\n"
-                "💡 Format: 'gagstock remove category/item_name'\n"
-                "📋 Example: 'gagstock remove gear/ancient_shovel'\n\n"
-                "🔍 View your favorites: 'gagstock list'",
-            )
-            return
+@router.command("notifications")
+def _notifications(sender_id, args, send_message_func):
+    try:
+        status = "ON" if toggle_user_preference(sender_id, "notifications") else "OFF"
+        send_message_func(sender_id, f"🔔 Notifications: {status}")
+    except Exception as e:
+        logger.error(f"Error in notifications command for {sender_id}: {e}")
+        send_message_func(
+            sender_id,
+            "❌ Error occurred while changing notification setting. Please try again.",
+        )
 
-        item_string = " ".join(args[1:])
-        success, message = remove_tracked_item(sender_id, item_string)
-        send_message_func(sender_id, message)
-        return
 
-    elif action == "list":
-        message = list_tracked_items(sender_id)
-        send_message_func(sender_id, message)
+@router.command("alertsetting")
+def _alertsetting(sender_id, args, send_message_func):
+    try:
+        status = "ON" if toggle_user_preference(sender_id, "price_alerts") else "OFF"
+        send_message_func(sender_id, f"🚨 Price alert notifications: {status}")
+    except Exception as e:
+        logger.error(f"Error in alertsetting command for {sender_id}: {e}")
+        send_message_func(
+            sender_id,
+            "❌ Error occurred while changing alert setting. Please try again.",
+        )
+
+
+def execute(sender_id, args, context):
+    send_message_func = context["send_message"]
+
+    matched = router.match(args)
+    spam_check, spam_message = check_spam_protection(
+        sender_id, matched[0].path if matched else (args[0].lower() if args else None)
+    )
+    if not spam_check:
+        send_message_func(sender_id, spam_message)
         return
 
-    elif action == "clear":
-        message = clear_tracked_items(sender_id)
-        send_message_func(sender_id, message)
+    try:
+        load_all_data()
+    except Exception as e:
+        logger.error(f"Error loading data: {e}")
+        global user_tracked_items, user_price_alerts, user_stats, price_history, user_preferences
+        if "user_tracked_items" not in globals():
+            user_tracked_items = {}
+        if "user_price_alerts" not in globals():
+            user_price_alerts = {}
+        if "user_stats" not in globals():
+            user_stats = {}
+        if "price_history" not in globals():
+            price_history = defaultdict(list)
+        if "user_preferences" not in globals():
+            user_preferences = {}
+
+    update_user_stats(sender_id, "command")
+
+    if not args:
+        stats = user_stats.get(sender_id, {})
+        tracked_count = len(user_tracked_items.get(sender_id, []))
+        alerts_count = len(user_price_alerts.get(sender_id, []))
+        stats_text = f"📊 Your Stats: {tracked_count} favorites | {alerts_count} alerts | {stats.get('commands_used', 0)} commands used"
+
+        help_message = message_cache.get_shared(
+            "gagstock_help",
+            render_help_message,
+            bucket_seconds=CACHE_DURATION,
+            ttl=CACHE_DURATION,
+        ).replace(HELP_STATS_PLACEHOLDER, stats_text, 1)
+        send_message_func(sender_id, help_message)
         return
 
-    else:
-        if "/" in action:
-            items_string = " ".join(args)
-            success, message = add_tracked_items(sender_id, items_string)
-            send_message_func(sender_id, message)
-        else:
-            send_message_func(
-                sender_id,
-                f"❌ Unknown command: '{action}'\n"
-                "💡 Use 'gagstock' without arguments to see all available commands.\n"
-                "🔍 Popular commands:\n"
-                "• 'gagstock on' - Start tracking\n"
-                "• 'gagstock search item_name' - Find items\n"
-                "• 'gagstock top' - Most valuable items\n"
-                "• 'gagstock restock' - Next restock times",
-            )
+    router.dispatch(sender_id, args, send_message_func)
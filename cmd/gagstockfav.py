@@ -1,11 +1,9 @@
 import threading
 import requests
-import json
 import logging
+import sys
 from datetime import datetime, timedelta
-import time
 import os
-import pickle
 from collections import defaultdict
 import statistics
 import hashlib
@@ -15,6 +13,32 @@ try:
 except ImportError:
     pytz = None
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from functions.broadcast import PRIORITY_ALERT, broadcaster
+from functions.commandRouter import Router
+from functions.fetchStock import (
+    fetch_stock_data,
+    get_retry_delay,
+    record_suppressed_notification,
+    StockAPIError,
+)
+from functions.jsonCodec import dumps
+from functions.messageCache import message_cache, shared_key
+from functions.rateLimiter import RateLimiter
+from functions.sharedState import (
+    claim_session,
+    get_record,
+    load_records,
+    owns_session,
+    orphaned_sessions,
+    release_session,
+    shared_state,
+    update_record,
+    update_session,
+)
+from functions.stockPoller import get_stock_snapshot, is_snapshot_available
+from functions.tracing import traced
+
 logger = logging.getLogger(__name__)
 
 user_favorite_sessions = {}
@@ -24,15 +48,13 @@ user_favorite_stats = {}
 user_notification_history = {}
 user_custom_filters = {}
 price_history = defaultdict(list)
-user_last_command_time = {}
-user_command_usage = defaultdict(int)
-message_cache = {}
 
 PH_OFFSET = 8
 COMMAND_COOLDOWN = 3
 SPAM_THRESHOLD = 5
 CACHE_DURATION = 60
 MAX_COMMANDS_PER_MINUTE = 8
+COMMAND_COSTS = {"on": 2, "test": 2, "recommend": 2}
 
 TRACKED_ITEMS_FILE = "gagstock_tracked_items.pkl"
 USER_PREFERENCES_FILE = "gagstock_user_preferences.pkl"
@@ -40,8 +62,46 @@ FAVORITE_STATS_FILE = "gagstockfav_stats.pkl"
 NOTIFICATION_HISTORY_FILE = "gagstockfav_notifications.pkl"
 CUSTOM_FILTERS_FILE = "gagstockfav_filters.pkl"
 PRICE_HISTORY_FILE = "gagstock_price_history.pkl"
-
-
+SESSION_KIND = "gagstockfav"
+SESSION_WARMUP_WINDOW = 30
+
+DEFAULT_PREFERENCES = {
+    "smart_notifications": True,
+    "value_threshold": 0,
+    "priority_categories": [],
+    "notification_cooldown": 300,
+    "show_price_trends": True,
+    "compact_notifications": False,
+    "alert_sound": True,
+    "daily_summary": False,
+    "auto_remove_purchased": False,
+}
+DEFAULT_FAVORITE_STATS = {
+    "notifications_sent": 0,
+    "items_found": 0,
+    "total_value_found": 0,
+    "favorite_categories": {},
+    "sessions_started": 0,
+    "last_notification": None,
+    "best_find_value": 0,
+    "best_find_item": None,
+}
+
+rate_limiter = RateLimiter(
+    MAX_COMMANDS_PER_MINUTE,
+    refill_period=60.0,
+    cooldown=COMMAND_COOLDOWN,
+    command_costs=COMMAND_COSTS,
+    store=shared_state,
+    namespace="ratelimit:gagstockfav",
+)
+
+# Subcommands register on this below; execute() dispatches through it and
+# the help message lists what is registered.
+router = Router("gagstockfav")
+
+
+@traced("gagstockfav.load_all_data")
 def load_all_data():
     global user_tracked_items, user_preferences, user_favorite_stats, user_notification_history, user_custom_filters, price_history
 
@@ -56,17 +116,11 @@ def load_all_data():
 
     for file_path, var_name in files_to_load:
         try:
-            if os.path.exists(file_path):
-                with open(file_path, "rb") as f:
-                    data = pickle.load(f)
-                    globals()[var_name] = data
-                logger.info(f"Loaded {var_name} from {file_path}")
-            else:
-                if var_name == "price_history":
-                    globals()[var_name] = defaultdict(list)
-                else:
-                    globals()[var_name] = {}
-                logger.info(f"No existing {file_path} found, starting fresh")
+            data = load_records(file_path)
+            if var_name == "price_history":
+                data = defaultdict(list, data)
+            globals()[var_name] = data
+            logger.info(f"Loaded {var_name} from {file_path}")
         except Exception as e:
             logger.error(f"Error loading {file_path}: {e}")
             if var_name == "price_history":
@@ -75,73 +129,39 @@ def load_all_data():
                 globals()[var_name] = {}
 
 
-def save_data(data_type):
+def update_data(data_type, key, fn, default=None):
+    """
+    Change one record with `fn` in the shared store, atomically across
+    workers, and refresh this worker's copy with the result.
+    """
     file_mapping = {
         "tracked_items": (TRACKED_ITEMS_FILE, user_tracked_items),
         "preferences": (USER_PREFERENCES_FILE, user_preferences),
         "favorite_stats": (FAVORITE_STATS_FILE, user_favorite_stats),
         "notifications": (NOTIFICATION_HISTORY_FILE, user_notification_history),
         "filters": (CUSTOM_FILTERS_FILE, user_custom_filters),
-        "price_history": (PRICE_HISTORY_FILE, dict(price_history)),
+        "price_history": (PRICE_HISTORY_FILE, price_history),
     }
 
-    try:
-        file_path, data = file_mapping[data_type]
-        with open(file_path, "wb") as f:
-            pickle.dump(data, f)
-        logger.debug(f"Saved {data_type} to {file_path}")
-    except Exception as e:
-        logger.error(f"Error saving {data_type}: {e}")
-
-
-def check_spam_protection(sender_id):
-    current_time = time.time()
-    minute_window = int(current_time // 60)
-
-    if sender_id not in user_command_usage:
-        user_command_usage[sender_id] = {}
-
-    if minute_window not in user_command_usage[sender_id]:
-        user_command_usage[sender_id] = {minute_window: 1}
+    namespace, data = file_mapping[data_type]
+    value = update_record(namespace, key, fn, default)
+    if value is None:
+        data.pop(key, None)
     else:
-        user_command_usage[sender_id][minute_window] += 1
-
-    old_windows = [w for w in user_command_usage[sender_id] if w < minute_window - 2]
-    for w in old_windows:
-        del user_command_usage[sender_id][w]
+        data[key] = value
+    return value
 
-    if user_command_usage[sender_id][minute_window] > MAX_COMMANDS_PER_MINUTE:
-        return (
-            False,
-            f"⚠️ Rate limit exceeded. Please wait before sending more commands. (Max {MAX_COMMANDS_PER_MINUTE}/minute)",
-        )
-
-    if sender_id in user_last_command_time:
-        time_since_last = current_time - user_last_command_time[sender_id]
-        if time_since_last < COMMAND_COOLDOWN:
-            remaining = COMMAND_COOLDOWN - time_since_last
-            return (
-                False,
-                f"⏳ Please wait {remaining:.1f} more seconds before using another command.",
-            )
 
-    user_last_command_time[sender_id] = current_time
-    return True, None
+def check_spam_protection(sender_id, command=None):
+    return rate_limiter.check(sender_id, command)
 
 
 def get_cached_message(cache_key):
-    current_time = time.time()
-    if cache_key in message_cache:
-        cached_data = message_cache[cache_key]
-        if current_time - cached_data["timestamp"] < CACHE_DURATION:
-            return cached_data["message"]
-        else:
-            del message_cache[cache_key]
-    return None
+    return message_cache.get(cache_key)
 
 
 def cache_message(cache_key, message):
-    message_cache[cache_key] = {"message": message, "timestamp": time.time()}
+    message_cache.set(cache_key, message, ttl=CACHE_DURATION)
 
 
 def pad(n):
@@ -345,68 +365,88 @@ def normalize_item_name(name):
 
 
 def get_user_preferences(sender_id):
-    if sender_id not in user_preferences:
-        user_preferences[sender_id] = {
-            "smart_notifications": True,
-            "value_threshold": 0,
-            "priority_categories": [],
-            "notification_cooldown": 300,
-            "show_price_trends": True,
-            "compact_notifications": False,
-            "alert_sound": True,
-            "daily_summary": False,
-            "auto_remove_purchased": False,
-        }
-        save_data("preferences")
-    return user_preferences[sender_id]
+    """
+    The sender's preferences as stored now, so a running tracker sees
+    changes made through any worker. Settings missing from the record are
+    filled in from DEFAULT_PREFERENCES; saved ones are never replaced.
+    """
+    prefs = get_record(USER_PREFERENCES_FILE, sender_id)
+    if prefs is None or not DEFAULT_PREFERENCES.keys() <= prefs.keys():
+        try:
+            prefs = update_data(
+                "preferences",
+                sender_id,
+                lambda current: {**DEFAULT_PREFERENCES, **current},
+                default={},
+            )
+        except Exception as e:
+            logger.error(f"Error saving initial preferences for {sender_id}: {e}")
+            prefs = {**DEFAULT_PREFERENCES, **(prefs or {})}
+    user_preferences[sender_id] = prefs
+    return prefs
+
+
+def set_user_preference(sender_id, key, value):
+    update_data(
+        "preferences",
+        sender_id,
+        lambda prefs: {**DEFAULT_PREFERENCES, **prefs, key: value},
+        default={},
+    )
+
+
+def toggle_user_preference(sender_id, key):
+    """Flip a boolean preference atomically and return its new value."""
+
+    def apply(prefs):
+        prefs = {**DEFAULT_PREFERENCES, **prefs}
+        prefs[key] = not prefs[key]
+        return prefs
+
+    return update_data("preferences", sender_id, apply, default={})[key]
 
 
 def get_user_stats(sender_id):
-    if sender_id not in user_favorite_stats:
-        user_favorite_stats[sender_id] = {
-            "notifications_sent": 0,
-            "items_found": 0,
-            "total_value_found": 0,
-            "favorite_categories": {},
-            "sessions_started": 0,
-            "last_notification": None,
-            "best_find_value": 0,
-            "best_find_item": None,
-        }
-        save_data("favorite_stats")
-    return user_favorite_stats[sender_id]
+    stats = get_record(FAVORITE_STATS_FILE, sender_id)
+    if stats is None:
+        return dict(DEFAULT_FAVORITE_STATS, favorite_categories={})
+    user_favorite_stats[sender_id] = stats
+    return stats
 
 
 def update_user_stats(sender_id, action, data=None):
-    stats = get_user_stats(sender_id)
-
-    if action == "notification_sent":
-        stats["notifications_sent"] += 1
-        stats["last_notification"] = get_ph_time().isoformat()
-    elif action == "item_found":
-        stats["items_found"] += 1
-        if data and "value" in data:
-            stats["total_value_found"] += data["value"]
-            if data["value"] > stats["best_find_value"]:
-                stats["best_find_value"] = data["value"]
-                stats["best_find_item"] = data.get("name", "Unknown")
-        if data and "category" in data:
-            category = data["category"]
-            stats["favorite_categories"][category] = (
-                stats["favorite_categories"].get(category, 0) + 1
-            )
-    elif action == "session_started":
-        stats["sessions_started"] += 1
+    def apply(stats):
+        if action == "notification_sent":
+            stats["notifications_sent"] += 1
+            stats["last_notification"] = get_ph_time().isoformat()
+        elif action == "item_found":
+            stats["items_found"] += 1
+            if data and "value" in data:
+                stats["total_value_found"] += data["value"]
+                if data["value"] > stats["best_find_value"]:
+                    stats["best_find_value"] = data["value"]
+                    stats["best_find_item"] = data.get("name", "Unknown")
+            if data and "category" in data:
+                category = data["category"]
+                stats["favorite_categories"][category] = (
+                    stats["favorite_categories"].get(category, 0) + 1
+                )
+        elif action == "session_started":
+            stats["sessions_started"] += 1
+        return stats
 
-    save_data("favorite_stats")
+    try:
+        update_data("favorite_stats", sender_id, apply, default=DEFAULT_FAVORITE_STATS)
+    except Exception as e:
+        logger.error(f"Error updating favorite stats for {sender_id}: {e}")
 
 
 def get_price_trend(item_name, category):
-    key = f"{category}/{item_name}"
-    if key not in price_history or len(price_history[key]) < 2:
+    history = get_record(PRICE_HISTORY_FILE, f"{category}/{item_name}", [])
+    if len(history) < 2:
         return "📊 No trend data"
 
-    recent_prices = [entry["value"] for entry in price_history[key][-10:]]
+    recent_prices = [entry["value"] for entry in history[-10:]]
     if len(recent_prices) < 2:
         return "📊 Insufficient data"
 
@@ -425,23 +465,21 @@ def get_price_trend(item_name, category):
 
 
 def add_notification_to_history(sender_id, item_data):
-    if sender_id not in user_notification_history:
-        user_notification_history[sender_id] = []
-
     notification = {
         "timestamp": get_ph_time().isoformat(),
         "item": item_data,
         "value": item_data.get("value", 0),
     }
 
-    user_notification_history[sender_id].append(notification)
-
-    if len(user_notification_history[sender_id]) > 100:
-        user_notification_history[sender_id] = user_notification_history[sender_id][
-            -100:
-        ]
-
-    save_data("notifications")
+    try:
+        update_data(
+            "notifications",
+            sender_id,
+            lambda history: (history + [notification])[-100:],
+            default=[],
+        )
+    except Exception as e:
+        logger.error(f"Error saving notification history for {sender_id}: {e}")
 
 
 def should_send_notification(sender_id, item):
@@ -456,9 +494,9 @@ def should_send_notification(sender_id, item):
     ):
         return False
 
-    if sender_id in user_notification_history:
-        last_notifications = user_notification_history[sender_id][-5:]
-        for notif in last_notifications:
+    history = get_record(NOTIFICATION_HISTORY_FILE, sender_id, [])
+    if history:
+        for notif in history[-5:]:
             if (
                 notif["item"]["display_name"] == item["display_name"]
                 and notif["item"]["category"] == item["category"]
@@ -473,13 +511,14 @@ def should_send_notification(sender_id, item):
 
 
 def check_tracked_items_in_stock(sender_id, stock_data):
-    if sender_id not in user_tracked_items or not user_tracked_items[sender_id]:
+    tracked_items = get_record(TRACKED_ITEMS_FILE, sender_id)
+    if not tracked_items:
         return []
 
     tracked_in_stock = []
     all_items = get_all_items_from_stock(stock_data)
 
-    for tracked_item in user_tracked_items[sender_id]:
+    for tracked_item in tracked_items:
         for item in all_items:
             item_normalized = normalize_item_name(item["display_name"])
             tracked_normalized = normalize_item_name(tracked_item["item_name"])
@@ -508,11 +547,12 @@ def check_tracked_items_in_stock(sender_id, stock_data):
 
 
 def get_smart_recommendations(sender_id, stock_data):
-    if sender_id not in user_tracked_items:
+    tracked_items = get_record(TRACKED_ITEMS_FILE, sender_id)
+    if not tracked_items:
         return []
 
     all_items = get_all_items_from_stock(stock_data)
-    tracked_categories = set(item["category"] for item in user_tracked_items[sender_id])
+    tracked_categories = set(item["category"] for item in tracked_items)
 
     recommendations = []
     for item in all_items:
@@ -522,7 +562,7 @@ def get_smart_recommendations(sender_id, stock_data):
             and not any(
                 normalize_item_name(tracked["item_name"])
                 == normalize_item_name(item["display_name"])
-                for tracked in user_tracked_items[sender_id]
+                for tracked in tracked_items
             )
         ):
             recommendations.append(item)
@@ -537,9 +577,64 @@ def cleanup_favorite_session(sender_id):
         if timer:
             timer.cancel()
         del user_favorite_sessions[sender_id]
+        release_session(SESSION_KIND, sender_id, only_if_owner=True)
         logger.info(f"Cleaned up gagstockfav session for {sender_id}")
 
 
+def restore_sessions(send_message_func):
+    """
+    Resume favorite trackers whose worker exited, spreading their first
+    checks over SESSION_WARMUP_WINDOW seconds.
+    """
+    orphans = orphaned_sessions(SESSION_KIND)
+    restored = []
+    for sender_id, record in orphans.items():
+        if sender_id in user_favorite_sessions or not claim_session(
+            SESSION_KIND, sender_id, record
+        ):
+            continue
+        user_favorite_sessions[sender_id] = {
+            "timer": None,
+            "last_version": record.get("last_version"),
+            "last_message_hash": record.get("last_message_hash"),
+        }
+        restored.append(sender_id)
+
+    if restored:
+        # Nothing may have loaded this module's data yet at startup.
+        load_all_data()
+
+    for index, sender_id in enumerate(restored):
+        timer = threading.Timer(
+            SESSION_WARMUP_WINDOW * index / len(restored),
+            fetch_favorite_data,
+            args=[sender_id, send_message_func],
+        )
+        timer.daemon = True
+        timer.start()
+        user_favorite_sessions[sender_id]["timer"] = timer
+
+    if restored:
+        logger.info(f"Restored {len(restored)} gagstockfav session(s)")
+    return len(restored)
+
+
+def export_state():
+    return {"user_favorite_sessions": user_favorite_sessions}
+
+
+def import_state(state, previous_module):
+    """
+    Hot-reload handoff: keep the running sessions, load the user data they
+    need and route their next ticks into this module's fetch_favorite_data.
+    """
+    global user_favorite_sessions
+    load_all_data()
+    user_favorite_sessions = state["user_favorite_sessions"]
+    previous_module.fetch_favorite_data = fetch_favorite_data
+    previous_module.cleanup_favorite_session = cleanup_favorite_session
+
+
 def fetch_favorite_data(sender_id, send_message_func):
     if sender_id not in user_favorite_sessions:
         logger.info(
@@ -547,60 +642,19 @@ def fetch_favorite_data(sender_id, send_message_func):
         )
         return
 
+    if not owns_session(SESSION_KIND, sender_id):
+        logger.info(f"Favorite session {sender_id} was stopped by another worker")
+        cleanup_favorite_session(sender_id)
+        return
+
     try:
         logger.debug(f"Fetching data for gagstockfav session {sender_id}")
 
-        headers = {"User-Agent": "GagStock-Bot/1.0"}
-
-        try:
-            stock_response = requests.get(
-                "https://vmi2625091.contaboserver.net/api/stocks",
-                timeout=15,
-                headers=headers,
-            )
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Stock API request failed for favorites: {e}")
-            raise
-
-        try:
-            weather_response = requests.get(
-                "https://growagardenstock.com/api/stock/weather",
-                timeout=15,
-                headers=headers,
-            )
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Weather API request failed for favorites: {e}")
-            raise
-
-        if stock_response.status_code != 200:
-            logger.error(
-                f"Stock API error for favorites: {stock_response.status_code} - {stock_response.text}"
-            )
-            raise requests.RequestException(
-                f"Stock API returned {stock_response.status_code}"
-            )
-
-        if weather_response.status_code != 200:
-            logger.error(
-                f"Weather API error for favorites: {weather_response.status_code} - {weather_response.text}"
-            )
-            raise requests.RequestException(
-                f"Weather API returned {weather_response.status_code}"
-            )
-
-        try:
-            stock_data = stock_response.json()
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse stock data JSON for favorites: {e}")
-            raise
-
-        try:
-            weather_data = weather_response.json()
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse weather data JSON for favorites: {e}")
-            raise
+        # Never wait for a snapshot here: with none fresh, the backoff
+        # timer below retries instead of parking this thread.
+        stock_data, weather_data = get_stock_snapshot(wait=0)
 
-        combined_key = json.dumps(
+        combined_key = dumps(
             {
                 "gear": stock_data.get("gear", []),
                 "seed": stock_data.get("seed", []),
@@ -618,9 +672,13 @@ def fetch_favorite_data(sender_id, send_message_func):
             logger.info(f"Favorite session {sender_id} was removed during fetch")
             return
 
+        session["failures"] = 0
+        session["outage_notified"] = False
+
         prefs = get_user_preferences(sender_id)
 
-        if combined_key == session.get("last_combined_key"):
+        version = hashlib.md5(combined_key.encode()).hexdigest()[:12]
+        if version == session.get("last_version"):
             logger.debug(
                 f"No changes detected for favorites {sender_id}, scheduling next check"
             )
@@ -628,7 +686,7 @@ def fetch_favorite_data(sender_id, send_message_func):
             logger.info(
                 f"Data changed for favorites {sender_id}, checking tracked items"
             )
-            session["last_combined_key"] = combined_key
+            session["last_version"] = version
 
             tracked_in_stock = check_tracked_items_in_stock(sender_id, stock_data)
 
@@ -724,16 +782,25 @@ def fetch_favorite_data(sender_id, send_message_func):
                             message += f"• {emoji_part}{rec['display_name']}: {format_value(rec['value'])}\n"
                         message += "\n💭 Consider adding these valuable items to your favorites!"
 
-                if message != session.get("last_message"):
-                    session["last_message"] = message
-                    try:
-                        send_message_func(sender_id, message)
-                        update_user_stats(sender_id, "notification_sent")
-                        logger.info(f"Sent gagstockfav update to {sender_id}")
-                    except Exception as e:
-                        logger.error(
-                            f"Failed to send favorite message to {sender_id}: {e}"
-                        )
+                message_hash = hashlib.md5(message.encode()).hexdigest()
+                if message_hash != session.get("last_message_hash"):
+                    session["last_message_hash"] = message_hash
+                    broadcaster.submit(
+                        send_message_func,
+                        sender_id,
+                        message,
+                        priority=PRIORITY_ALERT,
+                        batch=f"gagstockfav:{version}",
+                    )
+                    update_user_stats(sender_id, "notification_sent")
+                    logger.info(f"Queued gagstockfav update for {sender_id}")
+
+            update_session(
+                SESSION_KIND,
+                sender_id,
+                last_version=version,
+                last_message_hash=session.get("last_message_hash"),
+            )
 
         if sender_id in user_favorite_sessions:
             timer = threading.Timer(
@@ -746,30 +813,44 @@ def fetch_favorite_data(sender_id, send_message_func):
 
     except requests.Timeout:
         logger.error(f"Timeout fetching favorite data for {sender_id}")
-        if sender_id in user_favorite_sessions:
+        session = user_favorite_sessions.get(sender_id)
+        if session:
+            session["failures"] = session.get("failures", 0) + 1
             timer = threading.Timer(
-                30.0, fetch_favorite_data, args=[sender_id, send_message_func]
+                get_retry_delay(session["failures"]),
+                fetch_favorite_data,
+                args=[sender_id, send_message_func],
             )
             timer.daemon = True
             timer.start()
-            user_favorite_sessions[sender_id]["timer"] = timer
+            session["timer"] = timer
 
     except requests.RequestException as e:
         logger.error(f"Network error in gagstockfav for {sender_id}: {e}")
-        if sender_id in user_favorite_sessions:
-            try:
-                send_message_func(
-                    sender_id,
-                    "⚠️ Stock API temporarily unavailable for favorites\nRetrying in 30 seconds...",
-                )
-            except:
-                pass
+        session = user_favorite_sessions.get(sender_id)
+        if session:
+            session["failures"] = session.get("failures", 0) + 1
+            retry_delay = get_retry_delay(session["failures"])
+            available = is_snapshot_available()
+            if available and not session.get("outage_notified"):
+                session["outage_notified"] = True
+                try:
+                    send_message_func(
+                        sender_id,
+                        f"⚠️ Stock API temporarily unavailable for favorites\nRetrying in {retry_delay:.0f} seconds...",
+                    )
+                except:
+                    pass
+            elif not available:
+                # Only notices skipped because upstream is down count as
+                # suppressed, not repeats of one already sent.
+                record_suppressed_notification()
             timer = threading.Timer(
-                30.0, fetch_favorite_data, args=[sender_id, send_message_func]
+                retry_delay, fetch_favorite_data, args=[sender_id, send_message_func]
             )
             timer.daemon = True
             timer.start()
-            user_favorite_sessions[sender_id]["timer"] = timer
+            session["timer"] = timer
 
     except Exception as e:
         logger.error(f"Unexpected error in gagstockfav for {sender_id}: {e}")
@@ -784,660 +865,659 @@ def fetch_favorite_data(sender_id, send_message_func):
         cleanup_favorite_session(sender_id)
 
 
-def execute(sender_id, args, context):
-    send_message_func = context["send_message"]
-
-    spam_check, spam_message = check_spam_protection(sender_id)
-    if not spam_check:
-        send_message_func(sender_id, spam_message)
-        return
-
-    load_all_data()
-
-    if not args:
-        cache_key = f"favhelp_{sender_id}"
-        cached_response = get_cached_message(cache_key)
-        if cached_response:
-            send_message_func(sender_id, cached_response)
-            return
-
-        stats = get_user_stats(sender_id)
-        prefs = get_user_preferences(sender_id)
-        tracked_count = len(user_tracked_items.get(sender_id, []))
-
-        upcoming = get_upcoming_restocks()
-        upcoming_text = ""
-        if upcoming:
-            upcoming_text = "\n\n⚡ UPCOMING RESTOCKS (< 5 min):\n"
-            for category, countdown in upcoming:
-                emoji = get_category_emoji(category)
-                upcoming_text += f"{emoji} {category.title()}: {countdown}\n"
-
-        help_message = (
-            "⭐ Gagstockfav — Smart Favorites Tracker\n\n"
-            "🎯 Favorites Tracking:\n"
-            "• 'gagstockfav on' - Start tracking only your favorite items\n"
-            "• 'gagstockfav off' - Stop favorites tracking\n"
-            "• 'gagstockfav smart' - Toggle smart notifications\n"
-            "• 'gagstockfav compact' - Toggle compact mode\n\n"
-            "⚙️ Advanced Settings:\n"
-            "• 'gagstockfav threshold value' - Set minimum value to notify\n"
-            "• 'gagstockfav cooldown seconds' - Set notification cooldown\n"
-            "• 'gagstockfav priority category1,category2' - Set priority categories\n"
-            "• 'gagstockfav trends' - Toggle price trend display\n\n"
-            "📊 Analytics & History:\n"
-            "• 'gagstockfav stats' - View your tracking statistics\n"
-            "• 'gagstockfav history' - Recent notification history\n"
-            "• 'gagstockfav summary' - Daily summary of findings\n"
-            "• 'gagstockfav settings' - View/change all preferences\n\n"
-            "🔍 Quick Actions:\n"
-            "• 'gagstockfav test' - Test with current stock\n"
-            "• 'gagstockfav recommend' - Get smart recommendations\n"
-            "• 'gagstockfav restock' - Next restock times\n\n"
-            f"📊 Your Status:\n"
-            f"⭐ Tracking: {tracked_count} favorite items\n"
-            f"🔔 Notifications sent: {stats.get('notifications_sent', 0)}\n"
-            f"💎 Best find: {stats.get('best_find_item', 'None')} ({format_value(stats.get('best_find_value', 0))})\n"
-            f"🎯 Smart mode: {'ON' if prefs['smart_notifications'] else 'OFF'}\n"
-            f"📊 Compact mode: {'ON' if prefs['compact_notifications'] else 'OFF'}\n\n"
-            "💡 This tracks only items from your favorites list and notifies\n"
-            "when they appear in stock. Independent from 'gagstock on/off'.\n\n"
-            "🔔 First add items to favorites:\n"
-            "• 'gagstock add category/item_name'\n"
-            "• 'gagstock list' to see your favorites\n\n"
-            f"📋 Categories: {', '.join(get_available_categories())}\n"
+@router.command(
+    "on",
+    help="Start tracking only your favorite items",
+    section="🎯 Favorites Tracking",
+)
+def _on(sender_id, args, send_message_func):
+    if sender_id not in user_tracked_items or not user_tracked_items[sender_id]:
+        send_message_func(
+            sender_id,
+            "⚠️ You need to add some favorite items first!\n\n"
+            "💡 Use 'gagstock add category/item_name' to add items.\n"
+            f"📋 Categories: {', '.join(get_available_categories())}\n\n"
             "🔍 Examples:\n"
             "   • 'gagstock add gear/ancient_shovel'\n"
-            "   • 'gagstockfav on' (tracks only favorites)\n"
-            "   • 'gagstockfav threshold 1000' (only notify for items ≥1000 value)"
-            f"{upcoming_text}"
+            "   • 'gagstock add egg/legendary_egg'\n\n"
+            "Then use 'gagstockfav on' to track only those items.",
         )
+        return
 
-        cache_message(cache_key, help_message)
-        send_message_func(sender_id, help_message)
+    if sender_id in user_favorite_sessions or not claim_session(
+        SESSION_KIND, sender_id, {"mode": "favorites"}
+    ):
+        send_message_func(
+            sender_id,
+            "📡 Gagstockfav is already running!\n"
+            "💡 Use 'gagstockfav off' to stop first.",
+        )
         return
 
-    action = args[0].lower()
+    update_user_stats(sender_id, "session_started")
+    prefs = get_user_preferences(sender_id)
+    tracked_count = len(user_tracked_items[sender_id])
+    tracked_list = []
+    for item in user_tracked_items[sender_id]:
+        tracked_list.append(f"{item['category']}/{item['item_name']}")
+
+    upcoming = get_upcoming_restocks()
+    upcoming_text = ""
+    if upcoming:
+        upcoming_text = f"\n\n⚡ UPCOMING RESTOCKS (< 5 min):\n"
+        for category, countdown in upcoming:
+            emoji = get_category_emoji(category)
+            upcoming_text += f"{emoji} {category.title()}: {countdown}\n"
+
+    send_message_func(
+        sender_id,
+        f"⭐ Gagstockfav started! Tracking {tracked_count} favorite items.\n"
+        f"🔔 You'll be notified only when your favorite items are in stock.\n\n"
+        f"📋 Tracking: {', '.join(tracked_list[:3])}{'...' if tracked_count > 3 else ''}\n\n"
+        f"🎯 Smart notifications: {'ON' if prefs['smart_notifications'] else 'OFF'}\n"
+        f"📊 Compact mode: {'ON' if prefs['compact_notifications'] else 'OFF'}\n"
+        f"💰 Value threshold: {format_value(prefs['value_threshold'])}\n"
+        f"⏰ Cooldown: {prefs['notification_cooldown']}s\n"
+        f"⚡ Update frequency: Every 8 seconds\n\n"
+        f"💡 Use 'gagstockfav settings' to customize your experience."
+        f"{upcoming_text}",
+    )
+
+    user_favorite_sessions[sender_id] = {
+        "timer": None,
+        "last_version": None,
+        "last_message_hash": None,
+    }
 
-    if action == "on":
-        if sender_id not in user_tracked_items or not user_tracked_items[sender_id]:
-            send_message_func(
-                sender_id,
-                "⚠️ You need to add some favorite items first!\n\n"
-                "💡 Use 'gagstock add category/item_name' to add items.\n"
-                f"📋 Categories: {', '.join(get_available_categories())}\n\n"
-                "🔍 Examples:\n"
-                "   • 'gagstock add gear/ancient_shovel'\n"
-                "   • 'gagstock add egg/legendary_egg'\n\n"
-                "Then use 'gagstockfav on' to track only those items.",
-            )
-            return
+    logger.info(f"Started gagstockfav session for {sender_id}")
+    fetch_favorite_data(sender_id, send_message_func)
 
-        if sender_id in user_favorite_sessions:
-            send_message_func(
-                sender_id,
-                "📡 Gagstockfav is already running!\n"
-                "💡 Use 'gagstockfav off' to stop first.",
-            )
-            return
 
-        update_user_stats(sender_id, "session_started")
+@router.command(
+    "off",
+    help="Stop favorites tracking",
+    section="🎯 Favorites Tracking",
+)
+def _off(sender_id, args, send_message_func):
+    if sender_id in user_favorite_sessions:
+        cleanup_favorite_session(sender_id)
+        send_message_func(sender_id, "🛑 Gagstockfav stopped.")
+    elif release_session(SESSION_KIND, sender_id):
+        # Owned by another worker; its poller stops on its next tick.
+        send_message_func(sender_id, "🛑 Gagstockfav stopped.")
+    else:
+        send_message_func(sender_id, "⚠️ Gagstockfav is not running.")
+
+
+@router.command(
+    "smart", help="Toggle smart notifications", section="🎯 Favorites Tracking"
+)
+def _smart(sender_id, args, send_message_func):
+    status = "ON" if toggle_user_preference(sender_id, "smart_notifications") else "OFF"
+    send_message_func(
+        sender_id,
+        f"🎯 Smart notifications: {status}\n"
+        "💡 Smart mode provides item recommendations and enhanced analytics.",
+    )
+
+
+@router.command("compact", help="Toggle compact mode", section="🎯 Favorites Tracking")
+def _compact(sender_id, args, send_message_func):
+    status = (
+        "ON" if toggle_user_preference(sender_id, "compact_notifications") else "OFF"
+    )
+    send_message_func(
+        sender_id,
+        f"📊 Compact notifications: {status}\n"
+        "💡 Compact mode shows shorter, summarized notifications.",
+    )
+
+
+@router.command(
+    "threshold",
+    usage="threshold value",
+    help="Set minimum value to notify",
+    section="⚙️ Advanced Settings",
+)
+def _threshold(sender_id, args, send_message_func):
+    if not args:
         prefs = get_user_preferences(sender_id)
-        tracked_count = len(user_tracked_items[sender_id])
-        tracked_list = []
-        for item in user_tracked_items[sender_id]:
-            tracked_list.append(f"{item['category']}/{item['item_name']}")
-
-        upcoming = get_upcoming_restocks()
-        upcoming_text = ""
-        if upcoming:
-            upcoming_text = f"\n\n⚡ UPCOMING RESTOCKS (< 5 min):\n"
-            for category, countdown in upcoming:
-                emoji = get_category_emoji(category)
-                upcoming_text += f"{emoji} {category.title()}: {countdown}\n"
-
         send_message_func(
             sender_id,
-            f"⭐ Gagstockfav started! Tracking {tracked_count} favorite items.\n"
-            f"🔔 You'll be notified only when your favorite items are in stock.\n\n"
-            f"📋 Tracking: {', '.join(tracked_list[:3])}{'...' if tracked_count > 3 else ''}\n\n"
-            f"🎯 Smart notifications: {'ON' if prefs['smart_notifications'] else 'OFF'}\n"
-            f"📊 Compact mode: {'ON' if prefs['compact_notifications'] else 'OFF'}\n"
-            f"💰 Value threshold: {format_value(prefs['value_threshold'])}\n"
-            f"⏰ Cooldown: {prefs['notification_cooldown']}s\n"
-            f"⚡ Update frequency: Every 8 seconds\n\n"
-            f"💡 Use 'gagstockfav settings' to customize your experience."
-            f"{upcoming_text}",
+            f"💰 Value Threshold Settings:\n\n"
+            f"Current threshold: {format_value(prefs['value_threshold'])}\n\n"
+            "💡 Usage: 'gagstockfav threshold value'\n"
+            "🔍 Examples:\n"
+            "   • 'gagstockfav threshold 0' (notify for all items)\n"
+            "   • 'gagstockfav threshold 1000' (only notify for items ≥1000)\n"
+            "   • 'gagstockfav threshold 5000' (only high-value items)\n\n"
+            "This filters notifications to only show items above the specified value.",
         )
-
-        user_favorite_sessions[sender_id] = {
-            "timer": None,
-            "last_combined_key": None,
-            "last_message": "",
-        }
-
-        logger.info(f"Started gagstockfav session for {sender_id}")
-        fetch_favorite_data(sender_id, send_message_func)
         return
 
-    elif action == "off":
-        if sender_id in user_favorite_sessions:
-            cleanup_favorite_session(sender_id)
-            send_message_func(sender_id, "🛑 Gagstockfav stopped.")
-        else:
-            send_message_func(sender_id, "⚠️ Gagstockfav is not running.")
-        return
-
-    elif action == "restock":
-        cache_key = f"fav_restock_{sender_id}"
-        cached_response = get_cached_message(cache_key)
-        if cached_response:
-            send_message_func(sender_id, cached_response)
+    try:
+        threshold = int(args[0])
+        if threshold < 0:
+            send_message_func(sender_id, "❌ Threshold must be 0 or positive")
             return
+    except ValueError:
+        send_message_func(sender_id, "❌ Threshold must be a number")
+        return
 
-        restocks = get_next_restocks()
-        upcoming = get_upcoming_restocks()
-
-        message = "⏰ Next Restock Times:\n\n"
-
-        for category in get_available_categories():
-            emoji = get_category_emoji(category)
-            restock_time = restocks.get(category, "Unknown")
-            message += f"{emoji} {category.title()}: {restock_time}\n"
+    set_user_preference(sender_id, "value_threshold", threshold)
 
-        if upcoming:
-            message += "\n⚡ UPCOMING RESTOCKS (< 5 min):\n"
-            for category, countdown in upcoming:
-                emoji = get_category_emoji(category)
-                message += f"🔥 {emoji} {category.title()}: {countdown}\n"
-
-        message += (
-            "\n💡 Restock Schedule:\n"
-            "🥚 Eggs: Every 30 minutes\n"
-            "🛠️ Gear & 🌱 Seeds: Every 5 minutes\n"
-            "🍯 Honey: Every hour\n"
-            "🎨 Cosmetics: Every 7 hours\n\n"
-            "🔔 Use 'gagstockfav on' to get notified when your favorites are in stock!"
-        )
+    send_message_func(
+        sender_id,
+        f"💰 Value threshold set to: {format_value(threshold)}\n"
+        "🔔 You'll only be notified for items with value ≥ this amount.",
+    )
 
-        cache_message(cache_key, message)
-        send_message_func(sender_id, message)
-        return
 
-    elif action == "smart":
+@router.command(
+    "cooldown",
+    usage="cooldown seconds",
+    help="Set notification cooldown",
+    section="⚙️ Advanced Settings",
+)
+def _cooldown(sender_id, args, send_message_func):
+    if not args:
         prefs = get_user_preferences(sender_id)
-        prefs["smart_notifications"] = not prefs["smart_notifications"]
-        save_data("preferences")
-
-        status = "ON" if prefs["smart_notifications"] else "OFF"
         send_message_func(
             sender_id,
-            f"🎯 Smart notifications: {status}\n"
-            "💡 Smart mode provides item recommendations and enhanced analytics.",
+            f"⏰ Notification Cooldown Settings:\n\n"
+            f"Current cooldown: {prefs['notification_cooldown']} seconds\n\n"
+            "💡 Usage: 'gagstockfav cooldown seconds'\n"
+            "🔍 Examples:\n"
+            "   • 'gagstockfav cooldown 60' (1 minute)\n"
+            "   • 'gagstockfav cooldown 300' (5 minutes)\n"
+            "   • 'gagstockfav cooldown 900' (15 minutes)\n\n"
+            "This prevents spam by limiting how often you get notified for the same item.",
         )
         return
 
-    elif action == "compact":
-        prefs = get_user_preferences(sender_id)
-        prefs["compact_notifications"] = not prefs["compact_notifications"]
-        save_data("preferences")
-
-        status = "ON" if prefs["compact_notifications"] else "OFF"
-        send_message_func(
-            sender_id,
-            f"📊 Compact notifications: {status}\n"
-            "💡 Compact mode shows shorter, summarized notifications.",
-        )
+    try:
+        cooldown = int(args[0])
+        if cooldown < 0:
+            send_message_func(sender_id, "❌ Cooldown must be 0 or positive")
+            return
+    except ValueError:
+        send_message_func(sender_id, "❌ Cooldown must be a number")
         return
 
-    elif action == "trends":
+    set_user_preference(sender_id, "notification_cooldown", cooldown)
+
+    minutes = cooldown // 60
+    seconds = cooldown % 60
+    time_str = f"{minutes}m {seconds}s" if minutes > 0 else f"{seconds}s"
+
+    send_message_func(
+        sender_id,
+        f"⏰ Notification cooldown set to: {time_str}\n"
+        "🔔 Same items won't notify again within this timeframe.",
+    )
+
+
+@router.command(
+    "priority",
+    usage="priority category1,category2",
+    help="Set priority categories",
+    section="⚙️ Advanced Settings",
+)
+def _priority(sender_id, args, send_message_func):
+    if not args:
         prefs = get_user_preferences(sender_id)
-        prefs["show_price_trends"] = not prefs["show_price_trends"]
-        save_data("preferences")
+        current_priorities = prefs["priority_categories"]
 
-        status = "ON" if prefs["show_price_trends"] else "OFF"
         send_message_func(
             sender_id,
-            f"📈 Price trends in notifications: {status}\n"
-            "💡 Shows 📈📉📊 indicators for price movement patterns.",
+            f"🎯 Priority Categories Settings:\n\n"
+            f"Current priorities: {', '.join(current_priorities) if current_priorities else 'All categories'}\n\n"
+            "💡 Usage: 'gagstockfav priority category1,category2'\n"
+            "💡 Use 'gagstockfav priority all' to reset\n\n"
+            "🔍 Examples:\n"
+            "   • 'gagstockfav priority gear,egg' (only gear and eggs)\n"
+            "   • 'gagstockfav priority cosmetic' (only cosmetics)\n"
+            "   • 'gagstockfav priority all' (all categories)\n\n"
+            f"📋 Available: {', '.join(get_available_categories())}\n\n"
+            "This limits notifications to only your priority categories.",
         )
         return
 
-    elif action == "threshold":
-        if len(args) < 2:
-            prefs = get_user_preferences(sender_id)
+    priority_input = args[0].lower()
+    if priority_input == "all":
+        priorities = []
+    else:
+        priorities = [cat.strip() for cat in priority_input.split(",")]
+        invalid_cats = [
+            cat for cat in priorities if cat not in get_available_categories()
+        ]
+        if invalid_cats:
             send_message_func(
                 sender_id,
-                f"💰 Value Threshold Settings:\n\n"
-                f"Current threshold: {format_value(prefs['value_threshold'])}\n\n"
-                "💡 Usage: 'gagstockfav threshold value'\n"
-                "🔍 Examples:\n"
-                "   • 'gagstockfav threshold 0' (notify for all items)\n"
-                "   • 'gagstockfav threshold 1000' (only notify for items ≥1000)\n"
-                "   • 'gagstockfav threshold 5000' (only high-value items)\n\n"
-                "This filters notifications to only show items above the specified value.",
+                f"❌ Invalid categories: {', '.join(invalid_cats)}\n"
+                f"📋 Valid categories: {', '.join(get_available_categories())}",
             )
             return
 
-        try:
-            threshold = int(args[1])
-            if threshold < 0:
-                send_message_func(sender_id, "❌ Threshold must be 0 or positive")
-                return
-        except ValueError:
-            send_message_func(sender_id, "❌ Threshold must be a number")
-            return
-
-        prefs = get_user_preferences(sender_id)
-        prefs["value_threshold"] = threshold
-        save_data("preferences")
+    set_user_preference(sender_id, "priority_categories", priorities)
 
+    if priorities:
         send_message_func(
             sender_id,
-            f"💰 Value threshold set to: {format_value(threshold)}\n"
-            "🔔 You'll only be notified for items with value ≥ this amount.",
+            f"🎯 Priority categories set to: {', '.join(priorities)}\n"
+            "🔔 You'll only get notifications for items in these categories.",
+        )
+    else:
+        send_message_func(
+            sender_id,
+            "🎯 Priority categories reset - you'll get notifications for all categories.",
         )
-        return
 
-    elif action == "cooldown":
-        if len(args) < 2:
-            prefs = get_user_preferences(sender_id)
-            send_message_func(
-                sender_id,
-                f"⏰ Notification Cooldown Settings:\n\n"
-                f"Current cooldown: {prefs['notification_cooldown']} seconds\n\n"
-                "💡 Usage: 'gagstockfav cooldown seconds'\n"
-                "🔍 Examples:\n"
-                "   • 'gagstockfav cooldown 60' (1 minute)\n"
-                "   • 'gagstockfav cooldown 300' (5 minutes)\n"
-                "   • 'gagstockfav cooldown 900' (15 minutes)\n\n"
-                "This prevents spam by limiting how often you get notified for the same item.",
-            )
-            return
 
+@router.command(
+    "trends", help="Toggle price trend display", section="⚙️ Advanced Settings"
+)
+def _trends(sender_id, args, send_message_func):
+    status = "ON" if toggle_user_preference(sender_id, "show_price_trends") else "OFF"
+    send_message_func(
+        sender_id,
+        f"📈 Price trends in notifications: {status}\n"
+        "💡 Shows 📈📉📊 indicators for price movement patterns.",
+    )
+
+
+@router.command(
+    "stats", help="View your tracking statistics", section="📊 Analytics & History"
+)
+def _stats(sender_id, args, send_message_func):
+    stats = get_user_stats(sender_id)
+    prefs = get_user_preferences(sender_id)
+    tracked_count = len(user_tracked_items.get(sender_id, []))
+
+    last_notification = stats.get("last_notification")
+    if last_notification:
         try:
-            cooldown = int(args[1])
-            if cooldown < 0:
-                send_message_func(sender_id, "❌ Cooldown must be 0 or positive")
-                return
-        except ValueError:
-            send_message_func(sender_id, "❌ Cooldown must be a number")
-            return
+            last_notif_dt = datetime.fromisoformat(last_notification)
+            last_notif_str = last_notif_dt.strftime("%Y-%m-%d %H:%M")
+        except:
+            last_notif_str = "Unknown"
+    else:
+        last_notif_str = "Never"
 
-        prefs = get_user_preferences(sender_id)
-        prefs["notification_cooldown"] = cooldown
-        save_data("preferences")
+    avg_value = 0
+    if stats["items_found"] > 0:
+        avg_value = stats["total_value_found"] / stats["items_found"]
 
-        minutes = cooldown // 60
-        seconds = cooldown % 60
-        time_str = f"{minutes}m {seconds}s" if minutes > 0 else f"{seconds}s"
+    favorite_category = "None"
+    if stats["favorite_categories"]:
+        favorite_category = max(
+            stats["favorite_categories"], key=stats["favorite_categories"].get
+        )
 
+    today_usage = rate_limiter.usage_today(sender_id)
+
+    send_message_func(
+        sender_id,
+        f"📊 Your Gagstockfav Statistics:\n\n"
+        f"⭐ Items being tracked: {tracked_count}\n"
+        f"🔔 Notifications sent: {stats['notifications_sent']}\n"
+        f"📈 Commands today: {today_usage}\n"
+        f"🎯 Items found in stock: {stats['items_found']}\n"
+        f"💰 Total value found: {format_value(stats['total_value_found'])}\n"
+        f"📈 Average item value: {format_value(avg_value)}\n"
+        f"💎 Best find: {stats.get('best_find_item', 'None')} ({format_value(stats['best_find_value'])})\n"
+        f"📡 Sessions started: {stats['sessions_started']}\n"
+        f"❤️ Favorite category: {favorite_category}\n"
+        f"🕐 Last notification: {last_notif_str}\n\n"
+        f"⚙️ Current Settings:\n"
+        f"💰 Value threshold: {format_value(prefs['value_threshold'])}\n"
+        f"⏰ Cooldown: {prefs['notification_cooldown']}s\n"
+        f"🎯 Smart mode: {'ON' if prefs['smart_notifications'] else 'OFF'}\n"
+        f"📊 Compact mode: {'ON' if prefs['compact_notifications'] else 'OFF'}",
+    )
+
+
+@router.command(
+    "history", help="Recent notification history", section="📊 Analytics & History"
+)
+def _history(sender_id, args, send_message_func):
+    if (
+        sender_id not in user_notification_history
+        or not user_notification_history[sender_id]
+    ):
         send_message_func(
             sender_id,
-            f"⏰ Notification cooldown set to: {time_str}\n"
-            "🔔 Same items won't notify again within this timeframe.",
+            "📊 No notification history yet.\n\n"
+            "💡 Start tracking with 'gagstockfav on' to build your history!",
         )
         return
 
-    elif action == "priority":
-        if len(args) < 2:
-            prefs = get_user_preferences(sender_id)
-            current_priorities = prefs["priority_categories"]
+    history = user_notification_history[sender_id]
+    recent_history = history[-10:]
 
-            send_message_func(
-                sender_id,
-                f"🎯 Priority Categories Settings:\n\n"
-                f"Current priorities: {', '.join(current_priorities) if current_priorities else 'All categories'}\n\n"
-                "💡 Usage: 'gagstockfav priority category1,category2'\n"
-                "💡 Use 'gagstockfav priority all' to reset\n\n"
-                "🔍 Examples:\n"
-                "   • 'gagstockfav priority gear,egg' (only gear and eggs)\n"
-                "   • 'gagstockfav priority cosmetic' (only cosmetics)\n"
-                "   • 'gagstockfav priority all' (all categories)\n\n"
-                f"📋 Available: {', '.join(get_available_categories())}\n\n"
-                "This limits notifications to only your priority categories.",
-            )
-            return
+    message = "📊 Recent Notification History:\n\n"
 
-        priority_input = args[1].lower()
-        if priority_input == "all":
-            priorities = []
-        else:
-            priorities = [cat.strip() for cat in priority_input.split(",")]
-            invalid_cats = [
-                cat for cat in priorities if cat not in get_available_categories()
-            ]
-            if invalid_cats:
-                send_message_func(
-                    sender_id,
-                    f"❌ Invalid categories: {', '.join(invalid_cats)}\n"
-                    f"📋 Valid categories: {', '.join(get_available_categories())}",
-                )
-                return
+    total_value = 0
+    for i, notification in enumerate(reversed(recent_history), 1):
+        item = notification["item"]
+        timestamp = datetime.fromisoformat(notification["timestamp"])
+        time_str = timestamp.strftime("%m-%d %H:%M")
 
-        prefs = get_user_preferences(sender_id)
-        prefs["priority_categories"] = priorities
-        save_data("preferences")
+        emoji_part = f"{item['emoji']} " if item.get("emoji") else ""
+        category_emoji = get_category_emoji(item["category"])
 
-        if priorities:
-            send_message_func(
-                sender_id,
-                f"🎯 Priority categories set to: {', '.join(priorities)}\n"
-                "🔔 You'll only get notifications for items in these categories.",
-            )
-        else:
-            send_message_func(
-                sender_id,
-                "🎯 Priority categories reset - you'll get notifications for all categories.",
-            )
-        return
+        total_value += item["value"]
 
-    elif action == "stats":
-        stats = get_user_stats(sender_id)
-        prefs = get_user_preferences(sender_id)
-        tracked_count = len(user_tracked_items.get(sender_id, []))
+        message += f"{i}. {time_str} | {category_emoji} {emoji_part}{item['display_name']}: {format_value(item['value'])}\n"
 
-        last_notification = stats.get("last_notification")
-        if last_notification:
-            try:
-                last_notif_dt = datetime.fromisoformat(last_notification)
-                last_notif_str = last_notif_dt.strftime("%Y-%m-%d %H:%M")
-            except:
-                last_notif_str = "Unknown"
-        else:
-            last_notif_str = "Never"
+    message += f"\n📊 Last 10 notifications summary:\n"
+    message += f"💰 Total value: {format_value(total_value)}\n"
+    message += f"📈 Average value: {format_value(total_value / len(recent_history))}\n"
+    message += f"🔔 Total notifications: {len(history)}"
 
-        avg_value = 0
-        if stats["items_found"] > 0:
-            avg_value = stats["total_value_found"] / stats["items_found"]
+    send_message_func(sender_id, message)
 
-        favorite_category = "None"
-        if stats["favorite_categories"]:
-            favorite_category = max(
-                stats["favorite_categories"], key=stats["favorite_categories"].get
-            )
 
-        command_usage_today = user_command_usage.get(sender_id, {})
-        current_minute_window = int(time.time() // 60)
-        today_usage = sum(
-            count
-            for window, count in command_usage_today.items()
-            if window >= current_minute_window - 1440
+@router.command(
+    "summary", help="Daily summary of findings", section="📊 Analytics & History"
+)
+def _summary(sender_id, args, send_message_func):
+    if (
+        sender_id not in user_notification_history
+        or not user_notification_history[sender_id]
+    ):
+        send_message_func(
+            sender_id,
+            "📊 No data for summary yet.\n\n"
+            "💡 Start tracking to generate daily summaries!",
         )
+        return
 
+    now = get_ph_time()
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    today_notifications = []
+    for notification in user_notification_history[sender_id]:
+        notif_time = datetime.fromisoformat(notification["timestamp"])
+        if notif_time >= today_start:
+            today_notifications.append(notification)
+
+    if not today_notifications:
         send_message_func(
             sender_id,
-            f"📊 Your Gagstockfav Statistics:\n\n"
-            f"⭐ Items being tracked: {tracked_count}\n"
-            f"🔔 Notifications sent: {stats['notifications_sent']}\n"
-            f"📈 Commands today: {today_usage}\n"
-            f"🎯 Items found in stock: {stats['items_found']}\n"
-            f"💰 Total value found: {format_value(stats['total_value_found'])}\n"
-            f"📈 Average item value: {format_value(avg_value)}\n"
-            f"💎 Best find: {stats.get('best_find_item', 'None')} ({format_value(stats['best_find_value'])})\n"
-            f"📡 Sessions started: {stats['sessions_started']}\n"
-            f"❤️ Favorite category: {favorite_category}\n"
-            f"🕐 Last notification: {last_notif_str}\n\n"
-            f"⚙️ Current Settings:\n"
-            f"💰 Value threshold: {format_value(prefs['value_threshold'])}\n"
-            f"⏰ Cooldown: {prefs['notification_cooldown']}s\n"
-            f"🎯 Smart mode: {'ON' if prefs['smart_notifications'] else 'OFF'}\n"
-            f"📊 Compact mode: {'ON' if prefs['compact_notifications'] else 'OFF'}",
+            f"📊 Daily Summary for {now.strftime('%Y-%m-%d')}:\n\n"
+            "🔔 No items found today.\n"
+            "💡 Keep your favorites list updated for better results!",
         )
         return
 
-    elif action == "history":
-        if (
-            sender_id not in user_notification_history
-            or not user_notification_history[sender_id]
-        ):
-            send_message_func(
-                sender_id,
-                "📊 No notification history yet.\n\n"
-                "💡 Start tracking with 'gagstockfav on' to build your history!",
-            )
-            return
-
-        history = user_notification_history[sender_id]
-        recent_history = history[-10:]
+    total_value = sum(notif["item"]["value"] for notif in today_notifications)
+    categories = {}
+    best_find = max(today_notifications, key=lambda x: x["item"]["value"])
 
-        message = "📊 Recent Notification History:\n\n"
+    for notification in today_notifications:
+        category = notification["item"]["category"]
+        categories[category] = categories.get(category, 0) + 1
 
-        total_value = 0
-        for i, notification in enumerate(reversed(recent_history), 1):
-            item = notification["item"]
-            timestamp = datetime.fromisoformat(notification["timestamp"])
-            time_str = timestamp.strftime("%m-%d %H:%M")
+    message = f"📊 Daily Summary for {now.strftime('%Y-%m-%d')}:\n\n"
+    message += f"🔔 Items found: {len(today_notifications)}\n"
+    message += f"💰 Total value: {format_value(total_value)}\n"
+    message += (
+        f"📈 Average value: {format_value(total_value / len(today_notifications))}\n"
+    )
+    message += f"💎 Best find: {best_find['item']['display_name']} ({format_value(best_find['item']['value'])})\n\n"
 
-            emoji_part = f"{item['emoji']} " if item.get("emoji") else ""
-            category_emoji = get_category_emoji(item["category"])
+    message += "📋 By category:\n"
+    for category, count in categories.items():
+        emoji = get_category_emoji(category)
+        message += f"{emoji} {category.title()}: {count} item(s)\n"
 
-            total_value += item["value"]
+    send_message_func(sender_id, message)
 
-            message += f"{i}. {time_str} | {category_emoji} {emoji_part}{item['display_name']}: {format_value(item['value'])}\n"
 
-        message += f"\n📊 Last 10 notifications summary:\n"
-        message += f"💰 Total value: {format_value(total_value)}\n"
-        message += (
-            f"📈 Average value: {format_value(total_value / len(recent_history))}\n"
+@router.command(
+    "settings", help="View/change all preferences", section="📊 Analytics & History"
+)
+def _settings(sender_id, args, send_message_func):
+    prefs = get_user_preferences(sender_id)
+    priority_str = (
+        ", ".join(prefs["priority_categories"])
+        if prefs["priority_categories"]
+        else "All"
+    )
+    cooldown_min = prefs["notification_cooldown"] // 60
+    cooldown_sec = prefs["notification_cooldown"] % 60
+    cooldown_str = (
+        f"{cooldown_min}m {cooldown_sec}s" if cooldown_min > 0 else f"{cooldown_sec}s"
+    )
+
+    send_message_func(
+        sender_id,
+        "⚙️ Your Gagstockfav Settings:\n\n"
+        f"🎯 Smart notifications: {'ON' if prefs['smart_notifications'] else 'OFF'}\n"
+        f"📊 Compact notifications: {'ON' if prefs['compact_notifications'] else 'OFF'}\n"
+        f"📈 Show price trends: {'ON' if prefs['show_price_trends'] else 'OFF'}\n"
+        f"💰 Value threshold: {format_value(prefs['value_threshold'])}\n"
+        f"⏰ Notification cooldown: {cooldown_str}\n"
+        f"🎯 Priority categories: {priority_str}\n"
+        f"🔔 Alert sound: {'ON' if prefs['alert_sound'] else 'OFF'}\n"
+        f"📅 Daily summary: {'ON' if prefs['daily_summary'] else 'OFF'}\n\n"
+        "💡 Commands to change settings:\n"
+        "• 'gagstockfav smart' - Toggle smart notifications\n"
+        "• 'gagstockfav compact' - Toggle compact mode\n"
+        "• 'gagstockfav trends' - Toggle price trends\n"
+        "• 'gagstockfav threshold value' - Set value threshold\n"
+        "• 'gagstockfav cooldown seconds' - Set cooldown time\n"
+        "• 'gagstockfav priority categories' - Set priority categories",
+    )
+
+
+@router.command("test", help="Test with current stock", section="🔍 Quick Actions")
+def _test(sender_id, args, send_message_func):
+    if sender_id not in user_tracked_items or not user_tracked_items[sender_id]:
+        send_message_func(
+            sender_id,
+            "⚠️ You need to add favorite items first to test.\n"
+            "💡 Use 'gagstock add category/item_name' to add items.",
         )
-        message += f"🔔 Total notifications: {len(history)}"
-
-        send_message_func(sender_id, message)
         return
 
-    elif action == "summary":
-        if (
-            sender_id not in user_notification_history
-            or not user_notification_history[sender_id]
-        ):
-            send_message_func(
-                sender_id,
-                "📊 No data for summary yet.\n\n"
-                "💡 Start tracking to generate daily summaries!",
-            )
-            return
-
-        now = get_ph_time()
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    cache_key = f"favtest_{sender_id}"
+    cached_response = get_cached_message(cache_key)
+    if cached_response:
+        send_message_func(sender_id, cached_response)
+        return
 
-        today_notifications = []
-        for notification in user_notification_history[sender_id]:
-            notif_time = datetime.fromisoformat(notification["timestamp"])
-            if notif_time >= today_start:
-                today_notifications.append(notification)
+    try:
+        stock_data = fetch_stock_data()
+        tracked_in_stock = check_tracked_items_in_stock(sender_id, stock_data)
 
-        if not today_notifications:
-            send_message_func(
-                sender_id,
-                f"📊 Daily Summary for {now.strftime('%Y-%m-%d')}:\n\n"
-                "🔔 No items found today.\n"
-                "💡 Keep your favorites list updated for better results!",
+        if tracked_in_stock:
+            message = (
+                f"🧪 Test Results - Found {len(tracked_in_stock)} favorite item(s):\n\n"
             )
-            return
-
-        total_value = sum(notif["item"]["value"] for notif in today_notifications)
-        categories = {}
-        best_find = max(today_notifications, key=lambda x: x["item"]["value"])
-
-        for notification in today_notifications:
-            category = notification["item"]["category"]
-            categories[category] = categories.get(category, 0) + 1
-
-        message = f"📊 Daily Summary for {now.strftime('%Y-%m-%d')}:\n\n"
-        message += f"🔔 Items found: {len(today_notifications)}\n"
-        message += f"💰 Total value: {format_value(total_value)}\n"
-        message += f"📈 Average value: {format_value(total_value / len(today_notifications))}\n"
-        message += f"💎 Best find: {best_find['item']['display_name']} ({format_value(best_find['item']['value'])})\n\n"
+            for item in tracked_in_stock:
+                emoji_part = f"{item['emoji']} " if item["emoji"] else ""
+                trend = get_price_trend(item["display_name"], item["category"])
+                message += f"✅ {emoji_part}{item['display_name']}: {format_value(item['value'])} | {trend}\n"
 
-        message += "📋 By category:\n"
-        for category, count in categories.items():
-            emoji = get_category_emoji(category)
-            message += f"{emoji} {category.title()}: {count} item(s)\n"
+            total_value = sum(item["value"] for item in tracked_in_stock)
+            message += f"\n💰 Total value available: {format_value(total_value)}"
+        else:
+            message = "🧪 Test Results:\n\n❌ None of your favorite items are currently in stock.\n💡 Keep tracking - items restock regularly!"
 
+        cache_message(cache_key, message)
         send_message_func(sender_id, message)
+    except StockAPIError:
+        send_message_func(sender_id, "❌ Failed to fetch stock data for testing.")
+    except Exception as e:
+        logger.error(f"Error in test command: {e}")
+        send_message_func(sender_id, "❌ Error occurred during test.")
+
+
+@router.command(
+    "recommend", help="Get smart recommendations", section="🔍 Quick Actions"
+)
+def _recommend(sender_id, args, send_message_func):
+    cache_key = f"favrecommend_{sender_id}"
+    cached_response = get_cached_message(cache_key)
+    if cached_response:
+        send_message_func(sender_id, cached_response)
         return
 
-    elif action == "settings":
-        prefs = get_user_preferences(sender_id)
-        priority_str = (
-            ", ".join(prefs["priority_categories"])
-            if prefs["priority_categories"]
-            else "All"
-        )
-        cooldown_min = prefs["notification_cooldown"] // 60
-        cooldown_sec = prefs["notification_cooldown"] % 60
-        cooldown_str = (
-            f"{cooldown_min}m {cooldown_sec}s"
-            if cooldown_min > 0
-            else f"{cooldown_sec}s"
-        )
+    try:
+        stock_data = fetch_stock_data()
+        recommendations = get_smart_recommendations(sender_id, stock_data)
+
+        if recommendations:
+            message = "💡 Smart Recommendations based on your preferences:\n\n"
+            for i, item in enumerate(recommendations, 1):
+                emoji_part = f"{item['emoji']} " if item["emoji"] else ""
+                category_emoji = get_category_emoji(item["category"])
+                trend = get_price_trend(item["display_name"], item["category"])
+
+                rarity = ""
+                if item["value"] >= 10000:
+                    rarity = " 💎"
+                elif item["value"] >= 1000:
+                    rarity = " ⭐"
+                elif item["value"] >= 100:
+                    rarity = " 🔥"
+
+                message += f"{i}. {category_emoji} {emoji_part}{item['display_name']}\n"
+                message += f"   💰 {format_value(item['value'])}{rarity} | {trend}\n\n"
+
+            message += "💡 Add to favorites: 'gagstock add category/item_name'"
+        else:
+            message = "💡 No smart recommendations available right now.\n\n"
+            if sender_id not in user_tracked_items or not user_tracked_items[sender_id]:
+                message += (
+                    "Add some favorite items first to get better recommendations!"
+                )
+            else:
+                message += (
+                    "Try expanding your favorite categories for more recommendations."
+                )
 
+        cache_message(cache_key, message)
+        send_message_func(sender_id, message)
+    except StockAPIError:
         send_message_func(
-            sender_id,
-            "⚙️ Your Gagstockfav Settings:\n\n"
-            f"🎯 Smart notifications: {'ON' if prefs['smart_notifications'] else 'OFF'}\n"
-            f"📊 Compact notifications: {'ON' if prefs['compact_notifications'] else 'OFF'}\n"
-            f"📈 Show price trends: {'ON' if prefs['show_price_trends'] else 'OFF'}\n"
-            f"💰 Value threshold: {format_value(prefs['value_threshold'])}\n"
-            f"⏰ Notification cooldown: {cooldown_str}\n"
-            f"🎯 Priority categories: {priority_str}\n"
-            f"🔔 Alert sound: {'ON' if prefs['alert_sound'] else 'OFF'}\n"
-            f"📅 Daily summary: {'ON' if prefs['daily_summary'] else 'OFF'}\n\n"
-            "💡 Commands to change settings:\n"
-            "• 'gagstockfav smart' - Toggle smart notifications\n"
-            "• 'gagstockfav compact' - Toggle compact mode\n"
-            "• 'gagstockfav trends' - Toggle price trends\n"
-            "• 'gagstockfav threshold value' - Set value threshold\n"
-            "• 'gagstockfav cooldown seconds' - Set cooldown time\n"
-            "• 'gagstockfav priority categories' - Set priority categories",
+            sender_id, "❌ Failed to fetch stock data for recommendations."
         )
+    except Exception as e:
+        logger.error(f"Error in recommend command: {e}")
+        send_message_func(sender_id, "❌ Error occurred while getting recommendations.")
+
+
+@router.command("restock", help="Next restock times", section="🔍 Quick Actions")
+def _restock(sender_id, args, send_message_func):
+    cache_key = shared_key("gagstockfav_restock", bucket_seconds=CACHE_DURATION)
+    cached_response = get_cached_message(cache_key)
+    if cached_response:
+        send_message_func(sender_id, cached_response)
         return
 
-    elif action == "test":
-        if sender_id not in user_tracked_items or not user_tracked_items[sender_id]:
-            send_message_func(
-                sender_id,
-                "⚠️ You need to add favorite items first to test.\n"
-                "💡 Use 'gagstock add category/item_name' to add items.",
-            )
-            return
+    restocks = get_next_restocks()
+    upcoming = get_upcoming_restocks()
 
-        cache_key = f"favtest_{sender_id}"
-        cached_response = get_cached_message(cache_key)
-        if cached_response:
-            send_message_func(sender_id, cached_response)
-            return
+    message = "⏰ Next Restock Times:\n\n"
 
-        try:
-            headers = {"User-Agent": "GagStock-Bot/1.0"}
-            stock_response = requests.get(
-                "https://vmi2625091.contaboserver.net/api/stocks",
-                timeout=15,
-                headers=headers,
-            )
+    for category in get_available_categories():
+        emoji = get_category_emoji(category)
+        restock_time = restocks.get(category, "Unknown")
+        message += f"{emoji} {category.title()}: {restock_time}\n"
 
-            if stock_response.status_code == 200:
-                stock_data = stock_response.json()
-                tracked_in_stock = check_tracked_items_in_stock(sender_id, stock_data)
+    if upcoming:
+        message += "\n⚡ UPCOMING RESTOCKS (< 5 min):\n"
+        for category, countdown in upcoming:
+            emoji = get_category_emoji(category)
+            message += f"🔥 {emoji} {category.title()}: {countdown}\n"
+
+    message += (
+        "\n💡 Restock Schedule:\n"
+        "🥚 Eggs: Every 30 minutes\n"
+        "🛠️ Gear & 🌱 Seeds: Every 5 minutes\n"
+        "🍯 Honey: Every hour\n"
+        "🎨 Cosmetics: Every 7 hours\n\n"
+        "🔔 Use 'gagstockfav on' to get notified when your favorites are in stock!"
+    )
+
+    cache_message(cache_key, message)
+    send_message_func(sender_id, message)
+
+
+@router.fallback()
+def _unknown(sender_id, args, send_message_func):
+    send_message_func(
+        sender_id,
+        "❌ Unknown gagstockfav command.\n\n"
+        "🔍 Popular commands:\n"
+        "• 'gagstockfav on/off' - Start/stop tracking\n"
+        "• 'gagstockfav settings' - View all settings\n"
+        "• 'gagstockfav stats' - View your statistics\n"
+        "• 'gagstockfav test' - Test with current stock\n"
+        "• 'gagstockfav restock' - Next restock times\n\n"
+        "💡 Use 'gagstockfav' without arguments for full help",
+    )
 
-                if tracked_in_stock:
-                    message = f"🧪 Test Results - Found {len(tracked_in_stock)} favorite item(s):\n\n"
-                    for item in tracked_in_stock:
-                        emoji_part = f"{item['emoji']} " if item["emoji"] else ""
-                        trend = get_price_trend(item["display_name"], item["category"])
-                        message += f"✅ {emoji_part}{item['display_name']}: {format_value(item['value'])} | {trend}\n"
 
-                    total_value = sum(item["value"] for item in tracked_in_stock)
-                    message += (
-                        f"\n💰 Total value available: {format_value(total_value)}"
-                    )
-                else:
-                    message = "🧪 Test Results:\n\n❌ None of your favorite items are currently in stock.\n💡 Keep tracking - items restock regularly!"
+def execute(sender_id, args, context):
+    send_message_func = context["send_message"]
 
-                cache_message(cache_key, message)
-                send_message_func(sender_id, message)
-            else:
-                send_message_func(
-                    sender_id, "❌ Failed to fetch stock data for testing."
-                )
-        except Exception as e:
-            logger.error(f"Error in test command: {e}")
-            send_message_func(sender_id, "❌ Error occurred during test.")
+    matched = router.match(args)
+    spam_check, spam_message = check_spam_protection(
+        sender_id, matched[0].path if matched else (args[0].lower() if args else None)
+    )
+    if not spam_check:
+        send_message_func(sender_id, spam_message)
         return
 
-    elif action == "recommend":
-        cache_key = f"favrecommend_{sender_id}"
+    load_all_data()
+
+    if not args:
+        cache_key = f"favhelp_{sender_id}"
         cached_response = get_cached_message(cache_key)
         if cached_response:
             send_message_func(sender_id, cached_response)
             return
 
-        try:
-            headers = {"User-Agent": "GagStock-Bot/1.0"}
-            stock_response = requests.get(
-                "https://vmi2625091.contaboserver.net/api/stocks",
-                timeout=15,
-                headers=headers,
-            )
-
-            if stock_response.status_code == 200:
-                stock_data = stock_response.json()
-                recommendations = get_smart_recommendations(sender_id, stock_data)
-
-                if recommendations:
-                    message = "💡 Smart Recommendations based on your preferences:\n\n"
-                    for i, item in enumerate(recommendations, 1):
-                        emoji_part = f"{item['emoji']} " if item["emoji"] else ""
-                        category_emoji = get_category_emoji(item["category"])
-                        trend = get_price_trend(item["display_name"], item["category"])
+        stats = get_user_stats(sender_id)
+        prefs = get_user_preferences(sender_id)
+        tracked_count = len(user_tracked_items.get(sender_id, []))
 
-                        rarity = ""
-                        if item["value"] >= 10000:
-                            rarity = " 💎"
-                        elif item["value"] >= 1000:
-                            rarity = " ⭐"
-                        elif item["value"] >= 100:
-                            rarity = " 🔥"
+        upcoming = get_upcoming_restocks()
+        upcoming_text = ""
+        if upcoming:
+            upcoming_text = "\n\n⚡ UPCOMING RESTOCKS (< 5 min):\n"
+            for category, countdown in upcoming:
+                emoji = get_category_emoji(category)
+                upcoming_text += f"{emoji} {category.title()}: {countdown}\n"
 
-                        message += f"{i}. {category_emoji} {emoji_part}{item['display_name']}\n"
-                        message += (
-                            f"   💰 {format_value(item['value'])}{rarity} | {trend}\n\n"
-                        )
+        help_message = (
+            "⭐ Gagstockfav — Smart Favorites Tracker\n\n"
+            f"{router.help_text()}\n\n"
+            f"📊 Your Status:\n"
+            f"⭐ Tracking: {tracked_count} favorite items\n"
+            f"🔔 Notifications sent: {stats.get('notifications_sent', 0)}\n"
+            f"💎 Best find: {stats.get('best_find_item', 'None')} ({format_value(stats.get('best_find_value', 0))})\n"
+            f"🎯 Smart mode: {'ON' if prefs['smart_notifications'] else 'OFF'}\n"
+            f"📊 Compact mode: {'ON' if prefs['compact_notifications'] else 'OFF'}\n\n"
+            "💡 This tracks only items from your favorites list and notifies\n"
+            "when they appear in stock. Independent from 'gagstock on/off'.\n\n"
+            "🔔 First add items to favorites:\n"
+            "• 'gagstock add category/item_name'\n"
+            "• 'gagstock list' to see your favorites\n\n"
+            f"📋 Categories: {', '.join(get_available_categories())}\n"
+            "🔍 Examples:\n"
+            "   • 'gagstock add gear/ancient_shovel'\n"
+            "   • 'gagstockfav on' (tracks only favorites)\n"
+            "   • 'gagstockfav threshold 1000' (only notify for items ≥1000 value)"
+            f"{upcoming_text}"
+        )
 
-                    message += "💡 Add to favorites: 'gagstock add category/item_name'"
-                else:
-                    message = "💡 No smart recommendations available right now.\n\n"
-                    if (
-                        sender_id not in user_tracked_items
-                        or not user_tracked_items[sender_id]
-                    ):
-                        message += "Add some favorite items first to get better recommendations!"
-                    else:
-                        message += "Try expanding your favorite categories for more recommendations."
-
-                cache_message(cache_key, message)
-                send_message_func(sender_id, message)
-            else:
-                send_message_func(
-                    sender_id, "❌ Failed to fetch stock data for recommendations."
-                )
-        except Exception as e:
-            logger.error(f"Error in recommend command: {e}")
-            send_message_func(
-                sender_id, "❌ Error occurred while getting recommendations."
-            )
+        cache_message(cache_key, help_message)
+        send_message_func(sender_id, help_message)
         return
 
-    else:
-        send_message_func(
-            sender_id,
-            "❌ Unknown gagstockfav command.\n\n"
-            "🔍 Popular commands:\n"
-            "• 'gagstockfav on/off' - Start/stop tracking\n"
-            "• 'gagstockfav settings' - View all settings\n"
-            "• 'gagstockfav stats' - View your statistics\n"
-            "• 'gagstockfav test' - Test with current stock\n"
-            "• 'gagstockfav restock' - Next restock times\n\n"
-            "💡 Use 'gagstockfav' without arguments for full help",
-        )
+    router.dispatch(sender_id, args, send_message_func)
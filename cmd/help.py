@@ -1,18 +1,36 @@
-import os
+# (registry_generation, message); rendered on the first call after the
+# commands change.
+_rendered = (None, None)
 
 
-def execute(sender_id, args, context):
-    send_message_func = context["send_message"]
+def render_help(context):
     prefix = context["prefix"]
-
-    available_commands = sorted(context.get("cmd_module_keys", []))
+    # Already sorted by the server.
+    available_commands = context.get("cmd_module_keys", ())
 
     if not available_commands:
-        message = "No commands are available."
-    else:
-        message = "Available commands:\n"
-        message += f"You can use commands with the prefix '{prefix}' (e.g., {prefix}help) or without a prefix (e.g., help).\n\n"
-        for cmd_name in available_commands:
+        return "No commands are available."
+
+    message = "Available commands:\n"
+    message += f"You can use commands with the prefix '{prefix}' (e.g., {prefix}help) or without a prefix (e.g., help).\n\n"
+    aliases = context.get("cmd_aliases", {})
+    for cmd_name in available_commands:
+        if aliases.get(cmd_name):
+            message += f"- {cmd_name} (also: {', '.join(aliases[cmd_name])})\n"
+        else:
             message += f"- {cmd_name}\n"
+    return message
+
+
+def execute(sender_id, args, context):
+    global _rendered
+    send_message_func = context["send_message"]
+
+    generation = context.get("registry_generation")
+    if generation is not None and _rendered[0] == generation:
+        message = _rendered[1]
+    else:
+        message = render_help(context)
+        _rendered = (generation, message)
 
     send_message_func(sender_id, message)
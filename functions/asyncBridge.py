@@ -0,0 +1,71 @@
+import asyncio
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+_loop = None
+_loop_lock = threading.Lock()
+# The event loop keeps only weak references to tasks, so sends nobody
+# awaits are held here until they finish.
+_pending_sends = set()
+
+
+def set_loop(loop):
+    """Run command coroutines on `loop` (the ASGI server's event loop)."""
+    global _loop
+    _loop = loop
+
+
+def get_loop():
+    """
+    The event loop async commands run on: the one registered with
+    set_loop(), otherwise a loop started in a daemon thread on first use.
+    """
+    global _loop
+    if _loop is not None:
+        return _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=loop.run_forever, name="command-loop", daemon=True
+            ).start()
+            _loop = loop
+    return _loop
+
+
+def submit(coro):
+    """Schedule `coro` on the command loop; returns a concurrent Future."""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+class AwaitableSend:
+    """
+    send_message for command modules that works from both kinds of code.
+
+    Called from a thread (sync execute, tracker timers) it sends and
+    returns the response like the plain function. Called while an event
+    loop is running (async execute) it returns an awaitable task, so
+    `await send_message(...)` never blocks the loop; the task runs even
+    if it is not awaited.
+    """
+
+    def __init__(self, send_func, send_func_async=None):
+        self.send_func = send_func
+        self.send_func_async = send_func_async
+
+    def __call__(self, recipient_id, message_text):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return self.send_func(recipient_id, message_text)
+        task = loop.create_task(self.send_async(recipient_id, message_text))
+        _pending_sends.add(task)
+        task.add_done_callback(_pending_sends.discard)
+        return task
+
+    async def send_async(self, recipient_id, message_text):
+        if self.send_func_async is not None:
+            return await self.send_func_async(recipient_id, message_text)
+        return await asyncio.to_thread(self.send_func, recipient_id, message_text)
@@ -0,0 +1,54 @@
+import asyncio
+import logging
+
+import requests
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+MAX_CONNECTIONS = 200
+DEFAULT_TIMEOUT = 15
+
+_client = None
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=DEFAULT_TIMEOUT,
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS),
+        )
+    return _client
+
+
+async def request(method, url, timeout=DEFAULT_TIMEOUT, **kwargs):
+    """
+    Awaitable HTTP request returning a response with `status_code`,
+    `text` and `json()`. Uses a shared httpx.AsyncClient when httpx is
+    installed and otherwise runs `requests` in a worker thread. Errors
+    are raised as requests exceptions either way, so callers handle one
+    exception family.
+    """
+    if httpx is None:
+        return await asyncio.to_thread(
+            requests.request, method, url, timeout=timeout, **kwargs
+        )
+
+    try:
+        return await _get_client().request(method, url, timeout=timeout, **kwargs)
+    except httpx.TimeoutException as e:
+        raise requests.Timeout(str(e)) from e
+    except httpx.HTTPError as e:
+        raise requests.ConnectionError(str(e)) from e
+
+
+async def aclose():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
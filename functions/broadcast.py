@@ -0,0 +1,246 @@
+import itertools
+import json
+import queue
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+from functions.sharedState import shared_state
+
+logger = logging.getLogger(__name__)
+
+try:
+    with open("config.json", "r") as f:
+        config = json.load(f)
+except Exception:
+    config = {}
+
+BROADCAST_RATE = float(config.get("broadcast_rate", 20))
+BROADCAST_BURST = int(config.get("broadcast_burst", 10))
+BROADCAST_WORKERS = int(config.get("broadcast_workers", 8))
+MAX_TRACKED_BATCHES = 20
+
+PRIORITY_ALERT = 0
+PRIORITY_UPDATE = 1
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(int(fraction * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+class _Job:
+    __slots__ = (
+        "send_func",
+        "recipient_id",
+        "message",
+        "priority",
+        "page",
+        "batch",
+        "enqueued_at",
+    )
+
+    def __init__(self, send_func, recipient_id, message, priority, page, batch):
+        self.send_func = send_func
+        self.recipient_id = recipient_id
+        self.message = message
+        self.priority = priority
+        self.page = page
+        self.batch = batch
+        self.enqueued_at = time.monotonic()
+
+
+class Broadcaster:
+    """
+    Paced, prioritised delivery of outbound messages.
+
+    Messages are queued by priority tier (alerts before full updates) and
+    sent by a small pool of threads. Each page gets `rate` messages per
+    second with bursts of up to `burst`, scheduled with GCRA: every send
+    reserves the next free slot for its page. With a `store` the slots are
+    reserved in the shared state database, so the budget holds across all
+    worker processes.
+
+    A queued message that has not gone out yet is replaced when a newer
+    one for the same recipient, page and tier arrives, so slow deliveries
+    never send stale updates. Delivery latency (enqueue to send) is
+    recorded per batch, and a summary is logged once a batch drains.
+    """
+
+    def __init__(
+        self,
+        rate=BROADCAST_RATE,
+        burst=BROADCAST_BURST,
+        workers=BROADCAST_WORKERS,
+        store=None,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.workers = workers
+        self.store = store
+
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._slots = {}
+        self._threads = []
+        self._batches = OrderedDict()
+        self._stats = {"submitted": 0, "replaced": 0, "sent": 0, "failed": 0}
+
+    def _reserve(self, page):
+        """Return how long to wait before sending on `page`."""
+        now = time.time()
+        interval = 1.0 / self.rate
+        tolerance = interval * max(self.burst - 1, 0)
+
+        def reserve(next_free):
+            next_free = now if next_free is None else next_free
+            slot = max(now, next_free - tolerance)
+            return max(next_free, slot) + interval, slot
+
+        if self.store is not None:
+            slot = self.store.update("broadcast:slots", page, reserve, ttl=60)
+        else:
+            with self._lock:
+                self._slots[page], slot = reserve(self._slots.get(page))
+        return max(slot - now, 0.0)
+
+    def _ensure_workers(self):
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(
+                    target=self._work, name=f"broadcast-{index}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(
+        self,
+        send_func,
+        recipient_id,
+        message,
+        priority=PRIORITY_UPDATE,
+        page="default",
+        batch=None,
+    ):
+        key = (page, recipient_id, priority)
+        with self._lock:
+            self._stats["submitted"] += 1
+            job = self._pending.get(key)
+            if job is not None:
+                job.message = message
+                job.send_func = send_func
+                self._stats["replaced"] += 1
+                return
+            job = _Job(send_func, recipient_id, message, priority, page, batch)
+            self._pending[key] = job
+            if batch is not None:
+                self._track(batch)["outstanding"] += 1
+        self._queue.put((priority, next(self._sequence), job))
+        self._ensure_workers()
+
+    def broadcast(
+        self,
+        send_func,
+        message,
+        recipients,
+        priority=PRIORITY_UPDATE,
+        page="default",
+        batch=None,
+    ):
+        for recipient_id in recipients:
+            self.submit(send_func, recipient_id, message, priority, page, batch)
+
+    def _track(self, batch):
+        entry = self._batches.get(batch)
+        if entry is None:
+            entry = {"outstanding": 0, "latencies": [], "failed": 0}
+            self._batches[batch] = entry
+            while len(self._batches) > MAX_TRACKED_BATCHES:
+                self._batches.popitem(last=False)
+        return entry
+
+    def _work(self):
+        while True:
+            _, _, job = self._queue.get()
+            try:
+                self._deliver(job)
+            except Exception as e:
+                logger.error(f"Error in broadcast worker: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _deliver(self, job):
+        time.sleep(self._reserve(job.page))
+        with self._lock:
+            self._pending.pop((job.page, job.recipient_id, job.priority), None)
+            send_func, message = job.send_func, job.message
+
+        ok = True
+        try:
+            send_func(job.recipient_id, message)
+        except Exception as e:
+            ok = False
+            logger.error(f"Broadcast to {job.recipient_id} failed: {e}")
+
+        latency = time.monotonic() - job.enqueued_at
+        with self._lock:
+            self._stats["sent" if ok else "failed"] += 1
+            entry = self._batches.get(job.batch) if job.batch is not None else None
+            if entry is None:
+                return
+            entry["latencies"].append(latency)
+            if not ok:
+                entry["failed"] += 1
+            entry["outstanding"] -= 1
+            finished = entry["outstanding"] == 0
+        if finished:
+            summary = self.delivery_stats(job.batch)
+            logger.info(
+                f"Broadcast {job.batch} delivered to {summary['count']} recipient(s): "
+                f"p50 {summary['p50']:.2f}s, p90 {summary['p90']:.2f}s, "
+                f"p99 {summary['p99']:.2f}s, last {summary['max']:.2f}s"
+            )
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def delivery_stats(self, batch=None):
+        """
+        Delivery-time distribution for `batch`, or for every tracked
+        batch combined: count, failures, p50/p90/p99 and the latency of
+        the last recipient.
+        """
+        with self._lock:
+            if batch is not None:
+                entries = [self._batches[batch]] if batch in self._batches else []
+            else:
+                entries = list(self._batches.values())
+            latencies = sorted(l for entry in entries for l in entry["latencies"])
+            failed = sum(entry["failed"] for entry in entries)
+            outstanding = sum(entry["outstanding"] for entry in entries)
+        return {
+            "count": len(latencies),
+            "failed": failed,
+            "outstanding": outstanding,
+            "p50": percentile(latencies, 0.50),
+            "p90": percentile(latencies, 0.90),
+            "p99": percentile(latencies, 0.99),
+            "max": latencies[-1] if latencies else 0.0,
+        }
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, queued=len(self._pending))
+
+
+broadcaster = Broadcaster(store=shared_state)
@@ -0,0 +1,156 @@
+import random
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling through while a circuit is open."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"Circuit '{name}' is open, retry in {retry_after:.1f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+def backoff_delay(attempt, base, cap):
+    """
+    Exponential backoff with equal jitter: half of the capped exponential
+    delay is fixed, the other half is random, so retries from many callers
+    spread out instead of landing on the same tick.
+    """
+    delay = min(cap, base * (2 ** max(attempt - 1, 0)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open circuit breaker.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    calls fail fast with CircuitOpenError. Once the (jittered, exponentially
+    growing) open period elapses a single probe call is let through; its
+    success closes the circuit, its failure re-opens it for longer.
+    """
+
+    def __init__(
+        self, name, failure_threshold=3, reset_timeout=15.0, max_reset_timeout=300.0
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._consecutive_opens = 0
+        self._opened_until = 0.0
+        self._probe_in_flight = False
+        self._stats = {"calls": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and time.monotonic() >= self._opened_until:
+                return HALF_OPEN
+            return self._state
+
+    def retry_after(self):
+        with self._lock:
+            if self._state == CLOSED:
+                return 0.0
+            return max(self._opened_until - time.monotonic(), 0.0)
+
+    def _before_call(self):
+        with self._lock:
+            self._stats["calls"] += 1
+            if self._state == CLOSED:
+                return
+
+            now = time.monotonic()
+            if self._state == OPEN and now >= self._opened_until:
+                self._state = HALF_OPEN
+                logger.info(f"Circuit '{self.name}' half-open, sending probe")
+
+            if self._state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+
+            self._stats["rejected"] += 1
+            raise CircuitOpenError(self.name, max(self._opened_until - now, 0.0))
+
+    def _on_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info(f"Circuit '{self.name}' closed, upstream recovered")
+            self._state = CLOSED
+            self._consecutive_failures = 0
+            self._consecutive_opens = 0
+            self._probe_in_flight = False
+
+    def _on_failure(self):
+        with self._lock:
+            self._stats["failures"] += 1
+            self._consecutive_failures += 1
+            if self._state == OPEN:
+                return
+            self._probe_in_flight = False
+            if (
+                self._state == HALF_OPEN
+                or self._consecutive_failures >= self.failure_threshold
+            ):
+                self._consecutive_opens += 1
+                open_for = backoff_delay(
+                    self._consecutive_opens, self.reset_timeout, self.max_reset_timeout
+                )
+                self._state = OPEN
+                self._opened_until = time.monotonic() + open_for
+                self._stats["opened"] += 1
+                logger.warning(
+                    f"Circuit '{self.name}' opened for {open_for:.1f}s after {self._consecutive_failures} consecutive failure(s)"
+                )
+
+    def call(self, fn, *args, **kwargs):
+        self._before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self._on_failure()
+            raise
+        self._on_success()
+        return result
+
+    async def call_async(self, fn, *args, **kwargs):
+        """
+        Like call(), for a coroutine function. Cancellation counts as a
+        failure so a cancelled half-open probe does not wedge the circuit.
+        """
+        self._before_call()
+        try:
+            result = await fn(*args, **kwargs)
+        except BaseException:
+            self._on_failure()
+            raise
+        self._on_success()
+        return result
+
+    def stats(self):
+        state = self.state
+        with self._lock:
+            return dict(
+                self._stats,
+                state=state,
+                consecutive_failures=self._consecutive_failures,
+                retry_after=(
+                    max(self._opened_until - time.monotonic(), 0.0)
+                    if self._state != CLOSED
+                    else 0.0
+                ),
+            )
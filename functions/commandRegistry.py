@@ -0,0 +1,296 @@
+import importlib.util
+import os
+import threading
+import time
+import logging
+from collections.abc import Mapping
+
+logger = logging.getLogger(__name__)
+
+EXCLUDED_FILES = ("__init__.py", "delete.py")
+
+
+class CommandRegistry(Mapping):
+    """
+    Command modules in `cmd_dir`, imported on first use.
+
+    Command names come from a directory listing, so registering them costs
+    nothing; a module is exec'd the first time its name is looked up.
+    Import time is recorded for every module, and modules that fail to
+    import are dropped from the registry as they were with eager loading.
+
+    Hooks added with add_load_hook() run after a module's first import.
+    reload_changed() (or a watch() thread) re-imports modules whose file
+    changed. The new module replaces the old one only if it imports
+    cleanly; live state moves across through an optional hook pair:
+    `export_state()` on the old module and `import_state(state,
+    previous_module)` on the new one.
+    """
+
+    def __init__(self, cmd_dir, excluded=EXCLUDED_FILES):
+        self.cmd_dir = cmd_dir
+        self.excluded = excluded
+        self._paths = {}
+        self._modules = {}
+        self._import_times = {}
+        self._failed = set()
+        self._lock = threading.Lock()
+        self._module_locks = {}
+        self._mtimes = {}
+        self._watcher = None
+        self._load_hooks = []
+        # Bumped whenever the set of available commands changes.
+        self.generation = 0
+
+        if not os.path.isdir(cmd_dir):
+            logger.warning(
+                f"Commands directory '{cmd_dir}' not found. No commands will be loaded."
+            )
+            return
+        self._paths = self._scan()
+
+    def _scan(self):
+        return {
+            filename[:-3]: os.path.join(self.cmd_dir, filename)
+            for filename in sorted(os.listdir(self.cmd_dir))
+            if filename.endswith(".py") and filename not in self.excluded
+        }
+
+    def _module_lock(self, module_name):
+        with self._lock:
+            return self._module_locks.setdefault(module_name, threading.Lock())
+
+    def _exec(self, module_name):
+        module_path = self._paths[module_name]
+        try:
+            mtime = os.stat(module_path).st_mtime_ns
+            spec = importlib.util.spec_from_file_location(module_name, module_path)
+            if spec and spec.loader:
+                module = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(module)
+                return module, mtime
+            logger.error(
+                f"Could not load spec for module: {module_name} at {module_path}"
+            )
+        except Exception as e:
+            logger.error(
+                f"Error loading command module {module_name} from {module_path}: {str(e)}"
+            )
+        return None, None
+
+    def _load(self, module_name):
+        with self._module_lock(module_name):
+            if module_name in self._modules or module_name in self._failed:
+                return self._modules.get(module_name)
+
+            started = time.perf_counter()
+            module, mtime = self._exec(module_name)
+            elapsed = time.perf_counter() - started
+
+            with self._lock:
+                self._import_times[module_name] = elapsed
+                if module is None:
+                    self._failed.add(module_name)
+                    self.generation += 1
+                    self._mtimes[module_name] = self._current_mtime(module_name)
+                else:
+                    self._modules[module_name] = module
+                    self._mtimes[module_name] = mtime
+            if module is not None:
+                logger.info(
+                    f"Loaded command module: {module_name} ({elapsed * 1000:.1f} ms)"
+                )
+        if module is not None:
+            self._run_load_hooks(module_name, module)
+        return module
+
+    def add_load_hook(self, hook):
+        """Call `hook(module_name, module)` after each module's first import."""
+        self._load_hooks.append(hook)
+
+    def _run_load_hooks(self, module_name, module):
+        for hook in list(self._load_hooks):
+            try:
+                hook(module_name, module)
+            except Exception as e:
+                logger.error(
+                    f"Error in load hook for command module {module_name}: {e}"
+                )
+
+    def __getitem__(self, module_name):
+        if module_name not in self._paths or module_name in self._failed:
+            raise KeyError(module_name)
+        module = self._modules.get(module_name) or self._load(module_name)
+        if module is None:
+            raise KeyError(module_name)
+        return module
+
+    def __contains__(self, module_name):
+        return module_name in self._paths and module_name not in self._failed
+
+    def __iter__(self):
+        return iter([name for name in self._paths if name not in self._failed])
+
+    def __len__(self):
+        return len(self._paths) - len(self._failed)
+
+    def loaded(self):
+        with self._lock:
+            return dict(self._modules)
+
+    def defining(self, function_name):
+        """
+        Names of commands whose source defines `function_name`, found with
+        a text scan so that modules are not imported just to look.
+        """
+        names = []
+        for module_name, module_path in self._paths.items():
+            if module_name in self._failed:
+                continue
+            try:
+                with open(module_path, "r", encoding="utf-8") as f:
+                    if f"def {function_name}(" in f.read():
+                        names.append(module_name)
+            except OSError as e:
+                logger.error(f"Error scanning command module {module_name}: {e}")
+        return names
+
+    def preload(self, module_names=None):
+        for module_name in self if module_names is None else module_names:
+            self.get(module_name)
+
+    def _current_mtime(self, module_name):
+        try:
+            return os.stat(self._paths[module_name]).st_mtime_ns
+        except OSError:
+            return None
+
+    def reload(self, module_name):
+        """
+        Re-import `module_name` and swap it in, handing over live state.
+        The previous module stays in place if the new code fails to import
+        or the handoff raises. Returns True if the module was replaced.
+        """
+        with self._module_lock(module_name):
+            previous = self._modules.get(module_name)
+            started = time.perf_counter()
+            module, mtime = self._exec(module_name)
+            elapsed = time.perf_counter() - started
+            if module is None:
+                with self._lock:
+                    self._mtimes[module_name] = self._current_mtime(module_name)
+                if previous is not None:
+                    logger.error(
+                        f"Reload of command module {module_name} failed, keeping the running version"
+                    )
+                return False
+
+            if previous is not None:
+                try:
+                    export_state = getattr(previous, "export_state", None)
+                    import_state = getattr(module, "import_state", None)
+                    if callable(export_state) and callable(import_state):
+                        import_state(export_state(), previous)
+                except Exception as e:
+                    with self._lock:
+                        self._mtimes[module_name] = mtime
+                    logger.error(
+                        f"State handoff for command module {module_name} failed, keeping the running version: {e}"
+                    )
+                    return False
+
+            with self._lock:
+                self._modules[module_name] = module
+                self._mtimes[module_name] = mtime
+                self._import_times[module_name] = elapsed
+                if module_name in self._failed:
+                    self._failed.discard(module_name)
+                    self.generation += 1
+            logger.info(
+                f"Reloaded command module: {module_name} ({elapsed * 1000:.1f} ms)"
+            )
+            return True
+
+    def reload_changed(self):
+        """
+        Pick up edits in cmd/: register new files, drop deleted ones,
+        reload imported modules whose file changed and retry failed ones.
+        Returns the names that were reloaded.
+        """
+        if not os.path.isdir(self.cmd_dir):
+            return []
+        paths = self._scan()
+        with self._lock:
+            for module_name in set(self._paths) - set(paths):
+                self._modules.pop(module_name, None)
+                self._failed.discard(module_name)
+                self._mtimes.pop(module_name, None)
+                logger.info(f"Command module removed: {module_name}")
+            for module_name in set(paths) - set(self._paths):
+                logger.info(f"Command module added: {module_name}")
+            if set(paths) != set(self._paths):
+                self.generation += 1
+            self._paths = paths
+            candidates = [
+                module_name
+                for module_name in set(self._modules) | self._failed
+                if self._current_mtime(module_name) != self._mtimes.get(module_name)
+            ]
+
+        reloaded = []
+        for module_name in candidates:
+            if module_name in self._failed:
+                with self._lock:
+                    self._failed.discard(module_name)
+                    self.generation += 1
+                if self._load(module_name) is not None:
+                    reloaded.append(module_name)
+            elif self.reload(module_name):
+                reloaded.append(module_name)
+        return reloaded
+
+    def watch(self, interval=2.0):
+        """Poll cmd/ for changes every `interval` seconds in a daemon thread."""
+        if self._watcher is not None:
+            return
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reload_changed()
+                except Exception as e:
+                    logger.error(f"Error checking command modules for changes: {e}")
+
+        self._watcher = threading.Thread(
+            target=loop, name="command-reloader", daemon=True
+        )
+        self._watcher.start()
+
+    def import_report(self):
+        """(name, seconds or None if not imported yet, status) per command."""
+        with self._lock:
+            report = []
+            for module_name in self._paths:
+                if module_name in self._failed:
+                    status = "failed"
+                elif module_name in self._modules:
+                    status = "loaded"
+                else:
+                    status = "deferred"
+                report.append(
+                    (module_name, self._import_times.get(module_name), status)
+                )
+        return sorted(report, key=lambda row: -(row[1] or 0.0))
+
+    def log_import_report(self):
+        report = self.import_report()
+        total = sum(seconds or 0.0 for _, seconds, _ in report)
+        lines = [
+            f"  {name:<20} {f'{seconds * 1000:8.1f} ms' if seconds is not None else '       - ms'}  {status}"
+            for name, seconds, status in report
+        ]
+        logger.info(
+            f"Command import report ({len(report)} registered, {total * 1000:.1f} ms spent importing):\n"
+            + "\n".join(lines)
+        )
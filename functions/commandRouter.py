@@ -0,0 +1,342 @@
+import argparse
+import os
+import random
+import re
+import sys
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Route:
+    __slots__ = ("path", "handler", "aliases", "usage", "help", "section")
+
+    def __init__(self, path, handler, aliases=(), usage=None, help=None, section=None):
+        self.path = path
+        self.handler = handler
+        self.aliases = tuple(aliases)
+        self.usage = usage if usage is not None else path
+        self.help = help
+        self.section = section
+
+
+class _Node:
+    __slots__ = ("children", "route")
+
+    def __init__(self):
+        self.children = {}
+        self.route = None
+
+
+class Router:
+    """
+    Token trie from command words to handlers.
+
+    Routes (and their aliases) are added once when a command module is
+    imported. match() walks the message one token at a time, so finding a
+    handler costs one dict lookup per word typed however many routes
+    exist. The deepest route along the way wins and the words after it
+    become its args; a fallback handler gets the whole input when nothing
+    matches. Help text is generated from the usage/help strings given at
+    registration, grouped by section in registration order.
+    """
+
+    def __init__(self, name=""):
+        self.name = name
+        self.fallback_route = None
+        self._root = _Node()
+        self._routes = []
+
+    def add(self, path, handler, aliases=(), usage=None, help=None, section=None):
+        route = Route(path, handler, aliases, usage, help, section)
+        nodes = []
+        for spelling in (path, *route.aliases):
+            words = spelling.lower().split()
+            if not words:
+                raise ValueError("Route path cannot be empty")
+            node = self._root
+            for word in words:
+                node = node.children.setdefault(word, _Node())
+            if node.route is not None or node in nodes:
+                raise ValueError(f"Route '{spelling}' is already registered")
+            nodes.append(node)
+        for node in nodes:
+            node.route = route
+        self._routes.append(route)
+        return route
+
+    def command(self, path, aliases=(), usage=None, help=None, section=None):
+        """Decorator form of add()."""
+
+        def decorator(handler):
+            self.add(path, handler, aliases, usage, help, section)
+            return handler
+
+        return decorator
+
+    def fallback(self, usage=None, help=None, section=None):
+        """Decorator for the handler used when no route matches."""
+
+        def decorator(handler):
+            self.fallback_route = Route("", handler, (), usage, help, section)
+            self._routes.append(self.fallback_route)
+            return handler
+
+        return decorator
+
+    def document(self, usage, help, section=None):
+        """Help-only entry, for input handled inside another route."""
+        self._routes.append(Route("", None, (), usage, help, section))
+
+    def match(self, tokens):
+        """(route, remaining tokens) for the longest matching path, or None."""
+        children = self._root.children
+        best = None
+        consumed = 0
+        for index, token in enumerate(tokens, 1):
+            node = children.get(token.lower())
+            if node is None:
+                break
+            if node.route is not None:
+                best = node.route
+                consumed = index
+            children = node.children
+            if not children:
+                break
+        if best is None:
+            return None
+        return best, tokens[consumed:]
+
+    def resolve(self, tokens):
+        matched = self.match(tokens)
+        if matched is not None:
+            return matched
+        if self.fallback_route is not None:
+            return self.fallback_route, tokens
+        return None
+
+    def dispatch(self, sender_id, tokens, send_message_func):
+        """
+        Call the handler for `tokens` as handler(sender_id, args,
+        send_message_func). Returns the route that ran, or None.
+        """
+        resolved = self.resolve(tokens)
+        if resolved is None:
+            return None
+        route, args = resolved
+        route.handler(sender_id, args, send_message_func)
+        return route
+
+    def routes(self):
+        return [route for route in self._routes if route.handler is not None]
+
+    def help_lines(self, section=None):
+        lines = []
+        for route in self._routes:
+            if route.help is None or route.section != section:
+                continue
+            line = f"• '{f'{self.name} {route.usage}'.strip()}' - {route.help}"
+            if route.aliases:
+                line += f" (also: {', '.join(route.aliases)})"
+            lines.append(line)
+        return lines
+
+    def help_text(self):
+        """Documented routes as bullet lists, one block per section."""
+        sections = []
+        for route in self._routes:
+            if route.help is not None and route.section not in sections:
+                sections.append(route.section)
+
+        blocks = []
+        for section in sections:
+            lines = self.help_lines(section)
+            if section:
+                lines.insert(0, f"{section}:")
+            blocks.append("\n".join(lines))
+        return "\n\n".join(blocks)
+
+
+# Benchmark: python -m functions.commandRouter [corpus ...]
+#
+# A corpus is a text file with one message per line, or a server log, in
+# which case the texts of "Processing message from ..." lines are used.
+# Without one, messages are generated from the registered routes.
+
+LOGGED_MESSAGE = re.compile(r"Processing message from \S+: '(.*)' \(User's MID:")
+
+
+def load_corpus(paths):
+    messages = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                logged = LOGGED_MESSAGE.search(line)
+                text = logged.group(1) if logged else line.strip()
+                if text:
+                    messages.append(text)
+    return messages
+
+
+def synthetic_corpus(top_level, sub_routers, size, seed=0):
+    rng = random.Random(seed)
+    words = ["carrot", "gear/ancient_shovel", "egg/legendary", "above", "5000"]
+    commands = [route.path for route in top_level.routes()]
+    messages = []
+    for _ in range(size):
+        roll = rng.random()
+        if roll < 0.1:
+            messages.append(" ".join(rng.choices(words, k=rng.randint(1, 6))))
+            continue
+        command = rng.choice(commands)
+        router = sub_routers.get(command)
+        parts = [command]
+        if router is not None and router.routes() and roll < 0.9:
+            parts.append(rng.choice(router.routes()).path or rng.choice(words))
+        parts.extend(rng.choices(words, k=rng.randint(0, 3)))
+        messages.append(" ".join(parts))
+    return messages
+
+
+def _chain_lookup(routes, tokens):
+    # What an if/elif chain over args[0] does: compare in order.
+    if not tokens:
+        return None
+    action = tokens[0].lower()
+    for route in routes:
+        if action == route.path:
+            return route
+        for alias in route.aliases:
+            if action == alias:
+                return route
+    return None
+
+
+def combined_router(top_level, sub_routers):
+    """One trie over "command subcommand" paths, as used by the benchmark."""
+    combined = Router()
+    for route in top_level.routes():
+        combined.add(route.path, route.path)
+        router = sub_routers.get(route.path)
+        if router is None:
+            continue
+        for sub in router.routes():
+            if sub.path:
+                combined.add(
+                    f"{route.path} {sub.path}",
+                    sub,
+                    [f"{route.path} {alias}" for alias in sub.aliases],
+                )
+    return combined
+
+
+def benchmark(messages, top_level, sub_routers, rounds=5):
+    """Best-of-`rounds` seconds to route `messages` with each strategy."""
+    split = [message.lower().split() for message in messages]
+    combined = combined_router(top_level, sub_routers)
+    commands = {route.path: sub_routers.get(route.path) for route in top_level.routes()}
+    chains = {name: router.routes() for name, router in sub_routers.items()}
+
+    def via_trie():
+        match = combined.match
+        for parts in split:
+            match(parts)
+
+    def via_chain():
+        for parts in split:
+            if parts and parts[0] in commands:
+                routes = chains.get(parts[0])
+                if routes is not None:
+                    _chain_lookup(routes, parts[1:])
+
+    results = {}
+    for label, run in (("trie", via_trie), ("if/elif", via_chain)):
+        best = None
+        for _ in range(rounds):
+            started = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        results[label] = best
+    return results
+
+
+def with_extra_routes(top_level, sub_routers, count):
+    """
+    Copies of the routers with `count` made-up subcommands per command,
+    half registered before the real ones and half after.
+    """
+    grown = {}
+    for name, router in sub_routers.items():
+        copy = Router(router.name)
+        for number in range(count // 2):
+            copy.add(f"extra{number}", _unused)
+        for route in router.routes():
+            if route.path:
+                copy.add(route.path, route.handler, route.aliases)
+        for number in range(count // 2, count):
+            copy.add(f"extra{number}", _unused)
+        grown[name] = copy
+    return top_level, grown
+
+
+def _unused(sender_id, args, send_message_func):
+    pass
+
+
+def _load_routers(cmd_dir):
+    from functions.commandRegistry import CommandRegistry
+
+    registry = CommandRegistry(cmd_dir)
+    top_level = Router()
+    sub_routers = {}
+    for name in registry:
+        module = registry.get(name)
+        if module is None:
+            continue
+        top_level.add(name, module)
+        # Not isinstance(): under -m this file is __main__, not the module
+        # the commands imported.
+        router = getattr(module, "router", None)
+        if callable(getattr(router, "resolve", None)):
+            sub_routers[name] = router
+    return top_level, sub_routers
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Command router benchmark")
+    parser.add_argument("corpus", nargs="*", help="message or server log files")
+    parser.add_argument("--size", type=int, default=200000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument(
+        "--extra-routes",
+        type=int,
+        nargs="*",
+        default=[50, 500],
+        help="also time routers grown by this many subcommands each",
+    )
+    parser.add_argument(
+        "--cmd-dir",
+        default=os.path.join(os.path.dirname(os.path.dirname(__file__)), "cmd"),
+    )
+    args = parser.parse_args()
+
+    top_level, sub_routers = _load_routers(args.cmd_dir)
+    if args.corpus:
+        messages = load_corpus(args.corpus)
+    else:
+        messages = synthetic_corpus(top_level, sub_routers, args.size)
+    if not messages:
+        sys.exit("Corpus is empty")
+
+    print(f"{len(messages)} messages, {len(top_level.routes())} commands")
+    for extra in [0] + args.extra_routes:
+        routers = with_extra_routes(top_level, sub_routers, extra)
+        results = benchmark(messages, *routers, rounds=args.rounds)
+        subcommands = sum(len(r.routes()) for r in routers[1].values())
+        print(f"{subcommands} subcommands:")
+        for label, seconds in results.items():
+            print(
+                f"  {label:<8} {seconds * 1000:8.1f} ms  {seconds / len(messages) * 1e9:7.0f} ns/message"
+            )
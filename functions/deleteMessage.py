@@ -2,6 +2,8 @@ import requests
 import json
 import logging
 
+from functions.metrics import graph_call
+
 logger = logging.getLogger(__name__)
 
 with open("config.json", "r") as f:
@@ -9,15 +11,16 @@ with open("config.json", "r") as f:
 
 PAGE_ACCESS_TOKEN = config["page_access_token"]
 GRAPH_API_VERSION = config["graph_api_version"]
+GRAPH_API_BASE = config.get("graph_api_base", "https://graph.facebook.com")
 
 
 def delete_message(message_id):
     params = {"access_token": PAGE_ACCESS_TOKEN}
 
-    url = f"https://graph.facebook.com/{GRAPH_API_VERSION}/{message_id}"
+    url = f"{GRAPH_API_BASE}/{GRAPH_API_VERSION}/{message_id}"
 
     try:
-        response = requests.delete(url, params=params)
+        response = graph_call("delete_message", requests.delete, url, params=params)
         if response.status_code != 200:
             logger.error(
                 f"Failed to delete message: {response.status_code} {response.text}"
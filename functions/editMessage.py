@@ -2,6 +2,8 @@ import requests
 import json
 import logging
 
+from functions.metrics import graph_call
+
 logger = logging.getLogger(__name__)
 
 # This function needs to be loaded after config is loaded in server.py
@@ -10,11 +12,13 @@ logger = logging.getLogger(__name__)
 
 PAGE_ACCESS_TOKEN = None
 GRAPH_API_VERSION = None
+GRAPH_API_BASE = "https://graph.facebook.com"
 
 
 def init_edit_message_config(config):
-    global PAGE_ACCESS_TOKEN, GRAPH_API_VERSION
+    global PAGE_ACCESS_TOKEN, GRAPH_API_VERSION, GRAPH_API_BASE
     PAGE_ACCESS_TOKEN = config.get("page_access_token")
+    GRAPH_API_BASE = config.get("graph_api_base", GRAPH_API_BASE)
     GRAPH_API_VERSION = config.get(
         "graph_api_version", "v19.0"
     )  # Default if not in config
@@ -44,10 +48,17 @@ def edit_bot_message(message_id_to_edit, new_text, recipient_id):
     headers = {"Content-Type": "application/json"}
     data = {"recipient": {"id": recipient_id}, "message": {"text": edited_message_text}}
 
-    url = f"https://graph.facebook.com/{GRAPH_API_VERSION}/me/messages"
+    url = f"{GRAPH_API_BASE}/{GRAPH_API_VERSION}/me/messages"
 
     try:
-        response = requests.post(url, params=params, headers=headers, json=data)
+        response = graph_call(
+            "edit_message",
+            requests.post,
+            url,
+            params=params,
+            headers=headers,
+            json=data,
+        )
         response_data = response.json()
         if response.status_code == 200 and response_data.get("message_id"):
             logger.info(
@@ -0,0 +1,268 @@
+import requests
+import json
+import random
+import threading
+import logging
+from collections import defaultdict
+
+from functions import asyncHttp
+from functions.jsonCodec import response_json
+from functions.metrics import upstream_call, upstream_call_async
+from functions.circuitBreaker import (
+    CircuitBreaker,
+    CircuitOpenError,
+    CLOSED,
+    backoff_delay,
+)
+
+logger = logging.getLogger(__name__)
+
+try:
+    with open("config.json", "r") as f:
+        config = json.load(f)
+except Exception:
+    config = {}
+
+# Point these at functions.stockStub to run without the live APIs.
+STOCK_API_URL = config.get(
+    "stock_api_url", "https://vmi2625091.contaboserver.net/api/stocks"
+)
+WEATHER_API_URL = config.get(
+    "weather_api_url", "https://growagardenstock.com/api/stock/weather"
+)
+REQUEST_HEADERS = {"User-Agent": "GagStock-Bot/1.0"}
+REQUEST_TIMEOUT = 15
+
+RETRY_BASE_DELAY = 30.0
+RETRY_MAX_DELAY = 600.0
+RETRY_JITTER = 10.0
+
+
+class StockAPIError(requests.RequestException):
+    """Raised when an upstream endpoint answers with a non-200 status."""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class StockAPIUnavailable(requests.RequestException):
+    """Raised without touching the network while an endpoint's circuit is open."""
+
+    def __init__(self, message, retry_after=0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _InFlightCall:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into a single execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    is still running block until it finishes and receive the same result
+    (or the same exception). Nothing is cached once the call completes.
+    With a `stats_key`, calls for every key are counted under it instead
+    of per key, for callers whose keys are unbounded (user ids).
+    """
+
+    def __init__(self, stats_key=None):
+        self.stats_key = stats_key
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = defaultdict(lambda: {"calls": 0, "executions": 0, "coalesced": 0})
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            stats = self._stats[key if self.stats_key is None else self.stats_key]
+            stats["calls"] += 1
+            call = self._calls.get(key)
+            if call is None:
+                call = _InFlightCall()
+                self._calls[key] = call
+                stats["executions"] += 1
+                is_leader = True
+            else:
+                stats["coalesced"] += 1
+                is_leader = False
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {key: dict(value) for key, value in self._stats.items()}
+
+
+_single_flight = SingleFlight()
+_breakers = {
+    "stock": CircuitBreaker("stock"),
+    "weather": CircuitBreaker("weather"),
+}
+_suppressed_lock = threading.Lock()
+_suppressed_notifications = 0
+
+
+def _get_json(url, name):
+    try:
+        response = upstream_call(
+            name.lower(),
+            requests.get,
+            url,
+            timeout=REQUEST_TIMEOUT,
+            headers=REQUEST_HEADERS,
+        )
+    except requests.exceptions.RequestException as e:
+        logger.error(f"{name} API request failed: {e}")
+        raise
+
+    if response.status_code != 200:
+        logger.error(f"{name} API error: {response.status_code} - {response.text}")
+        raise StockAPIError(
+            f"{name} API returned {response.status_code}",
+            status_code=response.status_code,
+        )
+
+    try:
+        return response_json(response)
+    except ValueError as e:
+        logger.error(f"Failed to parse {name.lower()} data JSON: {e}")
+        raise
+
+
+def _guarded_get_json(key, url, name):
+    try:
+        return _breakers[key].call(_get_json, url, name)
+    except CircuitOpenError as e:
+        raise StockAPIUnavailable(
+            f"{name} API unavailable (circuit open)", retry_after=e.retry_after
+        )
+
+
+async def _get_json_async(url, name):
+    try:
+        response = await upstream_call_async(
+            name.lower(),
+            asyncHttp.request,
+            "GET",
+            url,
+            timeout=REQUEST_TIMEOUT,
+            headers=REQUEST_HEADERS,
+        )
+    except requests.exceptions.RequestException as e:
+        logger.error(f"{name} API request failed: {e}")
+        raise
+
+    if response.status_code != 200:
+        logger.error(f"{name} API error: {response.status_code} - {response.text}")
+        raise StockAPIError(
+            f"{name} API returned {response.status_code}",
+            status_code=response.status_code,
+        )
+
+    try:
+        return response_json(response)
+    except ValueError as e:
+        logger.error(f"Failed to parse {name.lower()} data JSON: {e}")
+        raise
+
+
+async def _guarded_get_json_async(key, url, name):
+    try:
+        return await _breakers[key].call_async(_get_json_async, url, name)
+    except CircuitOpenError as e:
+        raise StockAPIUnavailable(
+            f"{name} API unavailable (circuit open)", retry_after=e.retry_after
+        )
+
+
+def fetch_stock_data():
+    """
+    Fetch and parse the current stock snapshot.
+
+    Concurrent callers share one in-flight GET and receive the same parsed
+    dict, so callers must treat the result as read-only. Raises
+    StockAPIUnavailable without a network call while the circuit is open.
+    """
+    return _single_flight.do(
+        "stock", _guarded_get_json, "stock", STOCK_API_URL, "Stock"
+    )
+
+
+def fetch_weather_data():
+    """Fetch and parse the current weather, coalescing concurrent callers."""
+    return _single_flight.do(
+        "weather", _guarded_get_json, "weather", WEATHER_API_URL, "Weather"
+    )
+
+
+async def fetch_stock_data_async():
+    """
+    Coroutine version of fetch_stock_data(), sharing its circuit breaker.
+    Not coalesced: it is meant for the single async poller.
+    """
+    return await _guarded_get_json_async("stock", STOCK_API_URL, "Stock")
+
+
+async def fetch_weather_data_async():
+    return await _guarded_get_json_async("weather", WEATHER_API_URL, "Weather")
+
+
+def is_upstream_available():
+    return all(breaker.state == CLOSED for breaker in _breakers.values())
+
+
+def get_retry_delay(attempt):
+    """
+    Delay before a poller's next attempt after `attempt` consecutive
+    failures: jittered exponential backoff, but never earlier than the
+    moment the open circuits will admit a probe again.
+    """
+    delay = backoff_delay(attempt, RETRY_BASE_DELAY, RETRY_MAX_DELAY)
+    circuit_wait = max(breaker.retry_after() for breaker in _breakers.values())
+    if circuit_wait > 0:
+        delay = max(delay, circuit_wait + random.uniform(0, RETRY_JITTER))
+    return delay
+
+
+def record_suppressed_notification():
+    global _suppressed_notifications
+    with _suppressed_lock:
+        _suppressed_notifications += 1
+
+
+def get_fetch_stats():
+    """
+    Per-endpoint counters: total calls, upstream executions, and how many
+    calls were coalesced onto an already in-flight request, plus circuit
+    breaker state and the number of suppressed outage notifications.
+    """
+    with _suppressed_lock:
+        suppressed = _suppressed_notifications
+    return {
+        "single_flight": _single_flight.stats(),
+        "circuits": {key: breaker.stats() for key, breaker in _breakers.items()},
+        "suppressed_notifications": suppressed,
+    }
@@ -1,6 +1,13 @@
 import requests
 import json
+import threading
+import time
 import logging
+from collections import OrderedDict
+
+from functions.fetchStock import SingleFlight
+from functions.jsonCodec import response_json
+from functions.metrics import graph_call
 
 logger = logging.getLogger(__name__)
 
@@ -9,24 +16,204 @@ with open("config.json", "r") as f:
 
 PAGE_ACCESS_TOKEN = config["page_access_token"]
 GRAPH_API_VERSION = config["graph_api_version"]
+GRAPH_API_BASE = config.get("graph_api_base", "https://graph.facebook.com")
 
+PROFILE_FIELDS = "first_name,last_name,profile_pic"
+PROFILE_TTL = config.get("profile_cache_ttl", 24 * 3600)
+PROFILE_NEGATIVE_TTL = config.get("profile_negative_ttl", 300)
+PROFILE_CACHE_SIZE = 10000
+PREFETCH_CHUNK = 50
+REQUEST_TIMEOUT = 10
 
-def get_user_profile(user_id):
-    params = {
-        "fields": "first_name,last_name,profile_pic",
-        "access_token": PAGE_ACCESS_TOKEN,
-    }
-
-    url = f"https://graph.facebook.com/{GRAPH_API_VERSION}/{user_id}"
 
+def _get_profiles(url, params, what):
+    """
+    GET profile data from Graph. Returns (data, definitive): data is None
+    if the lookup failed, and definitive says whether the answer can be
+    cached. A 4xx other than rate limiting means Graph will not return the
+    profile; transport errors, 429 and 5xx may clear on the next try.
+    """
     try:
-        response = requests.get(url, params=params)
+        response = graph_call(
+            "profile", requests.get, url, params=params, timeout=REQUEST_TIMEOUT
+        )
         if response.status_code != 200:
             logger.error(
-                f"Failed to get user profile: {response.status_code} {response.text}"
+                f"Failed to get {what}: {response.status_code} {response.text}"
             )
-            return None
-        return response.json()
+            return None, (
+                400 <= response.status_code < 500 and response.status_code != 429
+            )
+        return response_json(response), True
     except Exception as e:
-        logger.error(f"Error getting user profile: {str(e)}")
+        logger.error(f"Error getting {what}: {str(e)}")
+        return None, False
+
+
+def _fetch_user_profile(user_id):
+    params = {
+        "fields": PROFILE_FIELDS,
+        "access_token": PAGE_ACCESS_TOKEN,
+    }
+
+    url = f"{GRAPH_API_BASE}/{GRAPH_API_VERSION}/{user_id}"
+    return _get_profiles(url, params, "user profile")
+
+
+def fetch_user_profile(user_id):
+    """One Graph API lookup, bypassing the cache. None on failure."""
+    return _fetch_user_profile(user_id)[0]
+
+
+def fetch_user_profiles(user_ids):
+    """
+    Look up several users in one Graph call (`?ids=`). Returns a dict of
+    the profiles Graph returned, leaving out users it did not, or None if
+    the call itself failed.
+    """
+    params = {
+        "ids": ",".join(str(user_id) for user_id in user_ids),
+        "fields": PROFILE_FIELDS,
+        "access_token": PAGE_ACCESS_TOKEN,
+    }
+
+    url = f"{GRAPH_API_BASE}/{GRAPH_API_VERSION}/"
+    profiles, _ = _get_profiles(url, params, "user profiles")
+    if profiles is None:
         return None
+    return profiles if isinstance(profiles, dict) else {}
+
+
+class ProfileCache:
+    """
+    TTL + LRU cache of user profiles.
+
+    Profiles are kept for `ttl` seconds and failed lookups for
+    `negative_ttl`, so a user whose profile cannot be read does not cost
+    a Graph call on every message. At most `max_entries` users are kept,
+    least recently used dropped first. prefetch() fills the cache for many
+    users at once, PREFETCH_CHUNK per Graph call. A failure that may be
+    transient (network, rate limit, server error) is not cached, and
+    concurrent misses for one user share a single Graph call.
+    """
+
+    def __init__(
+        self,
+        ttl=PROFILE_TTL,
+        negative_ttl=PROFILE_NEGATIVE_TTL,
+        max_entries=PROFILE_CACHE_SIZE,
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "negative_hits": 0, "misses": 0, "fetches": 0}
+        self._single_flight = SingleFlight(stats_key="profile")
+
+    def _lookup(self, user_id):
+        """(found, profile) from the cache; profile is None for a cached failure."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[1] <= time.monotonic():
+                self._stats["misses"] += 1
+                return False, None
+            self._entries.move_to_end(user_id)
+            self._stats["hits" if entry[0] is not None else "negative_hits"] += 1
+            return True, entry[0]
+
+    def _store(self, user_id, profile):
+        ttl = self.ttl if profile is not None else self.negative_ttl
+        with self._lock:
+            self._entries[user_id] = (profile, time.monotonic() + ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, user_id):
+        found, profile = self._lookup(user_id)
+        if found:
+            return profile
+        return self._single_flight.do(user_id, self._fetch, user_id)
+
+    def _fetch(self, user_id):
+        with self._lock:
+            self._stats["fetches"] += 1
+        profile, definitive = _fetch_user_profile(user_id)
+        if definitive:
+            self._store(user_id, profile)
+        return profile
+
+    def peek(self, user_id):
+        """Cached profile or None, without a Graph call."""
+        return self._lookup(user_id)[1]
+
+    def prefetch(self, user_ids):
+        """
+        Load profiles for the `user_ids` not cached yet. Returns how many
+        were fetched successfully.
+        """
+        now = time.monotonic()
+        with self._lock:
+            missing = list(
+                dict.fromkeys(
+                    user_id
+                    for user_id in user_ids
+                    if user_id not in self._entries or self._entries[user_id][1] <= now
+                )
+            )
+
+        loaded = 0
+        for start in range(0, len(missing), PREFETCH_CHUNK):
+            chunk = missing[start : start + PREFETCH_CHUNK]
+            with self._lock:
+                self._stats["fetches"] += 1
+            profiles = fetch_user_profiles(chunk)
+            if profiles is None:
+                # Nothing was learned about these users; get() retries them.
+                continue
+            for user_id in chunk:
+                profile = profiles.get(str(user_id))
+                self._store(user_id, profile)
+                loaded += profile is not None
+        return loaded
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = (
+                self._stats["hits"]
+                + self._stats["negative_hits"]
+                + self._stats["misses"]
+            )
+            coalesced = (
+                self._single_flight.stats().get("profile", {}).get("coalesced", 0)
+            )
+            return dict(
+                self._stats,
+                coalesced=coalesced,
+                entries=len(self._entries),
+                hit_ratio=(
+                    (self._stats["hits"] + self._stats["negative_hits"]) / lookups
+                    if lookups
+                    else 0.0
+                ),
+            )
+
+
+profile_cache = ProfileCache()
+
+
+def get_user_profile(user_id):
+    return profile_cache.get(user_id)
+
+
+def get_display_name(user_id, default=""):
+    """First name from the cache (or one lookup), for personalised messages."""
+    profile = profile_cache.get(user_id)
+    if not profile:
+        return default
+    return profile.get("first_name") or default
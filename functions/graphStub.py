@@ -0,0 +1,286 @@
+"""
+Local stand-in for the Graph API endpoints the bot calls, for exercising
+it without a real page.
+
+    python -m functions.graphStub --port 8089 [--latency 0.15 --jitter 0.1]
+        [--error-rate 0.01] [--throttle-rate 0.01] [--max-rps 250]
+
+then set "graph_api_base": "http://127.0.0.1:8089" in config.json. It
+answers POST /<version>/me/messages (messages and typing indicators),
+batch POSTs to /<version>/, profile GETs (/<version>/<user_id> and
+/<version>/?ids=) and message DELETEs with the same response shapes as
+Graph (user ids starting with "missing" are unknown users), and records every message it accepts (GET /stub/messages lists
+them, GET /stub/stats counts requests and injected failures).
+
+The fault options add latency to every call, answer a fraction with a
+transient 500, and answer with 429 and Graph's rate-limit error either at
+random or above a sustained request rate.
+"""
+
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+_message_ids = itertools.count(1)
+_lock = threading.Lock()
+sent_messages = []
+
+GRAPH_ERROR = {
+    "error": {
+        "message": "An unexpected error has occurred. Please retry your request later.",
+        "type": "OAuthException",
+        "code": 2,
+        "is_transient": True,
+    }
+}
+GRAPH_UNKNOWN_USER = {
+    "error": {
+        "message": "Unsupported get request. Object does not exist or cannot be loaded.",
+        "type": "GraphMethodException",
+        "code": 100,
+    }
+}
+GRAPH_THROTTLED = {
+    "error": {
+        "message": "(#613) Calls to this api have exceeded the rate limit.",
+        "type": "OAuthException",
+        "code": 613,
+    }
+}
+
+
+class Faults:
+    """
+    Failure injection shared by the stub servers: fixed plus random
+    latency, a fraction of server errors, and throttling either at random
+    or beyond `max_rps` requests per second (token bucket, one second of
+    burst).
+    """
+
+    def __init__(
+        self, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, max_rps=None
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.max_rps = max_rps
+        self.stats = Counter()
+        self._tokens = max_rps or 0.0
+        self._refilled = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _over_rate(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.max_rps, self._tokens + (now - self._refilled) * self.max_rps
+            )
+            self._refilled = now
+            if self._tokens < 1:
+                return True
+            self._tokens -= 1
+            return False
+
+    def apply(self):
+        """
+        Wait out the latency for one request and pick its outcome: None
+        to answer normally, "error" or "throttled".
+        """
+        if self.max_rps and self._over_rate():
+            outcome = "throttled"
+        else:
+            roll = random.random()
+            if roll < self.throttle_rate:
+                outcome = "throttled"
+            elif roll < self.throttle_rate + self.error_rate:
+                outcome = "error"
+            else:
+                outcome = None
+
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+        with self._lock:
+            self.stats["requests"] += 1
+            if outcome:
+                self.stats[outcome] += 1
+        return outcome
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats)
+
+
+def add_fault_arguments(parser):
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds added to every response"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="extra random latency, up to seconds"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="fraction answered with 500"
+    )
+    parser.add_argument(
+        "--throttle-rate", type=float, default=0.0, help="fraction answered with 429"
+    )
+    parser.add_argument(
+        "--max-rps", type=float, default=None, help="answer 429 above this rate"
+    )
+
+
+def faults_from_args(args):
+    return Faults(
+        args.latency, args.jitter, args.error_rate, args.throttle_rate, args.max_rps
+    )
+
+
+def _accept(recipient, message):
+    with _lock:
+        message_id = f"m_stub_{next(_message_ids)}"
+        sent_messages.append(
+            {"recipient": recipient, "message": message, "message_id": message_id}
+        )
+    return {"recipient_id": recipient.get("id"), "message_id": message_id}
+
+
+def _profile(user_id):
+    return {
+        "first_name": "Stub",
+        "last_name": f"User {str(user_id)[-4:]}",
+        "profile_pic": f"https://example.invalid/{user_id}.png",
+        "id": str(user_id),
+    }
+
+
+class GraphStubHandler(BaseHTTPRequestHandler):
+    def _reply(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        raw = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode()
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            return json.loads(raw or "{}")
+        return {key: values[0] for key, values in parse_qs(raw).items()}
+
+    def _faulted(self):
+        outcome = self.server.faults.apply()
+        if outcome == "throttled":
+            self._reply(429, GRAPH_THROTTLED, {"Retry-After": "1"})
+        elif outcome == "error":
+            self._reply(500, GRAPH_ERROR)
+        return outcome is not None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/stub/messages":
+            with _lock:
+                self._reply(200, list(sent_messages))
+            return
+        if url.path == "/stub/stats":
+            with _lock:
+                accepted = len(sent_messages)
+            self._reply(200, dict(self.server.faults.snapshot(), messages=accepted))
+            return
+
+        if self._faulted():
+            return
+        parts = [part for part in url.path.split("/") if part]
+        query = parse_qs(url.query)
+        if len(parts) == 1 and "ids" in query:
+            ids = query["ids"][0].split(",")
+            self._reply(
+                200,
+                {
+                    user_id: _profile(user_id)
+                    for user_id in ids
+                    if not user_id.startswith("missing")
+                },
+            )
+        elif len(parts) == 2 and parts[1].startswith("missing"):
+            self._reply(400, GRAPH_UNKNOWN_USER)
+        elif len(parts) == 2:
+            self._reply(200, _profile(parts[1]))
+        else:
+            self._reply(404, {"error": {"message": "Unknown path"}})
+
+    def do_DELETE(self):
+        if self._faulted():
+            return
+        self._reply(200, {"success": True})
+
+    def do_POST(self):
+        path = urlparse(self.path).path.rstrip("/")
+        data = self._read_body()
+        if self._faulted():
+            return
+
+        if path.endswith("/me/messages"):
+            if "message" not in data:
+                self._reply(200, {"recipient_id": data["recipient"]["id"]})
+                return
+            self._reply(200, _accept(data["recipient"], data["message"]))
+            return
+
+        if "batch" in data:
+            responses = []
+            for operation in json.loads(data["batch"]):
+                body = {k: v[0] for k, v in parse_qs(operation.get("body", "")).items()}
+                try:
+                    result = _accept(
+                        json.loads(body["recipient"]), json.loads(body["message"])
+                    )
+                    responses.append({"code": 200, "body": json.dumps(result)})
+                except (KeyError, ValueError):
+                    responses.append(
+                        {
+                            "code": 400,
+                            "body": json.dumps(
+                                {"error": {"message": "Invalid operation"}}
+                            ),
+                        }
+                    )
+            self._reply(200, responses)
+            return
+
+        self._reply(404, {"error": {"message": "Unknown path"}})
+
+    def log_message(self, format, *args):
+        pass
+
+
+class GraphStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, handler, faults=None):
+        super().__init__(address, handler)
+        self.faults = faults or Faults()
+
+
+def serve(host="127.0.0.1", port=8089, faults=None):
+    return GraphStubServer((host, port), GraphStubHandler, faults)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Graph API stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+    print(f"Graph API stub listening on http://{args.host}:{args.port}")
+    serve(args.host, args.port, faults_from_args(args)).serve_forever()
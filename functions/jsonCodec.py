@@ -0,0 +1,223 @@
+"""
+JSON encoding and decoding through the fastest available backend:
+orjson, then msgspec, then the standard library. Set "json_backend" in
+config.json to pin one ("orjson", "msgspec" or "json").
+
+All backends behave the same for the JSON this bot handles: loads()
+accepts str or bytes and raises ValueError on invalid input, dumps()
+returns str with non-ASCII characters left as they are.
+
+    python -m functions.jsonCodec [payload.json ...]
+
+times each installed backend on captured stock/weather payloads (see
+--capture), or on a generated one.
+"""
+
+import json
+import logging
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+logger = logging.getLogger(__name__)
+
+try:
+    with open("config.json", "r") as f:
+        config = json.load(f)
+except Exception:
+    config = {}
+
+
+def _stdlib_loads(data):
+    return json.loads(data)
+
+
+def _stdlib_dumps(obj, sort_keys=False, default=None):
+    return json.dumps(
+        obj,
+        sort_keys=sort_keys,
+        default=default,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+
+
+def _orjson_loads(data):
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError as e:
+        raise ValueError(str(e)) from e
+
+
+def _orjson_dumps(obj, sort_keys=False, default=None):
+    option = orjson.OPT_NON_STR_KEYS
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    return orjson.dumps(obj, default=default, option=option).decode()
+
+
+def _msgspec_loads(data):
+    try:
+        return msgspec.json.decode(data)
+    except msgspec.DecodeError as e:
+        raise ValueError(str(e)) from e
+
+
+def _msgspec_dumps(obj, sort_keys=False, default=None):
+    return msgspec.json.encode(
+        obj, enc_hook=default, order="sorted" if sort_keys else None
+    ).decode()
+
+
+BACKENDS = {"json": (_stdlib_loads, _stdlib_dumps)}
+if msgspec is not None:
+    BACKENDS["msgspec"] = (_msgspec_loads, _msgspec_dumps)
+if orjson is not None:
+    BACKENDS["orjson"] = (_orjson_loads, _orjson_dumps)
+
+
+def _pick_backend():
+    wanted = config.get("json_backend")
+    if wanted:
+        if wanted in BACKENDS:
+            return wanted
+        logger.warning(f"JSON backend '{wanted}' is not installed, falling back")
+    for name in ("orjson", "msgspec", "json"):
+        if name in BACKENDS:
+            return name
+
+
+BACKEND = _pick_backend()
+_loads, _dumps = BACKENDS[BACKEND]
+
+
+def loads(data):
+    """Parse JSON from str or bytes. Raises ValueError if invalid."""
+    return _loads(data)
+
+
+def dumps(obj, sort_keys=False, default=None):
+    """Compact JSON text for `obj`."""
+    return _dumps(obj, sort_keys=sort_keys, default=default)
+
+
+def response_json(response):
+    """Body of a requests/httpx response, parsed with the selected backend."""
+    return _loads(response.content)
+
+
+def _sample_payloads():
+    # Shaped like the stock and weather API responses.
+    categories = ("gear", "seed", "egg", "honey", "costmetic")
+    stock = {
+        category: [
+            {
+                "name": f"{category.title()} Item {number}",
+                "value": number * 125,
+                "emoji": "🌱",
+                "image": f"https://example.invalid/{category}/{number}.png",
+            }
+            for number in range(1, 25)
+        ]
+        for category in categories
+    }
+    stock["updatedAt"] = 1750000000000
+    weather = {
+        "currentWeather": "Rain",
+        "icon": "🌧️",
+        "description": "Rain falls across the garden",
+        "effectDescription": "Crops grow 50% faster",
+        "cropBonuses": "Wet",
+        "visualCue": "Dark clouds",
+        "rarity": "Common",
+        "updatedAt": 1750000000000,
+    }
+    return [json.dumps(stock).encode(), json.dumps(weather).encode()]
+
+
+def _capture(directory):
+    import os
+
+    import requests
+
+    from functions.fetchStock import REQUEST_HEADERS, STOCK_API_URL, WEATHER_API_URL
+
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for name, url in (("stock", STOCK_API_URL), ("weather", WEATHER_API_URL)):
+        response = requests.get(url, headers=REQUEST_HEADERS, timeout=15)
+        response.raise_for_status()
+        path = os.path.join(directory, f"{name}.json")
+        with open(path, "wb") as f:
+            f.write(response.content)
+        paths.append(path)
+    return paths
+
+
+def benchmark(payloads, rounds=2000):
+    """Microseconds per decode, sorted encode and decode+key per backend."""
+    import hashlib
+    import timeit
+
+    results = {}
+    for name, (backend_loads, backend_dumps) in BACKENDS.items():
+        parsed = [backend_loads(payload) for payload in payloads]
+
+        def decode():
+            for payload in payloads:
+                backend_loads(payload)
+
+        def encode():
+            backend_dumps(parsed, sort_keys=True)
+
+        def poll():
+            # What the stock poller does per tick: parse, then hash a
+            # sorted dump to detect a change.
+            data = [backend_loads(payload) for payload in payloads]
+            hashlib.md5(backend_dumps(data, sort_keys=True).encode()).hexdigest()
+
+        results[name] = {
+            label: min(timeit.repeat(fn, number=rounds, repeat=3)) / rounds * 1e6
+            for label, fn in (("decode", decode), ("encode", encode), ("poll", poll))
+        }
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="JSON backend microbenchmark")
+    parser.add_argument("payloads", nargs="*", help="captured JSON payload files")
+    parser.add_argument(
+        "--capture", metavar="DIR", help="save live stock/weather payloads to DIR"
+    )
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    paths = args.payloads
+    if args.capture:
+        paths = paths + _capture(args.capture)
+    if paths:
+        payloads = []
+        for path in paths:
+            with open(path, "rb") as f:
+                payloads.append(f.read())
+    else:
+        payloads = _sample_payloads()
+
+    print(
+        f"{len(payloads)} payloads, {sum(map(len, payloads))} bytes; "
+        f"selected backend: {BACKEND}"
+    )
+    for name, timings in benchmark(payloads, args.rounds).items():
+        print(
+            f"  {name:<8} "
+            + "  ".join(f"{label} {us:8.1f} us" for label, us in timings.items())
+        )
@@ -0,0 +1,188 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from functions.jsonCodec import dumps
+
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+QUEUE_SIZE = 10000
+# Fraction of records kept per event unless "log_sampling" overrides it.
+DEFAULT_SAMPLING = {"webhook.payload": 0.1, "send.response": 0.1, "trace": 0.1}
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+class LazyJson:
+    """
+    JSON dump of `value` rendered only when a log record is formatted.
+    Pass it as a %-style argument rather than in an f-string:
+
+        logger.info("Payload: %s", LazyJson(data), extra={"event": "..."})
+    """
+
+    __slots__ = ("value", "indent")
+
+    def __init__(self, value, indent=None):
+        self.value = value
+        self.indent = indent
+
+    def __str__(self):
+        try:
+            if self.indent is None:
+                return dumps(self.value, default=str)
+            return json.dumps(self.value, indent=self.indent, default=str)
+        except (TypeError, ValueError):
+            return repr(self.value)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with the `event` tag and any `fields`."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        event = getattr(record, "event", None)
+        if event:
+            entry["event"] = event
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep a fraction of the records tagged with `extra={"event": name}`,
+    as set per event in `rates`. Untagged records and anything at
+    WARNING or above always pass.
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = dict(rates or {})
+        self.dropped = Counter()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(getattr(record, "event", None))
+        if rate is None or rate >= 1 or random.random() < rate:
+            return True
+        self.dropped[record.event] += 1
+        return False
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread. The stock
+    handler renders the message before enqueueing so records can cross
+    processes; this queue stays in-process, so the caller only pays for
+    putting the record on the queue.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.lost = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Never block a request on logging; count what was lost.
+            self.lost += 1
+
+
+def setup_logging(config=None):
+    """
+    Route all logging through a queue drained by a background thread.
+
+    Config keys: "log_level" (default INFO), "log_format" ("json", the
+    default, or "text"), "log_file" (stderr when unset) and
+    "log_sampling", a map of event name to the fraction of records kept.
+    Safe to call more than once; only the first call takes effect.
+    """
+    global _listener
+    config = config or {}
+    with _setup_lock:
+        if _listener is not None:
+            return _listener
+
+        if config.get("log_format", "json") == "text":
+            formatter = logging.Formatter(TEXT_FORMAT)
+        else:
+            formatter = JsonFormatter()
+        log_file = config.get("log_file")
+        output = (
+            logging.FileHandler(log_file, encoding="utf-8")
+            if log_file
+            else logging.StreamHandler(sys.stderr)
+        )
+        output.setFormatter(formatter)
+
+        handler = DeferredQueueHandler(queue.Queue(QUEUE_SIZE))
+        handler.addFilter(
+            SamplingFilter(dict(DEFAULT_SAMPLING, **config.get("log_sampling", {})))
+        )
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        root.setLevel(config.get("log_level", "INFO"))
+
+        _listener = QueueListener(handler.queue, output)
+        _listener.start()
+        atexit.register(_stop_listener)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=_restart_listener)
+        return _listener
+
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+
+def _restart_listener():
+    # A forked worker (e.g. gunicorn --preload) does not inherit the
+    # writer thread; start its own on the same queue.
+    global _listener
+    if _listener is not None:
+        _listener = QueueListener(_listener.queue, *_listener.handlers)
+        _listener.start()
+
+
+def stats():
+    """Records dropped by sampling (per event) and by a full queue."""
+    root = logging.getLogger()
+    for handler in root.handlers:
+        if isinstance(handler, DeferredQueueHandler):
+            dropped = Counter()
+            for log_filter in handler.filters:
+                if isinstance(log_filter, SamplingFilter):
+                    dropped.update(log_filter.dropped)
+            return {
+                "sampled_out": dict(dropped),
+                "lost": handler.lost,
+                "queued": handler.queue.qsize(),
+            }
+    return {}
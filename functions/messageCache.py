@@ -0,0 +1,233 @@
+import sys
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+from functions.sharedState import shared_state
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+DEFAULT_TTL = 60
+SWEEP_INTERVAL = 30
+SHARED_NAMESPACE = "message_cache"
+
+
+def time_bucket(seconds, now=None):
+    return int((time.time() if now is None else now) // seconds)
+
+
+def shared_key(scope, version=None, bucket_seconds=DEFAULT_TTL):
+    """
+    Cache key for a response that does not depend on the user. Keyed by a
+    snapshot version when the caller has one, otherwise by the current
+    `bucket_seconds`-wide time bucket.
+    """
+    if version is None:
+        version = f"t{time_bucket(bucket_seconds)}"
+    return f"shared:{scope}:{version}"
+
+
+def compose_message(body, suffix):
+    if body is None or not suffix:
+        return body
+    return f"{body}{suffix}"
+
+
+class MessageCache:
+    """
+    Thread-safe LRU cache with per-entry TTL and a memory cap.
+
+    Entries are evicted least-recently-used first when either the entry
+    count or the approximate byte size exceeds its limit. Expired entries
+    are dropped lazily on read and by a background sweeper thread.
+
+    When a `shared_store` is given, user-independent bodies cached through
+    get_shared() are also written there, so a body rendered by one worker
+    process is reused by the others until it expires.
+    """
+
+    def __init__(
+        self,
+        max_entries=DEFAULT_MAX_ENTRIES,
+        max_bytes=DEFAULT_MAX_BYTES,
+        default_ttl=DEFAULT_TTL,
+        sweep_interval=SWEEP_INTERVAL,
+        shared_store=None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.sweep_interval = sweep_interval
+        self.shared_store = shared_store
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._sweeper = None
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "shared_hits": 0,
+            "shared_errors": 0,
+        }
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            value, expires_at, size = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self._bytes -= size
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        size = sys.getsizeof(key) + sys.getsizeof(value)
+        expires_at = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (value, expires_at, size)
+            self._bytes += size
+            self._stats["sets"] += 1
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._stats["evictions"] += 1
+        self._ensure_sweeper()
+
+    def get_or_render(self, key, render, ttl=None):
+        value = self.get(key)
+        if value is None:
+            value = render()
+            if value is not None:
+                self.set(key, value, ttl=ttl)
+        return value
+
+    def get_shared(
+        self, scope, render, version=None, bucket_seconds=None, ttl=None, suffix=""
+    ):
+        """
+        Return a user-independent body cached under `scope`, rendering it at
+        most once per snapshot `version` (or per time bucket when no version
+        is given), with an optional per-user `suffix` appended.
+        """
+        key = shared_key(scope, version, bucket_seconds or self.default_ttl)
+        if self.shared_store is None:
+            return compose_message(self.get_or_render(key, render, ttl=ttl), suffix)
+
+        body = self.get(key)
+        if body is None:
+            body = self._get_from_store(key)
+        if body is None:
+            body = render()
+            if body is not None:
+                self.set(key, body, ttl=ttl)
+                self._put_to_store(key, body, ttl)
+        return compose_message(body, suffix)
+
+    def _get_from_store(self, key):
+        try:
+            entry = self.shared_store.get(SHARED_NAMESPACE, key)
+        except Exception as e:
+            logger.error(f"Error reading shared message cache: {e}")
+            with self._lock:
+                self._stats["shared_errors"] += 1
+            return None
+        if entry is None:
+            return None
+        body, expires_at = entry
+        remaining = expires_at - time.time()
+        if remaining <= 0:
+            return None
+        with self._lock:
+            self._stats["shared_hits"] += 1
+        self.set(key, body, ttl=remaining)
+        return body
+
+    def _put_to_store(self, key, body, ttl):
+        ttl = self.default_ttl if ttl is None else ttl
+        try:
+            self.shared_store.set(
+                SHARED_NAMESPACE, key, (body, time.time() + ttl), ttl=ttl
+            )
+        except Exception as e:
+            logger.error(f"Error writing shared message cache: {e}")
+            with self._lock:
+                self._stats["shared_errors"] += 1
+
+    def delete(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[2]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def sweep(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [k for k, entry in self._entries.items() if entry[1] <= now]
+            for key in expired:
+                self._bytes -= self._entries.pop(key)[2]
+            self._stats["expirations"] += len(expired)
+        if expired:
+            logger.debug(f"Message cache sweep removed {len(expired)} expired entries")
+        return len(expired)
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Error sweeping message cache: {e}")
+
+    def _ensure_sweeper(self):
+        if self._sweeper is not None:
+            return
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(
+                target=self._sweep_loop, name="message-cache-sweeper", daemon=True
+            )
+            self._sweeper.start()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return dict(
+                self._stats,
+                entries=len(self._entries),
+                bytes=self._bytes,
+                hit_ratio=self._stats["hits"] / lookups if lookups else 0.0,
+            )
+
+
+# Shared by every command module that imports it, and with other worker
+# processes through the shared state database.
+message_cache = MessageCache(shared_store=shared_state)
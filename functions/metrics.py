@@ -0,0 +1,297 @@
+"""
+In-process metrics in the Prometheus text format, served on /metrics.
+
+Counters and histograms are updated on the request path, so an update is
+one dict lookup and an addition under the metric's own lock; nothing is
+formatted until a scrape. Values that other modules already track
+(session counts, cache stats, queue depths) are registered as callback
+gauges and read only when scraped.
+"""
+
+import threading
+import time
+import logging
+from bisect import bisect_left
+
+from functions.jsonCodec import loads
+from functions.tracing import span
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def _register(metric):
+    with _metrics_lock:
+        if metric.name in _metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        _metrics[metric.name] = metric
+    return metric
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield self.name, self.labelnames, labels, value
+
+
+class _HistogramSeries:
+    __slots__ = ("counts", "total")
+
+    def __init__(self, size):
+        self.counts = [0] * size
+        self.total = 0.0
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() increments one bucket."""
+
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = _HistogramSeries(len(self.buckets) + 1)
+            series.counts[index] += 1
+            series.total += value
+
+    def samples(self):
+        with self._lock:
+            series = [
+                (labels, list(entry.counts), entry.total)
+                for labels, entry in self._series.items()
+            ]
+        names = self.labelnames + ("le",)
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", names, labels + (
+                    _format_value(float(bound)),
+                ), cumulative
+            yield f"{self.name}_sum", self.labelnames, labels, total
+            yield f"{self.name}_count", self.labelnames, labels, cumulative
+
+
+class CallbackMetric:
+    """
+    A gauge or counter whose value is read from `collect` at scrape time.
+    `collect` returns a number, or a dict of label tuples to numbers.
+    """
+
+    def __init__(self, name, help, collect, labelnames=(), type="gauge"):
+        self.name = name
+        self.help = help
+        self.collect = collect
+        self.labelnames = tuple(labelnames)
+        self.type = type
+
+    def samples(self):
+        values = self.collect()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in values.items():
+            yield self.name, self.labelnames, labels, value
+
+
+def counter(name, help, labelnames=()):
+    return _register(Counter(name, help, labelnames))
+
+
+def histogram(name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return _register(Histogram(name, help, labelnames, buckets))
+
+
+def gauge(name, help, collect, labelnames=(), type="gauge"):
+    """Register a callback metric; replaces one of the same name."""
+    metric = CallbackMetric(name, help, collect, labelnames, type)
+    with _metrics_lock:
+        _metrics[name] = metric
+    return metric
+
+
+def render():
+    """All registered metrics in the Prometheus text exposition format."""
+    with _metrics_lock:
+        metrics = list(_metrics.values())
+
+    lines = []
+    for metric in metrics:
+        try:
+            samples = list(metric.samples())
+        except Exception as e:
+            logger.error(f"Error collecting metric {metric.name}: {e}")
+            continue
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for name, labelnames, labels, value in samples:
+            lines.append(
+                f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}"
+            )
+    return "\n".join(lines) + "\n"
+
+
+webhook_events = counter(
+    "bot_webhook_events_total", "Messaging events received on the webhook.", ("type",)
+)
+command_seconds = histogram(
+    "bot_command_duration_seconds", "Time spent running a command.", ("command",)
+)
+command_errors = counter(
+    "bot_command_errors_total", "Commands that raised an exception.", ("command",)
+)
+graph_api_seconds = histogram(
+    "bot_graph_api_duration_seconds", "Graph API call latency.", ("endpoint",)
+)
+graph_api_errors = counter(
+    "bot_graph_api_errors_total",
+    "Failed Graph API calls by HTTP status and Graph error code.",
+    ("endpoint", "status", "code"),
+)
+upstream_fetch_seconds = histogram(
+    "bot_upstream_fetch_duration_seconds",
+    "Stock and weather API call latency.",
+    ("endpoint",),
+)
+upstream_fetch_errors = counter(
+    "bot_upstream_fetch_errors_total",
+    "Failed stock and weather API calls by HTTP status.",
+    ("endpoint", "status"),
+)
+
+
+def count_webhook_event(messaging_event):
+    if "message" in messaging_event:
+        event_type = "message"
+    elif "postback" in messaging_event:
+        event_type = "postback"
+    else:
+        event_type = "other"
+    webhook_events.inc(event_type)
+
+
+def _graph_error_code(response):
+    try:
+        return loads(response.content)["error"]["code"]
+    except Exception:
+        return ""
+
+
+def _observe_graph(endpoint, started, response, current_span):
+    graph_api_seconds.observe(time.perf_counter() - started, endpoint)
+    if current_span is not None and response is not None:
+        current_span.attrs["status"] = response.status_code
+    if response is None:
+        graph_api_errors.inc(endpoint, "", "transport")
+    elif response.status_code != 200:
+        graph_api_errors.inc(
+            endpoint, str(response.status_code), str(_graph_error_code(response))
+        )
+
+
+def graph_call(endpoint, send, *args, **kwargs):
+    """
+    send(*args, **kwargs), e.g. requests.post, recorded as a Graph API
+    call to `endpoint` and as a span of the current trace. Returns the
+    response; exceptions pass through.
+    """
+    with span(f"graph.{endpoint}") as current_span:
+        started = time.perf_counter()
+        response = None
+        try:
+            response = send(*args, **kwargs)
+            return response
+        finally:
+            _observe_graph(endpoint, started, response, current_span)
+
+
+async def graph_call_async(endpoint, send, *args, **kwargs):
+    with span(f"graph.{endpoint}") as current_span:
+        started = time.perf_counter()
+        response = None
+        try:
+            response = await send(*args, **kwargs)
+            return response
+        finally:
+            _observe_graph(endpoint, started, response, current_span)
+
+
+def _observe_upstream(endpoint, started, response, current_span):
+    upstream_fetch_seconds.observe(time.perf_counter() - started, endpoint)
+    if current_span is not None and response is not None:
+        current_span.attrs["status"] = response.status_code
+    if response is None:
+        upstream_fetch_errors.inc(endpoint, "transport")
+    elif response.status_code != 200:
+        upstream_fetch_errors.inc(endpoint, str(response.status_code))
+
+
+def upstream_call(endpoint, send, *args, **kwargs):
+    """Like graph_call(), for the stock and weather APIs."""
+    with span(f"upstream.{endpoint}") as current_span:
+        started = time.perf_counter()
+        response = None
+        try:
+            response = send(*args, **kwargs)
+            return response
+        finally:
+            _observe_upstream(endpoint, started, response, current_span)
+
+
+async def upstream_call_async(endpoint, send, *args, **kwargs):
+    with span(f"upstream.{endpoint}") as current_span:
+        started = time.perf_counter()
+        response = None
+        try:
+            response = await send(*args, **kwargs)
+            return response
+        finally:
+            _observe_upstream(endpoint, started, response, current_span)
@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated", "last_command", "day", "day_count")
+
+    def __init__(self, tokens, now, day):
+        self.tokens = tokens
+        self.updated = now
+        self.last_command = 0.0
+        self.day = day
+        self.day_count = 0
+
+
+class RateLimiter:
+    """
+    Per-user token bucket with a minimum spacing between commands.
+
+    Each user holds `capacity` tokens refilled at `capacity / refill_period`
+    per second; a command spends `command_costs.get(command, default_cost)`
+    tokens. Buckets untouched for `idle_ttl` seconds are full again, so they
+    are evicted from the front of an access-ordered dict on later checks.
+    Every check is O(1) amortised regardless of how many users exist.
+
+    With a `store` (see functions.sharedState) buckets live under
+    `namespace` in the shared database instead, so every worker process
+    enforces the same limit; idle buckets then expire through the store TTL.
+    """
+
+    def __init__(
+        self,
+        capacity,
+        refill_period=60.0,
+        cooldown=0.0,
+        command_costs=None,
+        default_cost=1,
+        idle_ttl=3600.0,
+        store=None,
+        namespace="ratelimit",
+    ):
+        self.capacity = float(capacity)
+        self.refill_rate = self.capacity / refill_period
+        self.cooldown = cooldown
+        self.command_costs = dict(command_costs or {})
+        self.default_cost = default_cost
+        self.idle_ttl = max(idle_ttl, refill_period, cooldown)
+        self.store = store
+        self.namespace = namespace
+
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def _evict_idle(self, now):
+        while self._buckets:
+            key, bucket = next(iter(self._buckets.items()))
+            if now - bucket.updated < self.idle_ttl:
+                break
+            del self._buckets[key]
+
+    def _spend(self, bucket, now, cost):
+        day = int(now // 86400)
+        if bucket is None:
+            bucket = _Bucket(self.capacity, now, day)
+        else:
+            bucket.tokens = min(
+                self.capacity,
+                bucket.tokens + (now - bucket.updated) * self.refill_rate,
+            )
+        bucket.updated = now
+
+        if bucket.day != day:
+            bucket.day = day
+            bucket.day_count = 0
+        bucket.day_count += 1
+
+        if bucket.tokens < cost:
+            return bucket, (
+                False,
+                f"⚠️ Rate limit exceeded. Please wait before sending more commands. (Max {int(self.capacity)}/minute)",
+            )
+
+        since_last = now - bucket.last_command
+        if since_last < self.cooldown:
+            return bucket, (
+                False,
+                f"⏳ Please wait {self.cooldown - since_last:.1f} more seconds before using another command.",
+            )
+
+        bucket.tokens -= cost
+        bucket.last_command = now
+        return bucket, (True, None)
+
+    def check(self, key, command=None):
+        """
+        Return (True, None) and spend tokens if the command may run, or
+        (False, message) with the reason it was refused.
+        """
+        now = time.time()
+        cost = self.command_costs.get(command, self.default_cost)
+
+        if self.store is not None:
+            return self.store.update(
+                self.namespace,
+                key,
+                lambda bucket: self._spend(bucket, now, cost),
+                ttl=self.idle_ttl,
+            )
+
+        with self._lock:
+            self._evict_idle(now)
+            bucket, result = self._spend(self._buckets.get(key), now, cost)
+            self._buckets[key] = bucket
+            self._buckets.move_to_end(key)
+            return result
+
+    def _get_bucket(self, key):
+        if self.store is not None:
+            return self.store.get(self.namespace, key)
+        with self._lock:
+            return self._buckets.get(key)
+
+    def usage_today(self, key):
+        bucket = self._get_bucket(key)
+        if bucket is None or bucket.day != int(time.time() // 86400):
+            return 0
+        return bucket.day_count
+
+    def __len__(self):
+        if self.store is not None:
+            return self.store.count(self.namespace)
+        return len(self._buckets)
@@ -0,0 +1,66 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+DEFAULT_MAX_RECIPIENTS = 10000
+DEFAULT_PER_RECIPIENT = 5
+
+
+class RecentMessages:
+    """
+    Thread-safe LRU of the bot's latest message ids per recipient.
+
+    Keeps up to `per_recipient` (message_id, sent_at) pairs for each of
+    the `max_recipients` most recently messaged recipients, so memory is
+    bounded by their product. Lookups and inserts are O(1).
+    """
+
+    def __init__(
+        self, max_recipients=DEFAULT_MAX_RECIPIENTS, per_recipient=DEFAULT_PER_RECIPIENT
+    ):
+        self.max_recipients = max_recipients
+        self.per_recipient = per_recipient
+        self._recipients = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, recipient_id, message_id, sent_at=None):
+        entry = (message_id, time.time() if sent_at is None else sent_at)
+        with self._lock:
+            messages = self._recipients.get(recipient_id)
+            if messages is None:
+                messages = self._recipients[recipient_id] = deque(
+                    maxlen=self.per_recipient
+                )
+                while len(self._recipients) > self.max_recipients:
+                    self._recipients.popitem(last=False)
+            else:
+                self._recipients.move_to_end(recipient_id)
+            messages.append(entry)
+
+    def last(self, recipient_id):
+        """(message_id, sent_at) of the latest message to `recipient_id`, or None."""
+        with self._lock:
+            messages = self._recipients.get(recipient_id)
+            return messages[-1] if messages else None
+
+    def recent(self, recipient_id):
+        """Up to per_recipient (message_id, sent_at) pairs, newest first."""
+        with self._lock:
+            return list(reversed(self._recipients.get(recipient_id, ())))
+
+    def forget(self, recipient_id, message_id=None):
+        """Drop one message id (e.g. after deleting it) or the whole recipient."""
+        with self._lock:
+            messages = self._recipients.get(recipient_id)
+            if messages is None:
+                return
+            if message_id is None:
+                del self._recipients[recipient_id]
+                return
+            remaining = [entry for entry in messages if entry[0] != message_id]
+            messages.clear()
+            messages.extend(remaining)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._recipients)
@@ -0,0 +1,187 @@
+import requests
+import json
+import threading
+import time
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from functions.jsonCodec import dumps, loads, response_json
+from functions.metrics import graph_api_errors, graph_call
+
+logger = logging.getLogger(__name__)
+
+with open("config.json", "r") as f:
+    config = json.load(f)
+
+PAGE_ACCESS_TOKEN = config["page_access_token"]
+GRAPH_API_VERSION = config["graph_api_version"]
+GRAPH_API_BASE = config.get("graph_api_base", "https://graph.facebook.com")
+
+BATCH_LIMIT = 50
+BATCH_LINGER = float(config.get("batch_linger", 0.025))
+BATCH_CONCURRENCY = 4
+REQUEST_TIMEOUT = 30
+
+
+def _operation(recipient_id, message_text):
+    return {
+        "method": "POST",
+        "relative_url": f"{GRAPH_API_VERSION}/me/messages",
+        "body": urlencode(
+            {
+                "recipient": dumps({"id": recipient_id}),
+                "message": dumps({"text": message_text}),
+            }
+        ),
+    }
+
+
+def _post_batch(messages):
+    url = f"{GRAPH_API_BASE}/"
+    data = {
+        "access_token": PAGE_ACCESS_TOKEN,
+        "include_headers": "false",
+        "batch": dumps([_operation(*message) for message in messages]),
+    }
+
+    try:
+        response = graph_call(
+            "batch", requests.post, url, data=data, timeout=REQUEST_TIMEOUT
+        )
+        if response.status_code != 200:
+            logger.error(
+                f"Failed to send message batch: {response.status_code} {response.text}"
+            )
+            return [None] * len(messages)
+        operations = response_json(response)
+    except Exception as e:
+        logger.error(f"Error sending message batch: {str(e)}")
+        return [None] * len(messages)
+
+    results = []
+    for (recipient_id, _), operation in zip(messages, operations):
+        # Operations Graph did not get to come back as null.
+        if not operation:
+            logger.error(f"Batched message to {recipient_id} was not processed")
+            results.append(None)
+            continue
+        try:
+            body = loads(operation.get("body") or "null")
+        except ValueError:
+            body = None
+        if operation.get("code") != 200 or not isinstance(body, dict):
+            error = body.get("error") if isinstance(body, dict) else None
+            graph_api_errors.inc(
+                "batch_operation",
+                str(operation.get("code")),
+                str((error or {}).get("code", "")),
+            )
+            logger.error(
+                f"Failed to send batched message to {recipient_id}: {operation.get('code')} {operation.get('body')}"
+            )
+            results.append(None)
+        else:
+            results.append(body)
+    results.extend([None] * (len(messages) - len(results)))
+    return results
+
+
+def send_messages_batch(messages):
+    """
+    Send `(recipient_id, message_text)` pairs through the Graph batch
+    endpoint, BATCH_LIMIT operations per call. Returns one entry per
+    message in the same order: the send API response (with message_id)
+    or None if that message failed.
+    """
+    results = []
+    for start in range(0, len(messages), BATCH_LIMIT):
+        results.extend(_post_batch(messages[start : start + BATCH_LIMIT]))
+    return results
+
+
+class BatchSender:
+    """
+    Drop-in replacement for send_message() that groups concurrent calls.
+
+    Callers block as with send_message(), but their messages are held for
+    up to `linger` seconds (or until `max_batch` are waiting) and sent
+    together in one batch request; each caller gets back its own
+    operation's response. Batches fill up only when many threads send at
+    once, e.g. the broadcast workers.
+    """
+
+    def __init__(
+        self, max_batch=BATCH_LIMIT, linger=BATCH_LINGER, concurrency=BATCH_CONCURRENCY
+    ):
+        self.max_batch = max_batch
+        self.linger = linger
+
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._flusher = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="send-batch"
+        )
+        self._stats = {"messages": 0, "batches": 0}
+
+    def send_message(self, recipient_id, message_text):
+        future = Future()
+        with self._cond:
+            self._waiting.append((recipient_id, message_text, future))
+            self._cond.notify()
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=self._flush_loop, name="send-batch-flusher", daemon=True
+                )
+                self._flusher.start()
+        try:
+            return future.result(timeout=REQUEST_TIMEOUT * 2)
+        except Exception as e:
+            logger.error(f"Error sending message to {recipient_id}: {str(e)}")
+            return None
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                while not self._waiting:
+                    self._cond.wait()
+                deadline = time.monotonic() + self.linger
+                while len(self._waiting) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._waiting[: self.max_batch]
+                del self._waiting[: self.max_batch]
+                self._stats["messages"] += len(batch)
+                self._stats["batches"] += 1
+            self._executor.submit(self._send, batch)
+
+    def _send(self, batch):
+        try:
+            results = send_messages_batch([(r, text) for r, text, _ in batch])
+        except Exception as e:
+            results = [None] * len(batch)
+            logger.error(f"Error sending message batch: {str(e)}")
+        for (recipient_id, _, future), result in zip(batch, results):
+            if result:
+                logger.info(
+                    "Message sent successfully to %s. Response: %s",
+                    recipient_id,
+                    result,
+                    extra={"event": "send.response"},
+                )
+            future.set_result(result)
+
+    def stats(self):
+        with self._cond:
+            batches = self._stats["batches"]
+            return dict(
+                self._stats,
+                waiting=len(self._waiting),
+                avg_batch_size=self._stats["messages"] / batches if batches else 0.0,
+            )
+
+
+batch_sender = BatchSender()
@@ -2,6 +2,10 @@ import requests
 import json
 import logging
 
+from functions import asyncHttp
+from functions.jsonCodec import response_json
+from functions.metrics import graph_call, graph_call_async
+
 logger = logging.getLogger(__name__)
 
 with open("config.json", "r") as f:
@@ -9,6 +13,7 @@ with open("config.json", "r") as f:
 
 PAGE_ACCESS_TOKEN = config["page_access_token"]
 GRAPH_API_VERSION = config["graph_api_version"]
+GRAPH_API_BASE = config.get("graph_api_base", "https://graph.facebook.com")
 
 
 def send_message(recipient_id, message_text):
@@ -16,20 +21,59 @@ def send_message(recipient_id, message_text):
     headers = {"Content-Type": "application/json"}
     data = {"recipient": {"id": recipient_id}, "message": {"text": message_text}}
 
-    url = f"https://graph.facebook.com/{GRAPH_API_VERSION}/me/messages"
+    url = f"{GRAPH_API_BASE}/{GRAPH_API_VERSION}/me/messages"
 
     try:
-        response = requests.post(url, params=params, headers=headers, json=data)
-        response_data = response.json()
+        response = graph_call(
+            "send_message",
+            requests.post,
+            url,
+            params=params,
+            headers=headers,
+            json=data,
+        )
+        response_data = response_json(response)
         if response.status_code != 200:
             logger.error(
                 f"Failed to send message: {response.status_code} {response.text}"
             )
             return None
         logger.info(
-            f"Message sent successfully to {recipient_id}. Response: {response_data}"
+            "Message sent successfully to %s. Response: %s",
+            recipient_id,
+            response_data,
+            extra={"event": "send.response"},
         )
         return response_data  # Return the full response which includes message_id
     except Exception as e:
         logger.error(f"Error sending message: {str(e)}")
         return None
+
+
+async def send_message_async(recipient_id, message_text):
+    """Coroutine version of send_message() with the same return value."""
+    params = {"access_token": PAGE_ACCESS_TOKEN}
+    data = {"recipient": {"id": recipient_id}, "message": {"text": message_text}}
+
+    url = f"{GRAPH_API_BASE}/{GRAPH_API_VERSION}/me/messages"
+
+    try:
+        response = await graph_call_async(
+            "send_message", asyncHttp.request, "POST", url, params=params, json=data
+        )
+        response_data = response_json(response)
+        if response.status_code != 200:
+            logger.error(
+                f"Failed to send message: {response.status_code} {response.text}"
+            )
+            return None
+        logger.info(
+            "Message sent successfully to %s. Response: %s",
+            recipient_id,
+            response_data,
+            extra={"event": "send.response"},
+        )
+        return response_data
+    except Exception as e:
+        logger.error(f"Error sending message: {str(e)}")
+        return None
@@ -9,6 +9,7 @@ with open("config.json", "r") as f:
 
 PAGE_ACCESS_TOKEN = config["page_access_token"]
 GRAPH_API_VERSION = config["graph_api_version"]
+GRAPH_API_BASE = config.get("graph_api_base", "https://graph.facebook.com")
 
 
 def send_template_message(recipient_id, template_payload):
@@ -41,7 +42,7 @@ def send_template_message(recipient_id, template_payload):
         "message": {"attachment": {"type": "template", "payload": template_payload}},
     }
 
-    url = f"https://graph.facebook.com/{GRAPH_API_VERSION}/me/messages"
+    url = f"{GRAPH_API_BASE}/{GRAPH_API_VERSION}/me/messages"
 
     try:
         logger.debug(
@@ -185,7 +186,7 @@ def send_quick_reply(recipient_id, text, quick_replies):
         "message": {"text": text, "quick_replies": quick_replies},
     }
 
-    url = f"https://graph.facebook.com/{GRAPH_API_VERSION}/me/messages"
+    url = f"{GRAPH_API_BASE}/{GRAPH_API_VERSION}/me/messages"
 
     try:
         logger.debug(
@@ -2,6 +2,10 @@ import requests
 import json
 import logging
 
+from functions import asyncHttp
+from functions.jsonCodec import response_json
+from functions.metrics import graph_call, graph_call_async
+
 logger = logging.getLogger(__name__)
 
 with open("config.json", "r") as f:
@@ -9,6 +13,7 @@ with open("config.json", "r") as f:
 
 PAGE_ACCESS_TOKEN = config["page_access_token"]
 GRAPH_API_VERSION = config["graph_api_version"]
+GRAPH_API_BASE = config.get("graph_api_base", "https://graph.facebook.com")
 PAGE_ID = config.get("page_id", "612984285242194")
 
 
@@ -32,15 +37,50 @@ def send_typing_indicator(recipient_id, typing_on=True):
         "sender_action": "typing_on" if typing_on else "typing_off",
     }
 
-    url = f"https://graph.facebook.com/{GRAPH_API_VERSION}/me/messages"
+    url = f"{GRAPH_API_BASE}/{GRAPH_API_VERSION}/me/messages"
 
     try:
-        response = requests.post(url, params=params, headers=headers, json=data)
+        response = graph_call(
+            "typing", requests.post, url, params=params, headers=headers, json=data
+        )
+        if response.status_code != 200:
+            logger.error(
+                f"Failed to send typing indicator: {response.status_code} {response.text}"
+            )
+        return response_json(response)
+    except Exception as e:
+        logger.error(f"Error sending typing indicator: {str(e)}")
+        return None
+
+
+async def send_typing_indicator_async(recipient_id, typing_on=True):
+    """Coroutine version of send_typing_indicator()."""
+    if not recipient_id or not PAGE_ACCESS_TOKEN:
+        logger.warning(
+            "send_typing_indicator: Missing recipient_id or PAGE_ACCESS_TOKEN"
+        )
+        return None
+
+    if str(recipient_id) == str(PAGE_ID):
+        return None
+
+    params = {"access_token": PAGE_ACCESS_TOKEN}
+    data = {
+        "recipient": {"id": recipient_id},
+        "sender_action": "typing_on" if typing_on else "typing_off",
+    }
+
+    url = f"{GRAPH_API_BASE}/{GRAPH_API_VERSION}/me/messages"
+
+    try:
+        response = await graph_call_async(
+            "typing", asyncHttp.request, "POST", url, params=params, json=data
+        )
         if response.status_code != 200:
             logger.error(
                 f"Failed to send typing indicator: {response.status_code} {response.text}"
             )
-        return response.json()
+        return response_json(response)
     except Exception as e:
         logger.error(f"Error sending typing indicator: {str(e)}")
         return None
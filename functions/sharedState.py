@@ -0,0 +1,425 @@
+import atexit
+import copy
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    with open("config.json", "r") as f:
+        config = json.load(f)
+except Exception:
+    config = {}
+
+SHARED_STATE_PATH = config.get("shared_state_path", "pagebot_state.db")
+BUSY_TIMEOUT = 30
+HEARTBEAT_INTERVAL = 10
+HEARTBEAT_TTL = 30
+# Expired rows are deleted at most this often (seconds), by whichever
+# write with a TTL comes due first.
+PURGE_INTERVAL = float(config.get("shared_state_purge_interval", 60))
+
+# Identifies this process instance; unlike a pid it is never reused.
+WORKER_ID = uuid.uuid4().hex
+
+
+class SharedState:
+    """
+    Namespaced key/value store in a SQLite database shared by every worker
+    process on the host.
+
+    Values are pickled, may carry a TTL, and every write is its own
+    transaction. update() runs a read-modify-write under an IMMEDIATE
+    transaction, so concurrent workers never lose each other's updates.
+    Expired values are never returned, and writes that set a TTL also
+    delete expired rows every `purge_interval` seconds, so the table only
+    grows with live data.
+    """
+
+    def __init__(self, path, purge_interval=PURGE_INTERVAL):
+        self.path = path
+        self.purge_interval = purge_interval
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._purge_lock = threading.Lock()
+        self._next_purge = time.monotonic() + purge_interval
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path, timeout=BUSY_TIMEOUT, isolation_level=None
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS kv ("
+                        "namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB, "
+                        "expires_at REAL, PRIMARY KEY (namespace, key))"
+                    )
+                    conn.execute(
+                        "CREATE INDEX IF NOT EXISTS kv_expires ON kv (expires_at)"
+                    )
+                    self._initialized = True
+        return conn
+
+    def get(self, namespace, key, default=None):
+        row = (
+            self._connection()
+            .execute(
+                "SELECT value, expires_at FROM kv WHERE namespace = ? AND key = ?",
+                (namespace, str(key)),
+            )
+            .fetchone()
+        )
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return default
+        return pickle.loads(row[0])
+
+    def set(self, namespace, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl is not None else None
+        self._connection().execute(
+            "INSERT OR REPLACE INTO kv (namespace, key, value, expires_at) "
+            "VALUES (?, ?, ?, ?)",
+            (namespace, str(key), pickle.dumps(value), expires_at),
+        )
+        if ttl is not None:
+            self._maybe_purge()
+
+    def set_many(self, namespace, mapping):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO kv (namespace, key, value, expires_at) "
+                "VALUES (?, ?, ?, NULL)",
+                [
+                    (namespace, str(key), pickle.dumps(value))
+                    for key, value in mapping.items()
+                ],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def delete(self, namespace, key):
+        self._connection().execute(
+            "DELETE FROM kv WHERE namespace = ? AND key = ?", (namespace, str(key))
+        )
+
+    def items(self, namespace):
+        rows = (
+            self._connection()
+            .execute(
+                "SELECT key, value FROM kv WHERE namespace = ? "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, time.time()),
+            )
+            .fetchall()
+        )
+        return {key: pickle.loads(value) for key, value in rows}
+
+    def count(self, namespace):
+        return (
+            self._connection()
+            .execute(
+                "SELECT COUNT(*) FROM kv WHERE namespace = ? "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, time.time()),
+            )
+            .fetchone()[0]
+        )
+
+    def update(self, namespace, key, fn, ttl=None):
+        """
+        Atomically apply `fn(current_value_or_None)`, which must return
+        `(new_value, result)`. A new_value of None deletes the key. Returns
+        `result`.
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT value, expires_at FROM kv WHERE namespace = ? AND key = ?",
+                (namespace, str(key)),
+            ).fetchone()
+            current = None
+            if row is not None and (row[1] is None or row[1] > time.time()):
+                current = pickle.loads(row[0])
+            new_value, result = fn(current)
+            if new_value is None:
+                conn.execute(
+                    "DELETE FROM kv WHERE namespace = ? AND key = ?",
+                    (namespace, str(key)),
+                )
+            else:
+                conn.execute(
+                    "INSERT OR REPLACE INTO kv (namespace, key, value, expires_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (
+                        namespace,
+                        str(key),
+                        pickle.dumps(new_value),
+                        time.time() + ttl if ttl is not None else None,
+                    ),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if ttl is not None:
+            self._maybe_purge()
+        return result
+
+    def incr(self, namespace, key, amount=1):
+        return self.update(
+            namespace,
+            key,
+            lambda current: ((current or 0) + amount, (current or 0) + amount),
+        )
+
+    def purge_expired(self):
+        cursor = self._connection().execute(
+            "DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?",
+            (time.time(),),
+        )
+        return cursor.rowcount
+
+    def _maybe_purge(self):
+        now = time.monotonic()
+        if now < self._next_purge or not self._purge_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_purge = now + self.purge_interval
+            purged = self.purge_expired()
+            if purged:
+                logger.debug(f"Purged {purged} expired shared state entries")
+        except Exception as e:
+            logger.error(f"Error purging expired shared state entries: {e}")
+        finally:
+            self._purge_lock.release()
+
+
+shared_state = SharedState(SHARED_STATE_PATH)
+
+
+def load_records(namespace):
+    """
+    Load every record of a namespace. The first time a namespace is read
+    and it is still empty, the legacy pickle file of the same name (if
+    any) is imported into it.
+    """
+    records = shared_state.items(namespace)
+    if (
+        records
+        or not os.path.exists(namespace)
+        or shared_state.get("meta:imported", namespace)
+    ):
+        return records
+
+    try:
+        with open(namespace, "rb") as f:
+            legacy = pickle.load(f)
+    except Exception as e:
+        logger.error(f"Error importing legacy data from {namespace}: {e}")
+        return records
+
+    if isinstance(legacy, dict) and legacy:
+        shared_state.set_many(namespace, legacy)
+        logger.info(
+            f"Imported {len(legacy)} records from {namespace} into shared state"
+        )
+    shared_state.set("meta:imported", namespace, True)
+    return shared_state.items(namespace)
+
+
+def save_records(namespace, data, key=None):
+    """
+    Persist `data[key]` (or drop it if it no longer exists). Without a
+    key every record in `data` is written, but records written by other
+    workers are left untouched.
+    """
+    if key is None:
+        shared_state.set_many(namespace, data)
+    elif key in data:
+        shared_state.set(namespace, key, data[key])
+    else:
+        shared_state.delete(namespace, key)
+
+
+def get_record(namespace, key, default=None):
+    """One record as currently stored, including other workers' writes."""
+    return shared_state.get(namespace, key, default)
+
+
+def update_record(namespace, key, fn, default=None):
+    """
+    Atomically replace one record with `fn(record)` and return the new
+    value. `record` is the stored value, or a copy of `default` when there
+    is none; returning None deletes the record. Unlike changing a loaded
+    dict and calling save_records(), this never overwrites a change
+    another worker made in between.
+    """
+
+    def apply(current):
+        record = copy.deepcopy(default) if current is None else current
+        new_value = fn(record)
+        return new_value, new_value
+
+    return shared_state.update(namespace, key, apply)
+
+
+_heartbeat_lock = threading.Lock()
+_heartbeat_thread = None
+
+
+def _heartbeat_loop():
+    while True:
+        time.sleep(HEARTBEAT_INTERVAL)
+        try:
+            shared_state.set("workers", WORKER_ID, os.getpid(), ttl=HEARTBEAT_TTL)
+        except Exception as e:
+            logger.error(f"Error refreshing worker heartbeat: {e}")
+
+
+def _retire_worker():
+    try:
+        shared_state.delete("workers", WORKER_ID)
+    except Exception:
+        pass
+
+
+def _ensure_heartbeat():
+    """
+    Register this worker before it first owns anything, and keep the
+    registration alive while the process runs.
+    """
+    global _heartbeat_thread
+    if _heartbeat_thread is not None:
+        return
+    with _heartbeat_lock:
+        if _heartbeat_thread is not None:
+            return
+        shared_state.set("workers", WORKER_ID, os.getpid(), ttl=HEARTBEAT_TTL)
+        atexit.register(_retire_worker)
+        _heartbeat_thread = threading.Thread(
+            target=_heartbeat_loop, name="shared-state-heartbeat", daemon=True
+        )
+        _heartbeat_thread.start()
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _owner_alive(record):
+    """
+    A record's owner is alive while its process exists and its heartbeat
+    has not lapsed; the heartbeat catches pids reused after a restart.
+    """
+    if record.get("worker") == WORKER_ID:
+        return True
+    return _pid_alive(record["owner"]) and (
+        shared_state.get("workers", record.get("worker")) is not None
+    )
+
+
+def claim_session(kind, sender_id, data=None):
+    """
+    Register a tracker session for this worker. Returns False if a live
+    worker already owns a session of this kind for the sender. `data` is
+    stored with the record and survives restarts.
+    """
+    _ensure_heartbeat()
+    pid = os.getpid()
+
+    def claim(current):
+        if current and current.get("worker") != WORKER_ID and _owner_alive(current):
+            return current, False
+        record = {"started": time.time()}
+        record.update(data or {})
+        record.update(owner=pid, worker=WORKER_ID)
+        return record, True
+
+    return shared_state.update(f"sessions:{kind}", sender_id, claim)
+
+
+def update_session(kind, sender_id, **fields):
+    """Merge `fields` into the session record if this worker owns it."""
+
+    def merge(current):
+        if not current or current.get("worker") != WORKER_ID:
+            return current, False
+        return dict(current, **fields), True
+
+    return shared_state.update(f"sessions:{kind}", sender_id, merge)
+
+
+def get_session(kind, sender_id):
+    """Return the session record if some live worker owns it, else None."""
+    record = shared_state.get(f"sessions:{kind}", sender_id)
+    if record and _owner_alive(record):
+        return record
+    return None
+
+
+def owns_session(kind, sender_id):
+    record = shared_state.get(f"sessions:{kind}", sender_id)
+    return bool(record) and record.get("worker") == WORKER_ID
+
+
+def orphaned_sessions(kind):
+    """Session records whose owning worker has exited or stopped responding."""
+    return {
+        sender_id: record
+        for sender_id, record in shared_state.items(f"sessions:{kind}").items()
+        if not _owner_alive(record)
+    }
+
+
+def release_session(kind, sender_id, only_if_owner=False):
+    def release(current):
+        if current and only_if_owner and current.get("worker") != WORKER_ID:
+            return current, False
+        return None, current is not None
+
+    return shared_state.update(f"sessions:{kind}", sender_id, release)
+
+
+def count_sessions(kind):
+    return shared_state.count(f"sessions:{kind}")
+
+
+def acquire_lease(name, ttl):
+    """
+    Take or renew the host-wide lease `name` for this worker. Returns True
+    while this process holds it; a lease held by a dead or stalled worker
+    lapses after `ttl` seconds and can then be taken over.
+    """
+    _ensure_heartbeat()
+    pid = os.getpid()
+
+    def acquire(current):
+        if current and current.get("worker") != WORKER_ID and _owner_alive(current):
+            return current, False
+        return {"owner": pid, "worker": WORKER_ID, "renewed": time.time()}, True
+
+    return shared_state.update("leases", name, acquire, ttl=ttl)
@@ -0,0 +1,235 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+import logging
+
+import requests
+
+from functions.fetchStock import (
+    StockAPIUnavailable,
+    fetch_stock_data,
+    fetch_stock_data_async,
+    fetch_weather_data,
+    fetch_weather_data_async,
+    is_upstream_available,
+)
+from functions.jsonCodec import dumps
+from functions.sharedState import acquire_lease, shared_state
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 8.0
+LEASE_TTL = 30.0
+MAX_SNAPSHOT_AGE = 60.0
+SNAPSHOT_NAMESPACE = "snapshots"
+
+
+class StockPoller:
+    """
+    Host-wide stock poller with leader election.
+
+    Every worker that needs stock data runs a poller thread, but only the
+    one holding the `name` lease in the shared state database fetches
+    upstream; it publishes each snapshot there and the other workers read
+    it back. If the leader dies or stalls, its lease lapses after
+    `lease_ttl` seconds and another worker takes over, so upstream traffic
+    stays at one request per `interval` however many workers run.
+    """
+
+    def __init__(
+        self,
+        name="stock",
+        interval=POLL_INTERVAL,
+        lease_ttl=LEASE_TTL,
+        max_age=MAX_SNAPSHOT_AGE,
+    ):
+        self.name = name
+        self.interval = interval
+        self.lease_ttl = lease_ttl
+        self.max_age = max_age
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self._is_leader = False
+        self._snapshot = None
+        self._stats = {"polls": 0, "poll_errors": 0, "published": 0, "elections": 0}
+
+    @property
+    def is_leader(self):
+        return self._is_leader
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, name=f"{self.name}-poller", daemon=True
+            )
+            self._thread.start()
+
+    def start_async(self):
+        """
+        Run the poller as a task on the running event loop instead of a
+        thread. Must be called from a coroutine, before get_snapshot().
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = asyncio.get_running_loop().create_task(self._run_async())
+        return self._thread
+
+    async def _run_async(self):
+        while True:
+            started = time.monotonic()
+            try:
+                await self._tick_async()
+            except Exception as e:
+                logger.error(f"Error in {self.name} poller: {e}")
+            await asyncio.sleep(max(self.interval - (time.monotonic() - started), 0.0))
+
+    async def _tick_async(self):
+        was_leader = self._is_leader
+        self._is_leader = await asyncio.to_thread(
+            acquire_lease, f"poller:{self.name}", self.lease_ttl
+        )
+        if self._is_leader and not was_leader:
+            self._stats["elections"] += 1
+            logger.info(f"Worker {os.getpid()} is now the {self.name} poller leader")
+        elif was_leader and not self._is_leader:
+            logger.info(f"Worker {os.getpid()} lost the {self.name} poller lease")
+
+        if not self._is_leader:
+            return
+
+        self._stats["polls"] += 1
+        try:
+            stock_data, weather_data = await asyncio.gather(
+                fetch_stock_data_async(), fetch_weather_data_async()
+            )
+        except requests.RequestException as e:
+            self._stats["poll_errors"] += 1
+            await asyncio.to_thread(self._publish_error, e)
+            return
+        await asyncio.to_thread(self.publish, stock_data, weather_data)
+
+    def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                self._tick()
+            except Exception as e:
+                logger.error(f"Error in {self.name} poller: {e}")
+            time.sleep(max(self.interval - (time.monotonic() - started), 0.0))
+
+    def _tick(self):
+        was_leader = self._is_leader
+        self._is_leader = acquire_lease(f"poller:{self.name}", self.lease_ttl)
+        if self._is_leader and not was_leader:
+            self._stats["elections"] += 1
+            logger.info(f"Worker {os.getpid()} is now the {self.name} poller leader")
+        elif was_leader and not self._is_leader:
+            logger.info(f"Worker {os.getpid()} lost the {self.name} poller lease")
+
+        if self._is_leader:
+            self._poll()
+
+    def _poll(self):
+        self._stats["polls"] += 1
+        try:
+            stock_data = fetch_stock_data()
+            weather_data = fetch_weather_data()
+        except requests.RequestException as e:
+            self._stats["poll_errors"] += 1
+            self._publish_error(e)
+            return
+
+        self.publish(stock_data, weather_data)
+
+    def _publish_error(self, error):
+        meta = shared_state.get(SNAPSHOT_NAMESPACE, f"{self.name}:meta") or {}
+        meta.update(available=is_upstream_available(), error=str(error))
+        shared_state.set(SNAPSHOT_NAMESPACE, f"{self.name}:meta", meta)
+
+    def publish(self, stock_data, weather_data):
+        version = hashlib.md5(
+            dumps([stock_data, weather_data], sort_keys=True).encode()
+        ).hexdigest()[:12]
+        meta = {
+            "version": version,
+            "fetched_at": time.time(),
+            "available": True,
+            "error": None,
+        }
+        current = shared_state.get(SNAPSHOT_NAMESPACE, f"{self.name}:meta")
+        if not current or current.get("version") != version:
+            shared_state.set(
+                SNAPSHOT_NAMESPACE,
+                f"{self.name}:data",
+                (version, stock_data, weather_data),
+            )
+        shared_state.set(SNAPSHOT_NAMESPACE, f"{self.name}:meta", meta)
+        self._stats["published"] += 1
+
+    def _fresh_meta(self):
+        meta = shared_state.get(SNAPSHOT_NAMESPACE, f"{self.name}:meta")
+        if (
+            meta
+            and meta.get("version")
+            and time.time() - meta["fetched_at"] <= self.max_age
+        ):
+            return meta
+        return None
+
+    def get_snapshot(self, wait=None):
+        """
+        Return `(stock_data, weather_data)` from the latest published
+        snapshot, starting this worker's poller on first use. Waits up to
+        `wait` seconds (default: one poll interval) for a snapshot to
+        appear, then raises StockAPIUnavailable; with wait=0 it checks
+        once and never sleeps, which is what per-user tracker ticks should
+        use. The dicts are shared and must be treated as read-only.
+        """
+        self.start()
+        deadline = time.monotonic() + (self.interval if wait is None else wait)
+        meta = self._fresh_meta()
+        while meta is None:
+            if time.monotonic() >= deadline:
+                stale = shared_state.get(SNAPSHOT_NAMESPACE, f"{self.name}:meta") or {}
+                raise StockAPIUnavailable(
+                    f"No fresh {self.name} snapshot: {stale.get('error') or 'waiting for poller'}",
+                    retry_after=self.interval,
+                )
+            time.sleep(0.5)
+            meta = self._fresh_meta()
+
+        snapshot = self._snapshot
+        if snapshot is None or snapshot[0] != meta["version"]:
+            snapshot = shared_state.get(SNAPSHOT_NAMESPACE, f"{self.name}:data")
+            if snapshot is None:
+                raise StockAPIUnavailable(
+                    f"{self.name} snapshot missing", retry_after=self.interval
+                )
+            self._snapshot = snapshot
+        return snapshot[1], snapshot[2]
+
+    def upstream_available(self):
+        """Whether the leader's last poll succeeded (as seen by any worker)."""
+        meta = shared_state.get(SNAPSHOT_NAMESPACE, f"{self.name}:meta")
+        return bool(meta) and meta.get("available", True)
+
+    def stats(self):
+        return dict(self._stats, leader=self._is_leader, pid=os.getpid())
+
+
+stock_poller = StockPoller()
+
+
+def get_stock_snapshot(wait=None):
+    return stock_poller.get_snapshot(wait)
+
+
+def is_snapshot_available():
+    return stock_poller.upstream_available()
@@ -0,0 +1,234 @@
+"""
+Local stand-in for the stock and weather APIs, for load-testing the bot
+with no network.
+
+    python -m functions.stockStub --port 8090 [--snapshots stock.jsonl]
+        [--advance 5] [--latency 0.2 --error-rate 0.05 --max-rps 50]
+
+then set in config.json:
+
+    "stock_api_url": "http://127.0.0.1:8090/api/stocks",
+    "weather_api_url": "http://127.0.0.1:8090/api/stock/weather"
+
+It replays a sequence of snapshots, moving to the next one every
+`--advance` seconds (or on POST /stub/next when --advance is 0) and
+starting over at the end. A snapshot file holds one JSON object per line
+with a "stock" and/or "weather" payload; record one from the live APIs
+with
+
+    python -m functions.stockStub --record stock.jsonl --interval 300 --count 12
+
+Without --snapshots a generated sequence is used. The fault options are
+the same as functions.graphStub's.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from functions.graphStub import Faults, add_fault_arguments, faults_from_args
+
+STOCK_PATH = "/api/stocks"
+WEATHER_PATH = "/api/stock/weather"
+
+CATEGORIES = {
+    "gear": "🛠️",
+    "seed": "🌱",
+    "egg": "🥚",
+    "honey": "🍯",
+    "costmetic": "🎨",
+}
+WEATHERS = (
+    ("Sunny", "☀️", "Normal"),
+    ("Rain", "🌧️", "Wet"),
+    ("Thunderstorm", "⛈️", "Shocked"),
+    ("Frost", "❄️", "Chilled"),
+    ("Blood Moon", "🌑", "Bloodlit"),
+)
+
+
+def synthetic_snapshots(count=12, seed=1):
+    """`count` stock/weather snapshots with the live APIs' shape."""
+    rng = random.Random(seed)
+    started = int(time.time() * 1000)
+    snapshots = []
+    for index in range(count):
+        updated_at = started + index * 300000
+        stock = {
+            category: [
+                {
+                    "name": f"{category.title()} Item {number}",
+                    "value": rng.choice((1, 2, 3, 5, 10, 25)) * 100,
+                    "emoji": emoji,
+                }
+                for number in sorted(rng.sample(range(1, 30), rng.randint(3, 8)))
+            ]
+            for category, emoji in CATEGORIES.items()
+        }
+        stock["updatedAt"] = updated_at
+        name, icon, bonus = rng.choice(WEATHERS)
+        weather = {
+            "currentWeather": name,
+            "icon": icon,
+            "description": f"{name} over the garden",
+            "effectDescription": f"{bonus} crops grow faster",
+            "cropBonuses": bonus,
+            "visualCue": name,
+            "rarity": "Common",
+            "updatedAt": updated_at,
+        }
+        snapshots.append({"stock": stock, "weather": weather})
+    return snapshots
+
+
+def load_snapshots(path):
+    """
+    Snapshots from a JSON-lines file. A line without "stock" or
+    "weather" keeps the previous line's payload for it.
+    """
+    snapshots = []
+    previous = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            snapshot = {
+                "stock": entry.get("stock", previous.get("stock", {})),
+                "weather": entry.get("weather", previous.get("weather", {})),
+            }
+            snapshots.append(snapshot)
+            previous = snapshot
+    if not snapshots:
+        raise ValueError(f"No snapshots in {path}")
+    return snapshots
+
+
+def record_snapshots(path, interval=300, count=12):
+    """Append `count` live stock/weather snapshots to `path`, `interval` apart."""
+    import requests
+
+    from functions.fetchStock import REQUEST_HEADERS, STOCK_API_URL, WEATHER_API_URL
+
+    for index in range(count):
+        entry = {}
+        for key, url in (("stock", STOCK_API_URL), ("weather", WEATHER_API_URL)):
+            try:
+                response = requests.get(url, headers=REQUEST_HEADERS, timeout=15)
+                response.raise_for_status()
+                entry[key] = response.json()
+            except (requests.RequestException, ValueError) as e:
+                print(f"Skipping {key} in snapshot {index + 1}: {e}")
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        print(f"Recorded snapshot {index + 1}/{count}")
+        if index + 1 < count:
+            time.sleep(interval)
+
+
+class SnapshotSequence:
+    """Cycles through snapshots by elapsed time, or by next() when advance is 0."""
+
+    def __init__(self, snapshots, advance=5.0):
+        self.snapshots = snapshots
+        self.advance = advance
+        self._started = time.monotonic()
+        self._index = 0
+        self._lock = threading.Lock()
+
+    def current(self):
+        if self.advance > 0:
+            index = int((time.monotonic() - self._started) / self.advance)
+            return self.snapshots[index % len(self.snapshots)]
+        with self._lock:
+            return self.snapshots[self._index]
+
+    def next(self):
+        with self._lock:
+            self._index = (self._index + 1) % len(self.snapshots)
+            return self._index
+
+
+class StockStubHandler(BaseHTTPRequestHandler):
+    def _reply(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path.rstrip("/")
+        if path == "/stub/stats":
+            self._reply(200, self.server.faults.snapshot())
+            return
+        if path not in (STOCK_PATH, WEATHER_PATH):
+            self._reply(404, {"error": "Not found"})
+            return
+
+        outcome = self.server.faults.apply()
+        if outcome == "throttled":
+            self._reply(429, {"error": "Too many requests"}, {"Retry-After": "5"})
+        elif outcome == "error":
+            self._reply(500, {"error": "Internal server error"})
+        else:
+            snapshot = self.server.sequence.current()
+            self._reply(200, snapshot["stock" if path == STOCK_PATH else "weather"])
+
+    def do_POST(self):
+        if urlparse(self.path).path == "/stub/next":
+            self._reply(200, {"index": self.server.sequence.next()})
+        else:
+            self._reply(404, {"error": "Not found"})
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StockStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, handler, sequence, faults=None):
+        super().__init__(address, handler)
+        self.sequence = sequence
+        self.faults = faults or Faults()
+
+
+def serve(host="127.0.0.1", port=8090, snapshots=None, advance=5.0, faults=None):
+    sequence = SnapshotSequence(snapshots or synthetic_snapshots(), advance)
+    return StockStubServer((host, port), StockStubHandler, sequence, faults)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stock and weather API stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--snapshots", help="JSON-lines snapshot file to replay")
+    parser.add_argument(
+        "--advance",
+        type=float,
+        default=5.0,
+        help="seconds per snapshot; 0 to advance only on POST /stub/next",
+    )
+    parser.add_argument("--record", metavar="FILE", help="record live snapshots")
+    parser.add_argument("--interval", type=float, default=300)
+    parser.add_argument("--count", type=int, default=12)
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    if args.record:
+        record_snapshots(args.record, args.interval, args.count)
+    else:
+        snapshots = load_snapshots(args.snapshots) if args.snapshots else None
+        print(f"Stock API stub listening on http://{args.host}:{args.port}")
+        serve(
+            args.host, args.port, snapshots, args.advance, faults_from_args(args)
+        ).serve_forever()
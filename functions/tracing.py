@@ -0,0 +1,250 @@
+"""
+Per-event timing traces.
+
+The webhook handler opens a trace for each messaging event; span()
+records a timed step inside it (a Graph API call, a stock fetch, a
+command, loading its data). The current trace lives in a context
+variable, so code in functions/ and cmd/ adds spans without passing
+anything around, and span() is a cheap no-op outside a trace. Commands
+also find the trace as context["trace"].
+
+Finished traces are logged as "trace" records (slow ones at WARNING) and
+the most recent are kept for /debug/traces. They carry sender ids, so
+that endpoint answers only when "debug_token" is set in config.json, and
+only to requests sending it in an X-Debug-Token header.
+"""
+
+import contextvars
+import functools
+import hmac
+import json
+import threading
+import time
+import uuid
+import logging
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+try:
+    with open("config.json", "r") as f:
+        config = json.load(f)
+except Exception:
+    config = {}
+
+# Traces slower than this (seconds) are logged at WARNING.
+SLOW_TRACE = float(config.get("trace_slow_threshold", 1.0))
+TRACE_BUFFER = int(config.get("trace_buffer", 500))
+DEBUG_TOKEN = config.get("debug_token")
+
+_current_trace = contextvars.ContextVar("trace", default=None)
+_current_span = contextvars.ContextVar("span", default=None)
+
+
+class Span:
+    __slots__ = ("id", "parent", "name", "start", "duration", "attrs", "thread")
+
+    def __init__(self, id, parent, name, start, attrs):
+        self.id = id
+        self.parent = parent
+        self.name = name
+        self.start = start
+        self.duration = None
+        self.attrs = attrs
+        self.thread = threading.current_thread().name
+
+    def to_dict(self):
+        entry = {
+            "id": self.id,
+            "parent": self.parent,
+            "name": self.name,
+            "start_ms": round(self.start * 1000, 3),
+            "duration_ms": (
+                None if self.duration is None else round(self.duration * 1000, 3)
+            ),
+            "thread": self.thread,
+        }
+        if self.attrs:
+            entry["attrs"] = self.attrs
+        return entry
+
+
+class Trace:
+    def __init__(self, name, **attrs):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attrs = attrs
+        self.started_at = time.time()
+        self.duration = None
+        self.spans = []
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, **attrs):
+        started = time.perf_counter()
+        with self._lock:
+            span = Span(
+                len(self.spans) + 1,
+                _current_span.get(),
+                name,
+                started - self._start,
+                attrs,
+            )
+            self.spans.append(span)
+        token = _current_span.set(span.id)
+        try:
+            yield span
+        except BaseException as e:
+            span.attrs["error"] = type(e).__name__
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            _current_span.reset(token)
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._start
+
+    def to_dict(self):
+        with self._lock:
+            spans = [span.to_dict() for span in self.spans]
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "attrs": self.attrs,
+            "started_at": self.started_at,
+            "duration_ms": (
+                None if self.duration is None else round(self.duration * 1000, 3)
+            ),
+            "spans": spans,
+        }
+
+
+class TraceBuffer:
+    """The last `size` finished traces."""
+
+    def __init__(self, size=TRACE_BUFFER):
+        self._traces = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, trace):
+        with self._lock:
+            self._traces.append(trace)
+
+    def slowest(self, limit=20, name=None):
+        with self._lock:
+            traces = [t for t in self._traces if name is None or t.name == name]
+        traces.sort(key=lambda t: t.duration, reverse=True)
+        return [t.to_dict() for t in traces[:limit]]
+
+
+recent_traces = TraceBuffer()
+
+
+def debug_status(token):
+    """
+    HTTP status for a /debug/traces request presenting `token`: 200, 403
+    for a wrong or missing token, or 404 when no debug_token is configured.
+    """
+    if not DEBUG_TOKEN:
+        return 404
+    if token is None or not hmac.compare_digest(
+        token.encode(), str(DEBUG_TOKEN).encode()
+    ):
+        return 403
+    return 200
+
+
+def current():
+    """The trace of the event being handled, or None."""
+    return _current_trace.get()
+
+
+@contextmanager
+def trace(name, **attrs):
+    """Open a trace for one event and make it current until the block exits."""
+    new_trace = Trace(name, **attrs)
+    trace_token = _current_trace.set(new_trace)
+    span_token = _current_span.set(None)
+    try:
+        yield new_trace
+    finally:
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        new_trace.finish()
+        recent_traces.add(new_trace)
+        _emit(new_trace)
+
+
+def _emit(finished):
+    level = logging.WARNING if finished.duration >= SLOW_TRACE else logging.INFO
+    if not logger.isEnabledFor(level):
+        return
+    logger.log(
+        level,
+        "Trace %s %s took %.1f ms",
+        finished.name,
+        finished.trace_id,
+        finished.duration * 1000,
+        extra={"event": "trace", "fields": {"trace": finished.to_dict()}},
+    )
+
+
+@contextmanager
+def span(name, **attrs):
+    """Time the block as a span of the current trace, if there is one."""
+    active = _current_trace.get()
+    if active is None:
+        yield None
+        return
+    with active.span(name, **attrs) as new_span:
+        yield new_span
+
+
+def traced(name):
+    """Decorator form of span()."""
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return fn(*args, **kwargs)
+            with span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+@contextmanager
+def activate(target):
+    """Make `target` the current trace in this thread, e.g. in a worker."""
+    if target is None:
+        yield
+        return
+    trace_token = _current_trace.set(target)
+    span_token = _current_span.set(None)
+    try:
+        yield
+    finally:
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+
+
+def attach(coro, to=None):
+    """
+    Run `coro` inside trace `to` (default: the current one). Needed when
+    handing a coroutine to another thread's event loop, where the
+    caller's context variables are not visible.
+    """
+    target = to if to is not None else _current_trace.get()
+    if target is None:
+        return coro
+
+    async def run():
+        with activate(target):
+            return await coro
+
+    return run()
@@ -0,0 +1,233 @@
+import asyncio
+import heapq
+import itertools
+import json
+import threading
+import time
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from functions import tracing
+
+logger = logging.getLogger(__name__)
+
+try:
+    with open("config.json", "r") as f:
+        config = json.load(f)
+except Exception:
+    config = {}
+
+TYPING_DELAY = float(config.get("typing_delay", 0.5))
+TYPING_WORKERS = 4
+
+
+class TypingSession:
+    __slots__ = (
+        "recipient_id",
+        "replied_at",
+        "on_done",
+        "on_call",
+        "ended",
+        "timer",
+        "trace",
+    )
+
+    def __init__(self, recipient_id):
+        self.recipient_id = recipient_id
+        self.trace = tracing.current()
+        self.replied_at = None
+        self.on_done = None
+        self.on_call = None
+        self.ended = False
+        self.timer = None
+
+
+class TypingManager:
+    """
+    Typing indicators for messages that take a while to answer.
+
+    begin() starts a session for an incoming message and end() closes it
+    once the command has run. typing_on is only sent if no reply went out
+    within `delay` seconds, and typing_off only if typing_on was shown and
+    no reply followed it (Messenger clears the indicator when a message
+    arrives). The indicator calls run on worker threads, or as tasks with
+    begin_async()/end_async(), never on the caller's path. finish() ends
+    a session of either kind, e.g. from an async command that outlives
+    the handler that began it.
+
+    note_reply(recipient_id) must be called for every message sent.
+    """
+
+    def __init__(self, send_func, send_func_async=None, delay=TYPING_DELAY):
+        self.send_func = send_func
+        self.send_func_async = send_func_async
+        self.delay = delay
+
+        self._lock = threading.Lock()
+        self._active = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition(self._lock)
+        self._scheduler = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=TYPING_WORKERS, thread_name_prefix="typing"
+        )
+        self._stats = Counter()
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _register(self, recipient_id):
+        session = TypingSession(recipient_id)
+        self._active.setdefault(recipient_id, set()).add(session)
+        return session
+
+    def _unregister(self, session):
+        session.ended = True
+        sessions = self._active.get(session.recipient_id)
+        if sessions is not None:
+            sessions.discard(session)
+            if not sessions:
+                del self._active[session.recipient_id]
+
+    def note_reply(self, recipient_id):
+        now = time.monotonic()
+        with self._lock:
+            for session in self._active.get(recipient_id, ()):
+                session.replied_at = now
+
+    def _needs_off(self, session):
+        # A reply sent after typing_on was shown has already cleared it.
+        if session.on_done is None:
+            return False
+        return session.replied_at is None or session.replied_at < session.on_done
+
+    # Thread-based sessions (Flask)
+
+    def begin(self, recipient_id):
+        with self._cond:
+            session = self._register(recipient_id)
+            heapq.heappush(
+                self._heap, (time.monotonic() + self.delay, next(self._seq), session)
+            )
+            if self._scheduler is None:
+                self._scheduler = threading.Thread(
+                    target=self._schedule_loop, name="typing-scheduler", daemon=True
+                )
+                self._scheduler.start()
+            self._cond.notify()
+        return session
+
+    def end(self, session):
+        with self._lock:
+            self._unregister(session)
+            on_call = session.on_call
+        if on_call is None:
+            self._count("on_skipped")
+            return
+        on_call.add_done_callback(
+            lambda _: self._executor.submit(self._finish_sync, session)
+        )
+
+    def _schedule_loop(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                due, _, session = self._heap[0]
+                wait = due - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                heapq.heappop(self._heap)
+                if session.ended or session.replied_at is not None:
+                    continue
+                session.on_call = self._executor.submit(self._send_on_sync, session)
+
+    def _send_on_sync(self, session):
+        try:
+            with tracing.activate(session.trace):
+                self.send_func(session.recipient_id, True)
+            self._count("on_sent")
+        except Exception as e:
+            logger.error(f"Error sending typing_on to {session.recipient_id}: {e}")
+        finally:
+            session.on_done = time.monotonic()
+
+    def _finish_sync(self, session):
+        if not self._needs_off(session):
+            self._count("off_skipped")
+            return
+        try:
+            with tracing.activate(session.trace):
+                self.send_func(session.recipient_id, False)
+            self._count("off_sent")
+        except Exception as e:
+            logger.error(f"Error sending typing_off to {session.recipient_id}: {e}")
+
+    # Event-loop sessions (ASGI)
+
+    def begin_async(self, recipient_id):
+        with self._lock:
+            session = self._register(recipient_id)
+        session.timer = asyncio.get_running_loop().call_later(
+            self.delay, self._fire_async, session
+        )
+        return session
+
+    def end_async(self, session):
+        with self._lock:
+            self._unregister(session)
+        if session.timer is not None:
+            session.timer.cancel()
+        if session.on_call is None:
+            self._count("on_skipped")
+            return
+        session.on_call.add_done_callback(
+            lambda _: asyncio.ensure_future(self._finish_async(session))
+        )
+
+    def _fire_async(self, session):
+        if session.ended or session.replied_at is not None:
+            return
+        session.on_call = asyncio.ensure_future(self._send_on_async(session))
+
+    async def _send_async(self, recipient_id, typing_on):
+        if self.send_func_async is not None:
+            return await self.send_func_async(recipient_id, typing_on)
+        return await asyncio.to_thread(self.send_func, recipient_id, typing_on)
+
+    async def _send_on_async(self, session):
+        try:
+            await self._send_async(session.recipient_id, True)
+            self._count("on_sent")
+        except Exception as e:
+            logger.error(f"Error sending typing_on to {session.recipient_id}: {e}")
+        finally:
+            session.on_done = time.monotonic()
+
+    async def _finish_async(self, session):
+        if not self._needs_off(session):
+            self._count("off_skipped")
+            return
+        try:
+            await self._send_async(session.recipient_id, False)
+            self._count("off_sent")
+        except Exception as e:
+            logger.error(f"Error sending typing_off to {session.recipient_id}: {e}")
+
+    def finish(self, session):
+        """end() or end_async(); the latter must be called on the event loop."""
+        if session.timer is not None:
+            self.end_async(session)
+        else:
+            self.end(session)
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self._stats,
+                active=sum(len(sessions) for sessions in self._active.values()),
+            )
@@ -0,0 +1,109 @@
+import json
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+from functions.sharedState import shared_state
+
+logger = logging.getLogger(__name__)
+
+try:
+    with open("config.json", "r") as f:
+        config = json.load(f)
+except Exception:
+    config = {}
+
+DEDUPE_WINDOW = float(config.get("dedupe_window", 3600))
+DEDUPE_MAX_ENTRIES = int(config.get("dedupe_max_entries", 20000))
+SHARED_NAMESPACE = "webhook_events"
+
+
+def event_key(messaging_event):
+    """
+    Idempotency key for a messaging event: the message mid, or sender,
+    payload and timestamp for a postback. None if the event has neither.
+    """
+    message = messaging_event.get("message")
+    if message and message.get("mid"):
+        return f"mid:{message['mid']}"
+    postback = messaging_event.get("postback")
+    if postback is not None:
+        sender_id = messaging_event.get("sender", {}).get("id")
+        return f"postback:{sender_id}:{postback.get('payload')}:{messaging_event.get('timestamp')}"
+    return None
+
+
+class IdempotencyCache:
+    """
+    Keys of recently handled webhook events, used to drop redeliveries.
+
+    Keys live for `window` seconds, with at most `max_entries` kept; both
+    the lookup and eviction of the oldest keys are O(1). With a
+    `shared_store`, the first worker process to see a key claims it
+    there, so a redelivery routed to another worker is dropped as well.
+    """
+
+    def __init__(
+        self,
+        window=DEDUPE_WINDOW,
+        max_entries=DEDUPE_MAX_ENTRIES,
+        shared_store=None,
+    ):
+        self.window = window
+        self.max_entries = max_entries
+        self.shared_store = shared_store
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"checked": 0, "duplicates": 0, "shared_errors": 0}
+
+    def _evict(self, now):
+        while self._seen:
+            key, expires_at = next(iter(self._seen.items()))
+            if expires_at > now and len(self._seen) <= self.max_entries:
+                break
+            self._seen.popitem(last=False)
+
+    def _claim_shared(self, key):
+        def claim(current):
+            if current is not None:
+                return current, False
+            return 1, True
+
+        try:
+            return self.shared_store.update(
+                SHARED_NAMESPACE, key, claim, ttl=self.window
+            )
+        except Exception as e:
+            with self._lock:
+                self._stats["shared_errors"] += 1
+            logger.error(f"Error checking webhook event {key} in shared store: {e}")
+            return True
+
+    def is_duplicate(self, key):
+        """Record `key` and return True if it was already seen in the window."""
+        if key is None:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            self._stats["checked"] += 1
+            expires_at = self._seen.get(key)
+            if expires_at is not None and expires_at > now:
+                self._stats["duplicates"] += 1
+                return True
+            self._seen.pop(key, None)
+            self._seen[key] = now + self.window
+            self._evict(now)
+
+        if self.shared_store is not None and not self._claim_shared(key):
+            with self._lock:
+                self._stats["duplicates"] += 1
+            return True
+        return False
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._seen))
+
+
+webhook_dedupe = IdempotencyCache(shared_store=shared_state)
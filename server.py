@@ -1,12 +1,33 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 import json
 import os
-import importlib.util
+from collections import ChainMap
+from functools import partial
+from types import MappingProxyType
+import inspect
 import logging
+import threading
+import time
+
+from functions import metrics, tracing
+from functions.asyncBridge import AwaitableSend, submit as submit_coroutine
+from functions.broadcast import broadcaster
+from functions.commandRegistry import CommandRegistry
+from functions.commandRouter import Router
+from functions.fetchStock import get_fetch_stats
+from functions.getUserProfile import profile_cache
+from functions.jsonCodec import loads
+from functions.logPipeline import LazyJson, setup_logging
+from functions.messageCache import message_cache
+from functions.recentMessages import RecentMessages
+from functions.sharedState import count_sessions, orphaned_sessions
+from functions.typingManager import TypingManager
+from functions.webhookDedupe import event_key, webhook_dedupe
 
 FUNCTIONS_AVAILABLE = True
 original_send_message = None
 send_typing_indicator = None
+send_typing_indicator_async = None
 edit_bot_message = None
 config_data = {}
 
@@ -26,8 +47,10 @@ try:
     from functions.sendMessage import send_message as original_send_message_imported
 
     original_send_message = original_send_message_imported
+    from functions.sendBatch import batch_sender
     from functions.sendTyping import (
         send_typing_indicator as send_typing_indicator_imported,
+        send_typing_indicator_async,
     )
 
     send_typing_indicator = send_typing_indicator_imported
@@ -73,10 +96,9 @@ app = Flask(__name__)
 PAGE_ACCESS_TOKEN = config_data.get("page_access_token")
 VERIFY_TOKEN = config_data.get("verify_token")
 PREFIX = config_data.get("prefix", "!")
+BATCH_SENDS = config_data.get("batch_sends", False)
 
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(name)s - %(message)s"
-)
+setup_logging(config_data)
 logger = logging.getLogger(__name__)
 
 if not FUNCTIONS_AVAILABLE:
@@ -92,7 +114,13 @@ if not VERIFY_TOKEN:
         "Warning: Verify Token is missing from config.json. Webhook verification might fail."
     )
 
-last_bot_message_id_store = {"id": None, "recipient_id": None}
+# Latest bot message ids per recipient, for commands that edit or delete
+# what they sent last.
+bot_messages = RecentMessages(
+    config_data.get("recent_messages_max_recipients", 10000),
+    config_data.get("recent_messages_per_recipient", 5),
+)
+typing_manager = TypingManager(send_typing_indicator, send_typing_indicator_async)
 
 
 def enhanced_send_message(recipient_id, message_text):
@@ -102,12 +130,22 @@ def enhanced_send_message(recipient_id, message_text):
         )
         return None
 
-    response_data = original_send_message(recipient_id, message_text)
+    if BATCH_SENDS:
+        # The batch goes out on the sender's thread; time the wait here.
+        with tracing.span("send_message.batched"):
+            response_data = batch_sender.send_message(recipient_id, message_text)
+    else:
+        response_data = original_send_message(recipient_id, message_text)
+    return record_sent_message(recipient_id, message_text, response_data)
+
+
+def record_sent_message(recipient_id, message_text, response_data):
+    if response_data:
+        typing_manager.note_reply(recipient_id)
     if response_data and response_data.get("message_id"):
-        last_bot_message_id_store["id"] = response_data.get("message_id")
-        last_bot_message_id_store["recipient_id"] = recipient_id
+        bot_messages.record(recipient_id, response_data["message_id"])
         logger.info(
-            f"Stored last bot message ID: {last_bot_message_id_store['id']} for recipient {recipient_id}"
+            f"Stored last bot message ID: {response_data['message_id']} for recipient {recipient_id}"
         )
     elif response_data:
         logger.warning(
@@ -118,36 +156,247 @@ def enhanced_send_message(recipient_id, message_text):
     return response_data
 
 
-cmd_modules = {}
-cmd_dir = os.path.join(os.path.dirname(__file__), "cmd")
-if os.path.isdir(cmd_dir):
-    for filename in os.listdir(cmd_dir):
-        if (
-            filename.endswith(".py")
-            and filename != "__init__.py"
-            and filename != "delete.py"
-        ):
-            module_name = filename[:-3]
-            module_path = os.path.join(cmd_dir, filename)
+def last_bot_message_details(recipient_id):
+    """(message_id, recipient_id) of the bot's latest message to recipient_id."""
+    last = bot_messages.last(recipient_id)
+    if last is None:
+        return None, None
+    return last[0], recipient_id
+
+
+# Command names are registered from the cmd/ listing; each module is
+# imported the first time it is used.
+cmd_modules = CommandRegistry(os.path.join(os.path.dirname(__file__), "cmd"))
+logger.info(f"Registered command modules: {', '.join(cmd_modules)}")
+if config_data.get("hot_reload", False):
+    cmd_modules.watch(config_data.get("hot_reload_interval", 2.0))
+
+# Extra names for commands, e.g. {"gs": "gagstock"} under "command_aliases".
+COMMAND_ALIASES = config_data.get("command_aliases", {})
+_command_router = (None, None)
+
+
+def command_router():
+    """
+    Router from command names and aliases to module names, rebuilt when
+    command files are added or removed.
+    """
+    global _command_router
+    generation, router = _command_router
+    if generation == cmd_modules.generation:
+        return router
+
+    router = Router()
+    for module_name in cmd_modules:
+        aliases = [
+            alias for alias, target in COMMAND_ALIASES.items() if target == module_name
+        ]
+        try:
+            router.add(module_name, module_name, aliases=aliases)
+        except ValueError as e:
+            logger.error(f"Ignoring aliases for command {module_name}: {e}")
+            router.add(module_name, module_name)
+    _command_router = (cmd_modules.generation, router)
+    return router
+
+
+_base_context = (None, None)
+
+
+def base_context():
+    """
+    The parts of the command context that are the same for every message,
+    built once per registry version and read-only.
+    """
+    global _base_context
+    generation, context = _base_context
+    if generation == cmd_modules.generation:
+        return context
+
+    generation = cmd_modules.generation
+    context = MappingProxyType(
+        {
+            "edit_bot_message": edit_bot_message,
+            "prefix": PREFIX,
+            "logger": logger,
+            "config": config_data,
+            "cmd_module_keys": tuple(sorted(cmd_modules)),
+            "cmd_aliases": MappingProxyType(
+                {route.path: route.aliases for route in command_router().routes()}
+            ),
+            "registry_generation": generation,
+        }
+    )
+    _base_context = (generation, context)
+    return context
+
+
+SESSION_RESTORE_INTERVAL = 30
+
+
+def restore_module_sessions(module_name, module):
+    restore_sessions = getattr(module, "restore_sessions", None)
+    if not callable(restore_sessions):
+        return
+    try:
+        restore_sessions(enhanced_send_message)
+    except Exception as e:
+        logger.error(f"Error restoring sessions for command module {module_name}: {e}")
+
+
+# Command modules exposing restore_sessions() resume trackers left behind
+# by a previous or crashed worker as soon as they are imported.
+cmd_modules.add_load_hook(restore_module_sessions)
+
+
+def restore_command_sessions():
+    # Adopts sessions of workers that die later, periodically. A module
+    # that is not imported yet is imported here only when sessions of its
+    # kind (stored under the module's name) are waiting to be resumed, so
+    # a normal boot leaves the gagstock modules to load on first use.
+    cmd_modules.preload(config_data.get("preload_commands", []))
+    cmd_modules.log_import_report()
+    restorable = cmd_modules.defining("restore_sessions")
+
+    while True:
+        loaded = cmd_modules.loaded()
+        for module_name in restorable:
+            if module_name in loaded:
+                restore_module_sessions(module_name, loaded[module_name])
+                continue
             try:
-                spec = importlib.util.spec_from_file_location(module_name, module_path)
-                if spec and spec.loader:
-                    module = importlib.util.module_from_spec(spec)
-                    spec.loader.exec_module(module)
-                    cmd_modules[module_name] = module
-                    logger.info(f"Loaded command module: {module_name}")
-                else:
-                    logger.error(
-                        f"Could not load spec for module: {module_name} at {module_path}"
-                    )
+                if orphaned_sessions(module_name):
+                    cmd_modules.get(module_name)
             except Exception as e:
                 logger.error(
-                    f"Error loading command module {module_name} from {module_path}: {str(e)}"
+                    f"Error checking orphaned sessions for command module {module_name}: {e}"
                 )
-else:
-    logger.warning(
-        f"Commands directory '{cmd_dir}' not found. No commands will be loaded."
-    )
+        time.sleep(SESSION_RESTORE_INTERVAL)
+
+
+threading.Thread(
+    target=restore_command_sessions, name="session-restorer", daemon=True
+).start()
+
+
+def active_session_counts():
+    # Loaded command modules that keep sessions name their kind in
+    # SESSION_KIND (gagstock, gagstockfav).
+    counts = {}
+    for module in cmd_modules.loaded().values():
+        kind = getattr(module, "SESSION_KIND", None)
+        if kind:
+            counts[(kind,)] = count_sessions(kind)
+    return counts
+
+
+CIRCUIT_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+def upstream_fetch_counts():
+    return {
+        (endpoint, outcome): counts[key]
+        for endpoint, counts in get_fetch_stats()["single_flight"].items()
+        for key, outcome in (("executions", "executed"), ("coalesced", "coalesced"))
+    }
+
+
+def upstream_circuit_values(field):
+    return {
+        (endpoint,): (
+            CIRCUIT_STATE_VALUES[stats["state"]] if field == "state" else stats[field]
+        )
+        for endpoint, stats in get_fetch_stats()["circuits"].items()
+    }
+
+
+def outbound_queue_depths():
+    depths = {("broadcast",): broadcaster.pending()}
+    if BATCH_SENDS:
+        depths[("batch",)] = batch_sender.stats()["waiting"]
+    return depths
+
+
+metrics.gauge(
+    "bot_active_sessions",
+    "Tracking sessions across all workers.",
+    active_session_counts,
+    ("kind",),
+)
+metrics.gauge(
+    "bot_cache_hit_ratio",
+    "Hit ratio since start.",
+    lambda: {
+        ("message",): message_cache.stats()["hit_ratio"],
+        ("profile",): profile_cache.stats()["hit_ratio"],
+    },
+    ("cache",),
+)
+metrics.gauge(
+    "bot_outbound_queue_depth",
+    "Messages waiting to be sent.",
+    outbound_queue_depths,
+    ("queue",),
+)
+metrics.gauge(
+    "bot_webhook_duplicates_total",
+    "Redelivered webhook events dropped.",
+    lambda: webhook_dedupe.stats()["duplicates"],
+    type="counter",
+)
+metrics.gauge(
+    "bot_typing_sessions_active",
+    "Messages currently being answered.",
+    lambda: typing_manager.stats()["active"],
+)
+metrics.gauge(
+    "bot_upstream_fetches_total",
+    "Stock and weather fetches, run upstream or coalesced onto one in flight.",
+    upstream_fetch_counts,
+    ("endpoint", "outcome"),
+    type="counter",
+)
+metrics.gauge(
+    "bot_upstream_circuit_state",
+    "Upstream circuit breaker state (0 closed, 1 half-open, 2 open).",
+    lambda: upstream_circuit_values("state"),
+    ("endpoint",),
+)
+metrics.gauge(
+    "bot_upstream_circuit_opened_total",
+    "Times the upstream circuit breaker opened.",
+    lambda: upstream_circuit_values("opened"),
+    ("endpoint",),
+    type="counter",
+)
+metrics.gauge(
+    "bot_upstream_circuit_rejected_total",
+    "Calls failed fast while the upstream circuit was open.",
+    lambda: upstream_circuit_values("rejected"),
+    ("endpoint",),
+    type="counter",
+)
+metrics.gauge(
+    "bot_outage_notifications_suppressed_total",
+    "Tracker outage messages not sent to users.",
+    lambda: get_fetch_stats()["suppressed_notifications"],
+    type="counter",
+)
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route("/debug/traces", methods=["GET"])
+def debug_traces():
+    # Slowest of the recent events, e.g. /debug/traces?limit=5&name=webhook.event
+    status = tracing.debug_status(request.headers.get("X-Debug-Token"))
+    if status != 200:
+        return "Not Found" if status == 404 else "Forbidden", status
+    limit = request.args.get("limit", 20, type=int)
+    return jsonify(tracing.recent_traces.slowest(limit, request.args.get("name")))
 
 
 @app.route("/webhook", methods=["GET"])
@@ -182,9 +431,16 @@ def verify_webhook():
 
 @app.route("/webhook", methods=["POST"])
 def webhook_handler():
-    data = request.get_json()
+    try:
+        data = loads(request.get_data() or b"null")
+    except ValueError:
+        return "INVALID_JSON", 400
+    if not isinstance(data, dict):
+        return "INVALID_JSON", 400
     logger.info(
-        f"Received POST request on /webhook with data: {json.dumps(data, indent=1)}"
+        "Received POST request on /webhook with data: %s",
+        LazyJson(data),
+        extra={"event": "webhook.payload"},
     )
 
     if not PAGE_ACCESS_TOKEN or not FUNCTIONS_AVAILABLE:
@@ -193,58 +449,82 @@ def webhook_handler():
         )
         return "SERVER_ERROR_NO_TOKEN_OR_FUNCTIONS", 500
 
-    if data and data.get("object") == "page":
+    if data.get("object") == "page":
         for entry in data.get("entry", []):
             for messaging_event in entry.get("messaging", []):
                 sender_id = messaging_event.get("sender", {}).get("id")
                 if not sender_id:
                     logger.warning("Received messaging event without sender ID.")
                     continue
-
-                is_typing_on = False
-                replied_to_mid = None
-                try:
-                    if "message" in messaging_event:
-                        message_data = messaging_event["message"]
-                        message_text = message_data.get("text")
-                        original_message_id_from_user = message_data.get("mid")
-
-                        if message_data.get("reply_to"):
-                            replied_to_mid = message_data["reply_to"].get("mid")
-
-                        if message_text:
-                            if send_typing_indicator:
-                                send_typing_indicator(sender_id, True)
-                                is_typing_on = True
-                            process_message(
-                                sender_id,
-                                message_text,
-                                original_message_id_from_user,
-                                replied_to_mid,
-                            )
-                        else:
+                metrics.count_webhook_event(messaging_event)
+                with tracing.trace("webhook.event", sender=sender_id) as event_trace:
+                    key = event_key(messaging_event)
+                    with tracing.span("dedupe"):
+                        duplicate = webhook_dedupe.is_duplicate(key)
+                    if duplicate:
+                        event_trace.attrs["duplicate"] = True
+                        logger.info(f"Dropping redelivered webhook event {key}")
+                        continue
+
+                    typing_session = None
+                    replied_to_mid = None
+                    try:
+                        if "message" in messaging_event:
+                            message_data = messaging_event["message"]
+                            message_text = message_data.get("text")
+                            original_message_id_from_user = message_data.get("mid")
+
+                            if message_data.get("reply_to"):
+                                replied_to_mid = message_data["reply_to"].get("mid")
+
+                            if message_text:
+                                typing_session = typing_manager.begin(sender_id)
+                                if process_message(
+                                    sender_id,
+                                    message_text,
+                                    original_message_id_from_user,
+                                    replied_to_mid,
+                                    typing_session=typing_session,
+                                ):
+                                    # The async command ends it once it has replied.
+                                    typing_session = None
+                            else:
+                                logger.info(
+                                    f"Received message event from {sender_id} without text content. MID: {original_message_id_from_user}"
+                                )
+                        elif "postback" in messaging_event:
                             logger.info(
-                                f"Received message event from {sender_id} without text content. MID: {original_message_id_from_user}"
+                                f"Received postback event from {sender_id}: {messaging_event.get('postback')}"
                             )
-                    elif "postback" in messaging_event:
-                        logger.info(
-                            f"Received postback event from {sender_id}: {messaging_event.get('postback')}"
+                    except Exception as e:
+                        logger.error(
+                            f"Error in webhook_handler main loop for sender {sender_id}: {e}",
+                            exc_info=True,
                         )
-                except Exception as e:
-                    logger.error(
-                        f"Error in webhook_handler main loop for sender {sender_id}: {e}",
-                        exc_info=True,
-                    )
-                finally:
-                    if is_typing_on and send_typing_indicator:
-                        send_typing_indicator(sender_id, False)
+                    finally:
+                        if typing_session is not None:
+                            typing_manager.end(typing_session)
 
     return "EVENT_RECEIVED", 200
 
 
 def process_message(
-    sender_id, message_text, original_message_id_from_user, replied_to_message_id
+    sender_id,
+    message_text,
+    original_message_id_from_user,
+    replied_to_message_id,
+    send_message_func=None,
+    send_message_async_func=None,
+    typing_session=None,
 ):
+    """
+    Run the command in message_text, or send the default reply. Returns
+    True when an async command was started; it then ends typing_session
+    itself once it has finished, instead of the caller.
+    """
+    send_message_func = AwaitableSend(
+        send_message_func or enhanced_send_message, send_message_async_func
+    )
     logger.info(
         f"Processing message from {sender_id}: '{message_text}' (User's MID: {original_message_id_from_user}, Replied to MID: {replied_to_message_id})"
     )
@@ -264,27 +544,28 @@ def process_message(
     if first_word.startswith(PREFIX):
         command_candidate = first_word[len(PREFIX) :].lower()
         is_prefixed_command = True
-        if command_candidate in cmd_modules:
-            actual_command_name = command_candidate
     else:
         command_candidate = first_word.lower()
-        if command_candidate in cmd_modules:
-            actual_command_name = command_candidate
-
-    context = {
-        "send_message": enhanced_send_message,
-        "edit_bot_message": edit_bot_message,
-        "original_user_message_id": original_message_id_from_user,
-        "replied_to_message_id": replied_to_message_id,
-        "get_last_bot_message_details": lambda: (
-            last_bot_message_id_store["id"],
-            last_bot_message_id_store["recipient_id"],
-        ),
-        "prefix": PREFIX,
-        "logger": logger,
-        "config": config_data,
-        "cmd_module_keys": list(cmd_modules.keys()),
-    }
+
+    matched = command_router().match([command_candidate])
+    if matched is not None and cmd_modules.get(matched[0].handler) is not None:
+        actual_command_name = matched[0].handler
+
+    context = ChainMap(
+        {
+            "send_message": send_message_func,
+            "original_user_message_id": original_message_id_from_user,
+            "replied_to_message_id": replied_to_message_id,
+            "get_last_bot_message_details": partial(
+                last_bot_message_details, recipient_id=sender_id
+            ),
+            "get_recent_bot_messages": partial(
+                bot_messages.recent, recipient_id=sender_id
+            ),
+            "trace": tracing.current(),
+        },
+        base_context(),
+    )
 
     try:
         if actual_command_name:
@@ -292,13 +573,38 @@ def process_message(
             logger.info(
                 f"Executing command '{actual_command_name}' for user {sender_id} with args: {args}"
             )
-            if callable(getattr(command_module, "execute", None)):
-                command_module.execute(sender_id, args, context)
+            if inspect.iscoroutinefunction(getattr(command_module, "execute", None)):
+                # Async commands run on the shared event loop; the
+                # dispatcher does not wait for them to finish.
+                submit_coroutine(
+                    tracing.attach(
+                        run_async_command(
+                            actual_command_name,
+                            command_module.execute(sender_id, args, context),
+                            sender_id,
+                            send_message_func,
+                            typing_session,
+                        )
+                    )
+                )
+                return True
+            elif callable(getattr(command_module, "execute", None)):
+                started = time.perf_counter()
+                try:
+                    with tracing.span(f"command.{actual_command_name}"):
+                        command_module.execute(sender_id, args, context)
+                except Exception:
+                    metrics.command_errors.inc(actual_command_name)
+                    raise
+                finally:
+                    metrics.command_seconds.observe(
+                        time.perf_counter() - started, actual_command_name
+                    )
             else:
                 logger.error(
                     f"Command module {actual_command_name} does not have a callable 'execute' function."
                 )
-                enhanced_send_message(
+                send_message_func(
                     sender_id,
                     f"Error: Command '{actual_command_name}' is not correctly configured.",
                 )
@@ -306,12 +612,12 @@ def process_message(
             logger.info(
                 f"Unknown prefixed command '{command_candidate}' from user {sender_id}."
             )
-            enhanced_send_message(sender_id, f"Unknown command: {command_candidate}")
+            send_message_func(sender_id, f"Unknown command: {command_candidate}")
         else:
             logger.info(
                 f"No command matched for message from {sender_id}: '{message_text}'. Sending default reply."
             )
-            enhanced_send_message(sender_id, f"You said: {message_text}")
+            send_message_func(sender_id, f"You said: {message_text}")
     except Exception as e:
         logger.error(
             f"Error during command execution or sending default reply for user {sender_id}: {str(e)}",
@@ -328,6 +634,33 @@ def process_message(
             )
 
 
+async def run_async_command(
+    command_name, coro, sender_id, send_message_func, typing_session=None
+):
+    started = time.perf_counter()
+    try:
+        with tracing.span(f"command.{command_name}", detached=True):
+            await coro
+    except Exception as e:
+        metrics.command_errors.inc(command_name)
+        logger.error(
+            f"Error during async command '{command_name}' for user {sender_id}: {str(e)}",
+            exc_info=True,
+        )
+        try:
+            await send_message_func.send_async(
+                sender_id, f"An error occurred while processing your request."
+            )
+        except Exception as send_err:
+            logger.error(
+                f"CRITICAL: Failed to send error message to user {sender_id} after a processing error: {str(send_err)}"
+            )
+    finally:
+        metrics.command_seconds.observe(time.perf_counter() - started, command_name)
+        if typing_session is not None:
+            typing_manager.finish(typing_session)
+
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
     logger.info(f"Starting Flask app on host 0.0.0.0 and port {port}")
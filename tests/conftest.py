@@ -0,0 +1,74 @@
+"""
+Every module reads config.json from the working directory when it is
+imported, so the suite runs from a scratch directory holding a test
+config. Graph API calls go to a functions.graphStub server on a free
+local port, and shared state lives in that directory's database.
+"""
+
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+GRAPH_STUB_PORT = _free_port()
+WORKDIR = tempfile.mkdtemp(prefix="pagebot-tests-")
+
+with open(os.path.join(WORKDIR, "config.json"), "w") as f:
+    json.dump(
+        {
+            "page_access_token": "test-token",
+            "verify_token": "test-verify",
+            "graph_api_version": "v22.0",
+            "graph_api_base": f"http://127.0.0.1:{GRAPH_STUB_PORT}",
+            "prefix": "",
+            "batch_linger": 0.05,
+        },
+        f,
+    )
+
+os.chdir(WORKDIR)
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope="session")
+def graph_server():
+    from functions import graphStub
+
+    server = graphStub.serve("127.0.0.1", GRAPH_STUB_PORT)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def graph_stub(graph_server):
+    """The running Graph stub, with no faults and no messages recorded."""
+    from functions import graphStub
+
+    graph_server.faults = graphStub.Faults()
+    with graphStub._lock:
+        graphStub.sent_messages.clear()
+    return graph_server
+
+
+@pytest.fixture
+def commands():
+    """A fresh registry over cmd/, so each test imports its own modules."""
+    from functions.commandRegistry import CommandRegistry
+
+    return CommandRegistry(os.path.join(ROOT, "cmd"))
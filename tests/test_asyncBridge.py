@@ -0,0 +1,43 @@
+import asyncio
+import gc
+
+from functions import asyncBridge
+from functions.asyncBridge import AwaitableSend
+
+
+def test_called_from_a_thread_sends_synchronously():
+    send = AwaitableSend(lambda recipient_id, text: {"recipient_id": recipient_id})
+
+    assert send("user-1", "hi") == {"recipient_id": "user-1"}
+
+
+def test_unawaited_send_in_a_loop_still_completes():
+    sent = []
+
+    async def send_async(recipient_id, text):
+        await asyncio.sleep(0.01)
+        sent.append((recipient_id, text))
+        return {"recipient_id": recipient_id}
+
+    send = AwaitableSend(lambda *args: None, send_async)
+
+    async def command():
+        send("user-1", "fire and forget")
+        gc.collect()
+        assert len(asyncBridge._pending_sends) == 1
+        while asyncBridge._pending_sends:
+            await asyncio.sleep(0.005)
+            gc.collect()
+
+    asyncio.run(command())
+
+    assert sent == [("user-1", "fire and forget")]
+
+
+def test_awaited_send_returns_the_response():
+    async def command():
+        send = AwaitableSend(lambda recipient_id, text: {"recipient_id": recipient_id})
+        return await send("user-2", "hi")
+
+    assert asyncio.run(command()) == {"recipient_id": "user-2"}
+    assert not asyncBridge._pending_sends
@@ -0,0 +1,88 @@
+import time
+
+import pytest
+
+from functions.circuitBreaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    backoff_delay,
+)
+
+
+def _fail():
+    raise ConnectionError("upstream down")
+
+
+def _trip(breaker):
+    for _ in range(breaker.failure_threshold):
+        with pytest.raises(ConnectionError):
+            breaker.call(_fail)
+
+
+def test_opens_after_consecutive_failures_and_fails_fast():
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=60)
+    calls = []
+
+    _trip(breaker)
+
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError) as excinfo:
+        breaker.call(calls.append, 1)
+    assert calls == []
+    assert 0 < excinfo.value.retry_after <= 60
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker("test", failure_threshold=2)
+    with pytest.raises(ConnectionError):
+        breaker.call(_fail)
+    assert breaker.call(lambda: "ok") == "ok"
+    with pytest.raises(ConnectionError):
+        breaker.call(_fail)
+    assert breaker.state == CLOSED
+
+
+def test_half_open_probe_success_closes():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.02)
+    _trip(breaker)
+    time.sleep(0.03)
+
+    assert breaker.state == HALF_OPEN
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == CLOSED
+
+
+def test_half_open_probe_failure_reopens():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.02)
+    _trip(breaker)
+    time.sleep(0.03)
+
+    with pytest.raises(ConnectionError):
+        breaker.call(_fail)
+    assert breaker.state == OPEN
+    assert breaker.stats()["opened"] == 2
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.02)
+    _trip(breaker)
+    time.sleep(0.03)
+
+    def probe():
+        with pytest.raises(CircuitOpenError):
+            breaker.call(lambda: "second probe")
+        return "ok"
+
+    assert breaker.call(probe) == "ok"
+    assert breaker.state == CLOSED
+
+
+def test_backoff_delay_is_capped_and_jittered():
+    for attempt in range(1, 10):
+        delay = backoff_delay(attempt, 1.0, 8.0)
+        expected = min(8.0, 2 ** (attempt - 1))
+        assert expected / 2 <= delay <= expected
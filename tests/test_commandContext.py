@@ -0,0 +1,34 @@
+import pytest
+
+import server
+
+
+@pytest.fixture
+def context(monkeypatch):
+    monkeypatch.setattr(server, "COMMAND_ALIASES", {"h": "help"})
+    monkeypatch.setattr(server, "_command_router", (None, None))
+    monkeypatch.setattr(server, "_base_context", (None, None))
+    return server.base_context()
+
+
+def test_base_context_cannot_be_changed_by_commands(context):
+    assert context["cmd_aliases"]["help"] == ("h",)
+    with pytest.raises(TypeError):
+        context["cmd_aliases"]["help"] = ["changed"]
+    with pytest.raises(TypeError):
+        context["prefix"] = "?"
+    assert server.base_context() is context
+
+
+def test_help_lists_commands_with_aliases(commands, context):
+    sent = []
+    help_command = commands["help"]
+    help_command.execute(
+        "help-user", [], dict(context, send_message=lambda *args: sent.append(args))
+    )
+
+    lines = sent[0][1].splitlines()
+    assert "- help (also: h)" in lines
+    assert [line for line in lines if line.startswith("- ")] == sorted(
+        line for line in lines if line.startswith("- ")
+    )
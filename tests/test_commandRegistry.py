@@ -0,0 +1,68 @@
+import os
+
+from functions.commandRegistry import CommandRegistry
+
+
+def _write(cmd_dir, name, source):
+    with open(os.path.join(cmd_dir, f"{name}.py"), "w") as f:
+        f.write(source)
+
+
+def test_modules_are_imported_on_first_lookup_and_hooks_run_once(tmp_path):
+    _write(tmp_path, "hello", "def execute(sender_id, args, send):\n    pass\n")
+    _write(tmp_path, "tracker", "def restore_sessions(send):\n    pass\n")
+    registry = CommandRegistry(str(tmp_path))
+    loads = []
+    registry.add_load_hook(lambda name, module: loads.append(name))
+
+    assert sorted(registry) == ["hello", "tracker"]
+    assert registry.loaded() == {}
+    assert registry.defining("restore_sessions") == ["tracker"]
+    assert registry.loaded() == {}
+
+    registry["tracker"]
+    registry["tracker"]
+
+    assert loads == ["tracker"]
+    assert list(registry.loaded()) == ["tracker"]
+
+
+def test_failed_imports_are_dropped_without_running_hooks(tmp_path):
+    _write(tmp_path, "broken", "raise RuntimeError('bad module')\n")
+    registry = CommandRegistry(str(tmp_path))
+    loads = []
+    registry.add_load_hook(lambda name, module: loads.append(name))
+
+    assert registry.get("broken") is None
+    assert "broken" not in registry
+    assert loads == []
+
+
+def test_a_failing_hook_does_not_block_the_import(tmp_path):
+    _write(tmp_path, "hello", "VALUE = 1\n")
+    registry = CommandRegistry(str(tmp_path))
+
+    def failing_hook(name, module):
+        raise RuntimeError("hook failed")
+
+    registry.add_load_hook(failing_hook)
+
+    assert registry["hello"].VALUE == 1
+
+
+def test_reload_hands_state_over_without_running_hooks(tmp_path):
+    source = (
+        "state = {}\n"
+        "def export_state():\n    return state\n"
+        "def import_state(previous_state, previous_module):\n"
+        "    state.update(previous_state)\n"
+    )
+    _write(tmp_path, "tracker", source)
+    registry = CommandRegistry(str(tmp_path))
+    loads = []
+    registry.add_load_hook(lambda name, module: loads.append(name))
+    registry["tracker"].state["sessions"] = 2
+
+    assert registry.reload("tracker")
+    assert registry["tracker"].state == {"sessions": 2}
+    assert loads == ["tracker"]
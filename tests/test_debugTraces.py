@@ -0,0 +1,74 @@
+import asyncio
+import json
+
+import pytest
+
+import asgi
+import server
+from functions import tracing
+
+
+@pytest.fixture
+def recorded_trace():
+    with tracing.trace("webhook.event", sender="psid-debug-test"):
+        pass
+
+
+def _asgi_get(headers=()):
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/debug/traces",
+        "query_string": b"limit=1000&name=webhook.event",
+        "headers": list(headers),
+    }
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi.app(scope, receive, send))
+    return sent[0]["status"], sent[1]["body"].decode()
+
+
+def _flask_get(headers=None):
+    response = server.app.test_client().get(
+        "/debug/traces?limit=1000&name=webhook.event", headers=headers or {}
+    )
+    return response.status_code, response.get_data(as_text=True)
+
+
+def test_debug_traces_are_not_served_without_a_configured_token(
+    recorded_trace, monkeypatch
+):
+    monkeypatch.setattr(tracing, "DEBUG_TOKEN", None)
+
+    for headers in ({}, {"X-Debug-Token": ""}, {"X-Debug-Token": "guess"}):
+        status, body = _flask_get(headers)
+        assert status == 404 and "psid-debug-test" not in body
+    assert _asgi_get([(b"x-debug-token", b"guess")])[0] == 404
+
+
+def test_debug_traces_require_the_token(recorded_trace, monkeypatch):
+    monkeypatch.setattr(tracing, "DEBUG_TOKEN", "s3cret")
+
+    for get in (_flask_get, lambda headers=None: _asgi_get(headers or ())):
+        status, body = get()
+        assert status == 403 and "psid-debug-test" not in body
+    assert _flask_get({"X-Debug-Token": "wrong"})[0] == 403
+    assert _asgi_get([(b"x-debug-token", b"wrong")])[0] == 403
+
+
+def test_debug_traces_are_served_with_the_token(recorded_trace, monkeypatch):
+    monkeypatch.setattr(tracing, "DEBUG_TOKEN", "s3cret")
+
+    flask_status, flask_body = _flask_get({"X-Debug-Token": "s3cret"})
+    asgi_status, asgi_body = _asgi_get([(b"x-debug-token", b"s3cret")])
+
+    assert flask_status == asgi_status == 200
+    for body in (flask_body, asgi_body):
+        senders = [t["attrs"].get("sender") for t in json.loads(body)]
+        assert "psid-debug-test" in senders
@@ -0,0 +1,73 @@
+import threading
+import time
+
+import pytest
+
+from functions.fetchStock import SingleFlight
+
+
+def _run_concurrently(count, target):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def _wait_for_callers(flight, key, count, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while flight.stats().get(key, {}).get("calls", 0) < count:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_single_flight_runs_concurrent_calls_once():
+    flight = SingleFlight()
+    release = threading.Event()
+    results = []
+
+    def fetch():
+        release.wait(5)
+        return {"gear": []}
+
+    threads = _run_concurrently(5, lambda: results.append(flight.do("stock", fetch)))
+    _wait_for_callers(flight, "stock", 5)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == 5 and all(result is results[0] for result in results)
+    assert flight.stats()["stock"] == {"calls": 5, "executions": 1, "coalesced": 4}
+
+
+def test_single_flight_shares_the_error_and_does_not_cache():
+    flight = SingleFlight()
+    release = threading.Event()
+    errors = []
+
+    def fail():
+        release.wait(5)
+        raise ValueError("upstream down")
+
+    def call():
+        try:
+            flight.do("stock", fail)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = _run_concurrently(3, call)
+    _wait_for_callers(flight, "stock", 3)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == 3 and all(error is errors[0] for error in errors)
+    assert flight.do("stock", lambda: "recovered") == "recovered"
+    assert flight.stats()["stock"]["executions"] == 2
+
+
+def test_single_flight_keys_do_not_coalesce():
+    flight = SingleFlight()
+    assert flight.do("stock", lambda: 1) == 1
+    assert flight.do("weather", lambda: 2) == 2
+    with pytest.raises(KeyError):
+        flight.do("stock", lambda: {}["missing"])
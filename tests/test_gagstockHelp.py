@@ -0,0 +1,27 @@
+import pytest
+
+
+def _help(module, sender_id):
+    sent = []
+    module.execute(sender_id, [], {"send_message": lambda *args: sent.append(args)})
+    return sent[0][1].splitlines()
+
+
+def test_user_stats_line_sits_between_settings_and_categories(commands, monkeypatch):
+    gagstock = commands["gagstock"]
+    monkeypatch.setattr(gagstock, "get_upcoming_restocks", lambda: [])
+
+    lines = _help(gagstock, "help-order-user")
+
+    stats = lines.index("• 'gagstock stats' - Your usage statistics")
+    assert lines[stats + 2].startswith("📊 Your Stats: 0 favorites | 0 alerts")
+    assert lines[stats + 4].startswith("📋 Categories: ")
+    assert not any("{" in line for line in lines)
+
+
+@pytest.mark.parametrize("module_name", ["gagstock", "gagstockfav"])
+@pytest.mark.parametrize("word", ["start", "stop", "favorites"])
+def test_subcommands_have_no_extra_aliases(commands, module_name, word):
+    matched = commands[module_name].router.match([word])
+
+    assert matched is None or matched[0].path not in ("on", "off", "list")
@@ -0,0 +1,78 @@
+import threading
+
+from functions.getUserProfile import PREFETCH_CHUNK, ProfileCache
+
+
+def test_get_caches_profiles(graph_stub):
+    cache = ProfileCache()
+
+    assert cache.get("1001")["first_name"] == "Stub"
+    assert cache.get("1001")["last_name"] == "User 1001"
+    assert graph_stub.faults.snapshot()["requests"] == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_unknown_user_is_negatively_cached(graph_stub):
+    cache = ProfileCache()
+
+    assert cache.get("missing-1") is None
+    assert cache.get("missing-1") is None
+    assert graph_stub.faults.snapshot()["requests"] == 1
+    assert cache.stats()["negative_hits"] == 1
+
+
+def test_transient_failures_are_not_cached(graph_stub):
+    cache = ProfileCache()
+    graph_stub.faults.error_rate = 1.0
+    assert cache.get("1002") is None
+
+    graph_stub.faults.error_rate = 0.0
+    graph_stub.faults.throttle_rate = 1.0
+    assert cache.get("1002") is None
+
+    graph_stub.faults.throttle_rate = 0.0
+    assert cache.get("1002")["first_name"] == "Stub"
+    assert graph_stub.faults.snapshot()["requests"] == 3
+
+
+def test_prefetch_loads_chunks_and_caches_only_reported_misses(graph_stub):
+    cache = ProfileCache()
+    user_ids = [str(2000 + i) for i in range(PREFETCH_CHUNK + 5)] + ["missing-2"]
+
+    assert cache.prefetch(user_ids) == PREFETCH_CHUNK + 5
+    assert graph_stub.faults.snapshot()["requests"] == 2
+    assert cache.peek("2000")["first_name"] == "Stub"
+    assert cache.get("missing-2") is None
+    assert graph_stub.faults.snapshot()["requests"] == 2
+
+
+def test_failed_prefetch_caches_nothing(graph_stub):
+    cache = ProfileCache()
+    graph_stub.faults.error_rate = 1.0
+
+    assert cache.prefetch(["3001", "3002"]) == 0
+    assert cache.stats()["entries"] == 0
+
+    graph_stub.faults.error_rate = 0.0
+    assert cache.get("3001")["first_name"] == "Stub"
+
+
+def test_concurrent_misses_share_one_lookup(graph_stub):
+    cache = ProfileCache()
+    graph_stub.faults.latency = 0.1
+    start = threading.Barrier(8)
+    results = []
+
+    def lookup():
+        start.wait()
+        results.append(cache.get("4001"))
+
+    threads = [threading.Thread(target=lookup) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == 8 and all(result == results[0] for result in results)
+    assert graph_stub.faults.snapshot()["requests"] == 1
+    assert cache.stats()["coalesced"] == 7
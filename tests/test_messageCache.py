@@ -0,0 +1,78 @@
+import time
+
+from functions.messageCache import MessageCache, shared_key
+from functions.sharedState import SharedState
+
+
+def test_get_set_and_ttl():
+    cache = MessageCache(default_ttl=60)
+    cache.set("a", "hello")
+    cache.set("b", "short", ttl=0.02)
+
+    assert cache.get("a") == "hello"
+    time.sleep(0.03)
+    assert cache.get("b") is None
+    assert cache.get("missing") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"]) == (1, 2, 1)
+
+
+def test_least_recently_used_is_evicted_first():
+    cache = MessageCache(max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_cap_evicts_entries():
+    cache = MessageCache(max_bytes=2000)
+    for i in range(10):
+        cache.set(f"key-{i}", "x" * 400)
+
+    assert cache.stats()["bytes"] <= 2000
+    assert cache.get("key-9") is not None
+    assert cache.get("key-0") is None
+
+
+def test_sweep_drops_expired_entries():
+    cache = MessageCache()
+    cache.set("a", "1", ttl=0.01)
+    cache.set("b", "2", ttl=60)
+    time.sleep(0.02)
+
+    assert cache.sweep() == 1
+    assert len(cache) == 1
+
+
+def test_get_shared_renders_once_per_version_and_adds_suffix():
+    cache = MessageCache()
+    renders = []
+
+    def render():
+        renders.append(1)
+        return "stock update"
+
+    first = cache.get_shared("stock", render, version="v1", suffix="\nalert A")
+    second = cache.get_shared("stock", render, version="v1", suffix="\nalert B")
+    cache.get_shared("stock", render, version="v2")
+
+    assert (first, second) == ("stock update\nalert A", "stock update\nalert B")
+    assert len(renders) == 2
+    assert shared_key("stock", "v1") == "shared:stock:v1"
+
+
+def test_get_shared_reuses_a_body_rendered_by_another_worker(tmp_path):
+    store = SharedState(str(tmp_path / "state.db"))
+    worker_a = MessageCache(shared_store=store)
+    worker_b = MessageCache(shared_store=store)
+
+    worker_a.get_shared("stock", lambda: "rendered by a", version="v1", ttl=60)
+    body = worker_b.get_shared("stock", lambda: "rendered by b", version="v1")
+
+    assert body == "rendered by a"
+    assert worker_b.stats()["shared_hits"] == 1
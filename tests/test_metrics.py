@@ -0,0 +1,57 @@
+from functions import metrics
+
+
+def _samples(text, name):
+    return {
+        line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+        for line in text.splitlines()
+        if line.startswith(name) and not line.startswith("#")
+    }
+
+
+def test_counter_and_histogram_render_in_text_format():
+    requests_total = metrics.Counter("test_requests_total", "Requests.", ("route",))
+    latency = metrics.Histogram(
+        "test_latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0)
+    )
+    requests_total.inc("/a")
+    requests_total.inc("/a", amount=2)
+    latency.observe(0.05, "/a")
+    latency.observe(0.5, "/a")
+
+    counter_lines = list(requests_total.samples())
+    assert counter_lines == [("test_requests_total", ("route",), ("/a",), 3)]
+    buckets = {
+        labels[-1]: value
+        for name, _, labels, value in latency.samples()
+        if name.endswith("_bucket")
+    }
+    assert buckets == {"0.1": 1, "1": 2, "+Inf": 2}
+
+
+def test_callback_gauge_is_read_at_scrape_time():
+    value = {"depth": 1}
+    metrics.gauge("test_queue_depth", "Depth.", lambda: value["depth"])
+    value["depth"] = 7
+
+    assert _samples(metrics.render(), "test_queue_depth") == {"test_queue_depth": 7}
+
+
+def test_fetch_stats_are_exported():
+    import server  # noqa: F401 - registers the callback gauges
+    from functions.fetchStock import _single_flight
+
+    _single_flight.do("stock", lambda: {})
+    text = metrics.render()
+
+    fetches = _samples(text, "bot_upstream_fetches_total")
+    assert (
+        fetches['bot_upstream_fetches_total{endpoint="stock",outcome="executed"}'] >= 1
+    )
+    assert _samples(text, "bot_upstream_circuit_state") == {
+        'bot_upstream_circuit_state{endpoint="stock"}': 0,
+        'bot_upstream_circuit_state{endpoint="weather"}': 0,
+    }
+    assert "bot_outage_notifications_suppressed_total" in _samples(
+        text, "bot_outage_notifications_suppressed_total"
+    )
@@ -0,0 +1,80 @@
+import pytest
+
+from functions import rateLimiter
+from functions.rateLimiter import RateLimiter
+from functions.sharedState import SharedState
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rateLimiter.time, "time", clock.time)
+    return clock
+
+
+def test_refuses_once_the_bucket_is_empty_and_refills(clock):
+    limiter = RateLimiter(3, refill_period=60.0)
+
+    assert [limiter.check("user")[0] for _ in range(4)] == [True, True, True, False]
+    assert "Rate limit exceeded" in limiter.check("user")[1]
+
+    clock.now += 20
+    assert limiter.check("user") == (True, None)
+    assert limiter.check("other") == (True, None)
+
+
+def test_cooldown_between_commands(clock):
+    limiter = RateLimiter(10, cooldown=3)
+
+    assert limiter.check("user")[0]
+    allowed, message = limiter.check("user")
+    assert not allowed and message.startswith("⏳ Please wait 3.0")
+
+    clock.now += 3
+    assert limiter.check("user")[0]
+
+
+def test_command_costs(clock):
+    limiter = RateLimiter(4, command_costs={"on": 3})
+
+    assert limiter.check("user", "on")[0]
+    assert not limiter.check("user", "on")[0]
+    assert limiter.check("user", "help")[0]
+
+
+def test_idle_buckets_are_evicted(clock):
+    limiter = RateLimiter(2, refill_period=60.0, idle_ttl=60.0)
+    limiter.check("idle")
+    clock.now += 61
+    limiter.check("active")
+
+    assert len(limiter) == 1
+
+
+def test_usage_today_counts_checks(clock):
+    limiter = RateLimiter(2)
+    for _ in range(3):
+        limiter.check("user")
+
+    assert limiter.usage_today("user") == 3
+    assert limiter.usage_today("nobody") == 0
+
+
+def test_shared_store_enforces_one_limit_across_workers(clock, tmp_path):
+    store = SharedState(str(tmp_path / "state.db"))
+    worker_a = RateLimiter(2, store=store, namespace="ratelimit:test")
+    worker_b = RateLimiter(2, store=store, namespace="ratelimit:test")
+
+    assert worker_a.check("user")[0]
+    assert worker_b.check("user")[0]
+    assert not worker_a.check("user")[0]
+    assert worker_b.usage_today("user") == 3
+    assert len(worker_a) == 1
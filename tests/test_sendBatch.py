@@ -0,0 +1,95 @@
+import threading
+
+from functions import graphStub, metrics
+from functions.sendBatch import BATCH_LIMIT, BatchSender, send_messages_batch
+
+
+def _graph_errors():
+    return {labels: value for _, _, labels, value in metrics.graph_api_errors.samples()}
+
+
+def _errors_since(before):
+    return {
+        labels: value - before.get(labels, 0)
+        for labels, value in _graph_errors().items()
+        if value != before.get(labels, 0)
+    }
+
+
+def test_send_messages_batch_splits_and_keeps_order(graph_stub):
+    messages = [(f"user-{i}", f"hello {i}") for i in range(BATCH_LIMIT * 2 + 5)]
+
+    results = send_messages_batch(messages)
+
+    assert len(results) == len(messages)
+    assert all(result and result["message_id"] for result in results)
+    assert [result["recipient_id"] for result in results] == [
+        recipient for recipient, _ in messages
+    ]
+    assert graph_stub.faults.snapshot()["requests"] == 3
+
+
+def test_throttled_batch_fails_every_message(graph_stub):
+    graph_stub.faults.throttle_rate = 1.0
+    before = _graph_errors()
+
+    results = send_messages_batch([("user-1", "a"), ("user-2", "b")])
+
+    assert results == [None, None]
+    assert _errors_since(before) == {("batch", "429", "613"): 1}
+
+
+def test_rate_limited_stub_throttles_excess_batches(graph_stub):
+    graph_stub.faults = graphStub.Faults(max_rps=1)
+    before = _graph_errors()
+
+    first = send_messages_batch([("user-1", "a")])
+    second = send_messages_batch([("user-2", "b")])
+
+    assert first[0]["message_id"] and second == [None]
+    assert _errors_since(before) == {("batch", "429", "613"): 1}
+
+
+def test_server_error_fails_batch(graph_stub):
+    graph_stub.faults.error_rate = 1.0
+    before = _graph_errors()
+
+    assert send_messages_batch([("user-1", "a")]) == [None]
+    assert _errors_since(before) == {("batch", "500", "2"): 1}
+
+
+def _send_concurrently(sender, count):
+    results = [None] * count
+    start = threading.Barrier(count)
+
+    def send(index):
+        start.wait()
+        results[index] = sender.send_message(f"user-{index}", f"message {index}")
+
+    threads = [threading.Thread(target=send, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_batch_sender_groups_concurrent_sends(graph_stub):
+    sender = BatchSender(linger=0.2)
+
+    results = _send_concurrently(sender, 20)
+
+    assert [result["recipient_id"] for result in results] == [
+        f"user-{i}" for i in range(20)
+    ]
+    stats = sender.stats()
+    assert stats["messages"] == 20
+    assert stats["batches"] < 20
+    assert len(graphStub.sent_messages) == 20
+
+
+def test_batch_sender_returns_none_to_each_throttled_caller(graph_stub):
+    graph_stub.faults.throttle_rate = 1.0
+    sender = BatchSender(linger=0.2)
+
+    assert _send_concurrently(sender, 5) == [None] * 5
@@ -0,0 +1,217 @@
+import time
+
+import pytest
+
+from functions.fetchStock import StockAPIUnavailable, get_fetch_stats
+from functions.sharedState import claim_session, shared_state
+from functions.stockStub import synthetic_snapshots
+
+DEAD_PID = 2**22 + 1  # above Linux's pid_max, so never a live process
+
+
+class RecordingBroadcaster:
+    def __init__(self):
+        self.messages = []
+
+    def submit(self, send_message_func, sender_id, message, **kwargs):
+        self.messages.append((sender_id, message))
+
+    def wait(self, count=1, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while len(self.messages) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self.messages
+
+
+def _orphan_session(kind, sender_id):
+    shared_state.set(
+        f"sessions:{kind}",
+        sender_id,
+        {"owner": DEAD_PID, "worker": "exited-worker", "started": time.time()},
+    )
+
+
+@pytest.fixture
+def snapshot():
+    stock, weather = synthetic_snapshots(1)[0].values()
+    return stock, weather
+
+
+def _tracker(module, snapshot, monkeypatch):
+    broadcaster = RecordingBroadcaster()
+    monkeypatch.setattr(module, "broadcaster", broadcaster)
+    monkeypatch.setattr(module, "get_stock_snapshot", lambda wait=None: snapshot)
+    return broadcaster
+
+
+def _seed_gagstock_user(gagstock, sender_id, item):
+    shared_state.set(gagstock.USER_PREFERENCES_FILE, sender_id, {"compact_mode": True})
+    shared_state.set(
+        gagstock.PRICE_ALERTS_FILE,
+        sender_id,
+        [
+            {
+                "category": "gear",
+                "item_name": item["name"],
+                "condition": "above",
+                "value": 0,
+            }
+        ],
+    )
+
+
+def _seed_favorites_user(gagstockfav, sender_id, item):
+    tracked = [{"category": "gear", "item_name": item["name"]}]
+    shared_state.set(gagstockfav.TRACKED_ITEMS_FILE, sender_id, tracked)
+    shared_state.set(
+        gagstockfav.USER_PREFERENCES_FILE,
+        sender_id,
+        {"compact_notifications": True, "smart_notifications": False},
+    )
+    return tracked
+
+
+def _assert_compact_update_with_alert(gagstock, sender_id, messages):
+    assert messages[0][1].startswith("🌾 GAG Stock Update")
+    assert "PRICE ALERTS" in messages[0][1]
+    assert shared_state.get(gagstock.USER_PREFERENCES_FILE, sender_id)["compact_mode"]
+
+
+def test_restored_gagstock_session_keeps_preferences_and_alerts(
+    commands, snapshot, monkeypatch
+):
+    gagstock = commands["gagstock"]
+    sender_id = "restore-gagstock"
+    item = snapshot[0]["gear"][0]
+    _seed_gagstock_user(gagstock, sender_id, item)
+    _orphan_session(gagstock.SESSION_KIND, sender_id)
+    broadcaster = _tracker(gagstock, snapshot, monkeypatch)
+
+    try:
+        assert gagstock.restore_sessions(lambda *args: None) == 1
+        messages = broadcaster.wait()
+    finally:
+        gagstock.cleanup_session(sender_id)
+
+    assert sender_id in gagstock.user_price_alerts
+    _assert_compact_update_with_alert(gagstock, sender_id, messages)
+    history = shared_state.get(gagstock.PRICE_HISTORY_FILE, f"gear/{item['name']}")
+    assert history[-1]["value"] == item["value"]
+
+
+def test_restored_favorites_session_notifies_tracked_items(
+    commands, snapshot, monkeypatch
+):
+    gagstockfav = commands["gagstockfav"]
+    sender_id = "restore-gagstockfav"
+    tracked = _seed_favorites_user(gagstockfav, sender_id, snapshot[0]["gear"][0])
+    _orphan_session(gagstockfav.SESSION_KIND, sender_id)
+    broadcaster = _tracker(gagstockfav, snapshot, monkeypatch)
+
+    try:
+        assert gagstockfav.restore_sessions(lambda *args: None) == 1
+        messages = broadcaster.wait()
+    finally:
+        gagstockfav.cleanup_favorite_session(sender_id)
+
+    assert gagstockfav.user_tracked_items[sender_id] == tracked
+    assert messages[0][1].startswith("⭐ 1 favorite item(s) in stock!")
+    assert shared_state.get(gagstockfav.TRACKED_ITEMS_FILE, sender_id) == tracked
+    prefs = shared_state.get(gagstockfav.USER_PREFERENCES_FILE, sender_id)
+    assert prefs["compact_notifications"] and not prefs["smart_notifications"]
+
+
+def test_reloaded_gagstock_keeps_user_data(commands, snapshot, monkeypatch):
+    gagstock = commands["gagstock"]
+    sender_id = "reload-gagstock"
+    _seed_gagstock_user(gagstock, sender_id, snapshot[0]["gear"][0])
+    assert claim_session(gagstock.SESSION_KIND, sender_id)
+    gagstock.active_sessions[sender_id] = {"timer": None}
+
+    assert commands.reload("gagstock")
+    reloaded = commands["gagstock"]
+    broadcaster = _tracker(reloaded, snapshot, monkeypatch)
+    try:
+        assert reloaded is not gagstock and sender_id in reloaded.active_sessions
+        assert reloaded.user_preferences[sender_id]["compact_mode"]
+        assert sender_id in reloaded.user_price_alerts
+        reloaded.fetch_all_data(sender_id, lambda *args: None)
+    finally:
+        reloaded.cleanup_session(sender_id)
+
+    _assert_compact_update_with_alert(reloaded, sender_id, broadcaster.messages)
+
+
+def test_reloaded_favorites_keep_tracked_items(commands, snapshot, monkeypatch):
+    gagstockfav = commands["gagstockfav"]
+    sender_id = "reload-gagstockfav"
+    tracked = _seed_favorites_user(gagstockfav, sender_id, snapshot[0]["gear"][0])
+    assert claim_session(gagstockfav.SESSION_KIND, sender_id)
+    gagstockfav.user_favorite_sessions[sender_id] = {"timer": None}
+
+    assert commands.reload("gagstockfav")
+    reloaded = commands["gagstockfav"]
+    broadcaster = _tracker(reloaded, snapshot, monkeypatch)
+    try:
+        assert sender_id in reloaded.user_favorite_sessions
+        assert reloaded.user_tracked_items[sender_id] == tracked
+        assert reloaded.user_preferences[sender_id]["compact_notifications"]
+        reloaded.fetch_favorite_data(sender_id, lambda *args: None)
+    finally:
+        reloaded.cleanup_favorite_session(sender_id)
+
+    assert broadcaster.messages[0][1].startswith("⭐ 1 favorite item(s) in stock!")
+
+
+def _suppressed():
+    return get_fetch_stats()["suppressed_notifications"]
+
+
+@pytest.mark.parametrize(
+    "module_name, sessions_name, fetch_name, cleanup_name",
+    [
+        ("gagstock", "active_sessions", "fetch_all_data", "cleanup_session"),
+        (
+            "gagstockfav",
+            "user_favorite_sessions",
+            "fetch_favorite_data",
+            "cleanup_favorite_session",
+        ),
+    ],
+)
+def test_only_outage_notices_skipped_while_upstream_is_down_count_as_suppressed(
+    commands, monkeypatch, module_name, sessions_name, fetch_name, cleanup_name
+):
+    module = commands[module_name]
+    sessions = getattr(module, sessions_name)
+    fetch = getattr(module, fetch_name)
+    cleanup = getattr(module, cleanup_name)
+    sender_id = f"outage-{module_name}"
+    notices = []
+
+    def unavailable(wait=None):
+        raise StockAPIUnavailable("No fresh stock snapshot", retry_after=8)
+
+    monkeypatch.setattr(module, "get_stock_snapshot", unavailable)
+    monkeypatch.setattr(module, "get_retry_delay", lambda failures: 3600)
+    assert claim_session(module.SESSION_KIND, sender_id)
+    sessions[sender_id] = {"timer": None}
+    try:
+        # Upstream up, notice not sent yet: it is sent, nothing suppressed.
+        monkeypatch.setattr(module, "is_snapshot_available", lambda: True)
+        before = _suppressed()
+        fetch(sender_id, lambda *args: notices.append(args))
+        assert len(notices) == 1 and _suppressed() == before
+
+        # Upstream up, notice already sent: a repeat, not a suppression.
+        sessions[sender_id]["timer"].cancel()
+        fetch(sender_id, lambda *args: notices.append(args))
+        assert len(notices) == 1 and _suppressed() == before
+
+        # Upstream down: the notice is suppressed and counted.
+        monkeypatch.setattr(module, "is_snapshot_available", lambda: False)
+        sessions[sender_id]["timer"].cancel()
+        fetch(sender_id, lambda *args: notices.append(args))
+        assert len(notices) == 1 and _suppressed() == before + 1
+    finally:
+        cleanup(sender_id)
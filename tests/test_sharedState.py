@@ -0,0 +1,32 @@
+import time
+
+from functions.sharedState import SharedState
+
+
+def _rows(store):
+    return store._connection().execute("SELECT COUNT(*) FROM kv").fetchone()[0]
+
+
+def test_ttl_writes_purge_expired_rows(tmp_path):
+    store = SharedState(str(tmp_path / "state.db"), purge_interval=0.05)
+    for version in range(50):
+        store.set("messages:cache", f"stock:{version}", "rendered", ttl=0.01)
+    store.set("settings", "permanent", True)
+    time.sleep(0.06)
+
+    store.update("ratelimit", "sender", lambda current: (1, None), ttl=60)
+
+    assert _rows(store) == 2
+    assert store.get("settings", "permanent") is True
+    assert store.get("ratelimit", "sender") == 1
+
+
+def test_purges_wait_for_the_interval(tmp_path):
+    store = SharedState(str(tmp_path / "state.db"), purge_interval=60)
+    store.set("messages:cache", "stock:1", "rendered", ttl=0.01)
+    time.sleep(0.02)
+    store.set("messages:cache", "stock:2", "rendered", ttl=60)
+
+    assert _rows(store) == 2
+    assert store.get("messages:cache", "stock:1") is None
+    assert store.purge_expired() == 1
@@ -0,0 +1,37 @@
+import time
+
+import pytest
+
+from functions.fetchStock import StockAPIUnavailable
+from functions.stockPoller import StockPoller
+
+
+@pytest.fixture
+def poller(monkeypatch):
+    poller = StockPoller(name="test-poller", interval=8.0)
+    # No poller thread: snapshots appear only when the test publishes them.
+    monkeypatch.setattr(poller, "start", lambda: None)
+    return poller
+
+
+def test_no_wait_fails_fast_without_a_snapshot(poller, monkeypatch):
+    reads = []
+    fresh_meta = poller._fresh_meta
+    monkeypatch.setattr(poller, "_fresh_meta", lambda: reads.append(1) or fresh_meta())
+
+    started = time.monotonic()
+    with pytest.raises(StockAPIUnavailable) as error:
+        poller.get_snapshot(wait=0)
+
+    assert time.monotonic() - started < 0.1
+    assert len(reads) == 1
+    assert error.value.retry_after == poller.interval
+
+
+def test_no_wait_returns_the_published_snapshot(poller):
+    poller.publish({"gear": [{"name": "Trowel"}]}, {"currentWeather": "Rain"})
+
+    stock_data, weather_data = poller.get_snapshot(wait=0)
+
+    assert stock_data["gear"][0]["name"] == "Trowel"
+    assert weather_data["currentWeather"] == "Rain"
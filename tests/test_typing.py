@@ -0,0 +1,67 @@
+import time
+
+import pytest
+
+import server
+from functions import graphStub
+from functions.commandRegistry import CommandRegistry
+from functions.typingManager import TypingManager
+
+SLOW_COMMAND = """
+import asyncio
+
+
+async def execute(sender_id, args, context):
+    await asyncio.sleep(0.3)
+    await context["send_message"](sender_id, "done")
+"""
+
+
+@pytest.fixture
+def slow_command(tmp_path, monkeypatch):
+    (tmp_path / "slowasync.py").write_text(SLOW_COMMAND)
+    monkeypatch.setattr(server, "cmd_modules", CommandRegistry(str(tmp_path)))
+    monkeypatch.setattr(server, "_command_router", (None, None))
+    monkeypatch.setattr(server, "_base_context", (None, None))
+
+
+@pytest.fixture
+def typing_calls(monkeypatch):
+    calls = []
+    manager = TypingManager(
+        lambda recipient_id, typing_on: calls.append((recipient_id, typing_on)),
+        delay=0.05,
+    )
+    monkeypatch.setattr(server, "typing_manager", manager)
+    return calls
+
+
+def test_slow_async_command_shows_typing_until_it_replies(
+    graph_stub, slow_command, typing_calls
+):
+    sender_id = "typing-async-user"
+    event = {
+        "object": "page",
+        "entry": [
+            {
+                "messaging": [
+                    {
+                        "sender": {"id": sender_id},
+                        "message": {"mid": "m_typing_async", "text": "slowasync"},
+                    }
+                ]
+            }
+        ],
+    }
+
+    response = server.app.test_client().post("/webhook", json=event)
+    assert response.status_code == 200
+
+    deadline = time.monotonic() + 5
+    while server.typing_manager.stats()["active"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert typing_calls == [(sender_id, True)]
+    assert [m["message"]["text"] for m in graphStub.sent_messages] == ["done"]
+    stats = server.typing_manager.stats()
+    assert stats["active"] == 0 and stats["on_sent"] == 1
@@ -0,0 +1,25 @@
+import asyncio
+
+import pytest
+
+import asgi
+import server
+
+
+@pytest.mark.parametrize("body", [b"[]", b'"x"', b"42", b"null", b"", b"{not json"])
+def test_asgi_webhook_rejects_bodies_that_are_not_json_objects(body):
+    assert asyncio.run(asgi.webhook_handler(body)) == (400, "INVALID_JSON")
+
+
+@pytest.mark.parametrize("body", [b"[]", b'"x"', b"", b"{not json"])
+def test_flask_webhook_rejects_bodies_that_are_not_json_objects(body):
+    response = server.app.test_client().post("/webhook", data=body)
+
+    assert response.status_code == 400
+
+
+def test_webhook_acknowledges_other_objects():
+    body = b'{"object": "instagram", "entry": []}'
+
+    assert asyncio.run(asgi.webhook_handler(body)) == (200, "EVENT_RECEIVED")
+    assert server.app.test_client().post("/webhook", data=body).status_code == 200
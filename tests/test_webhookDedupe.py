@@ -0,0 +1,74 @@
+import time
+
+from functions.sharedState import SharedState
+from functions.webhookDedupe import IdempotencyCache, event_key
+
+
+def test_event_key():
+    assert event_key({"message": {"mid": "m.1", "text": "hi"}}) == "mid:m.1"
+    assert (
+        event_key(
+            {
+                "sender": {"id": "42"},
+                "postback": {"payload": "GET_STARTED"},
+                "timestamp": 7,
+            }
+        )
+        == "postback:42:GET_STARTED:7"
+    )
+    assert event_key({"read": {"watermark": 1}}) is None
+
+
+def test_redelivery_within_window_is_a_duplicate():
+    cache = IdempotencyCache(window=60)
+
+    assert not cache.is_duplicate("mid:1")
+    assert cache.is_duplicate("mid:1")
+    assert not cache.is_duplicate("mid:2")
+    assert not cache.is_duplicate(None) and not cache.is_duplicate(None)
+    assert cache.stats() == {
+        "checked": 3,
+        "duplicates": 1,
+        "shared_errors": 0,
+        "entries": 2,
+    }
+
+
+def test_keys_expire_after_the_window():
+    cache = IdempotencyCache(window=0.02)
+
+    assert not cache.is_duplicate("mid:1")
+    time.sleep(0.03)
+    assert not cache.is_duplicate("mid:1")
+
+
+def test_oldest_keys_are_evicted_beyond_max_entries():
+    cache = IdempotencyCache(window=60, max_entries=2)
+    for key in ("mid:1", "mid:2", "mid:3"):
+        cache.is_duplicate(key)
+
+    assert cache.stats()["entries"] == 2
+    assert not cache.is_duplicate("mid:1")
+    assert cache.is_duplicate("mid:3")
+
+
+def test_shared_store_drops_redelivery_to_another_worker(tmp_path):
+    store = SharedState(str(tmp_path / "state.db"))
+    worker_a = IdempotencyCache(window=60, shared_store=store)
+    worker_b = IdempotencyCache(window=60, shared_store=store)
+
+    assert not worker_a.is_duplicate("mid:1")
+    assert worker_b.is_duplicate("mid:1")
+    assert not worker_b.is_duplicate("mid:2")
+
+
+def test_shared_store_errors_fail_open():
+    class BrokenStore:
+        def update(self, *args, **kwargs):
+            raise OSError("database is locked")
+
+    cache = IdempotencyCache(window=60, shared_store=BrokenStore())
+
+    assert not cache.is_duplicate("mid:1")
+    assert cache.is_duplicate("mid:1")
+    assert cache.stats()["shared_errors"] == 1